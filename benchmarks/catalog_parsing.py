@@ -0,0 +1,160 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Benchmark of loading the product catalog for a deletion.
+
+Compares parsing every product with the pure Python PyYAML loader, as
+cray-product-catalog does, with CatalogDocuments parsing every product with
+libyaml, and parsing only the target and the products which may share its
+components, over a synthetic catalog.
+
+Usage:
+    python -m benchmarks.catalog_parsing [--products 1000] [--versions 3] [--repeat 3]
+"""
+
+import argparse
+import time
+from timeit import repeat
+
+import yaml
+
+from product_deletion_utility.components.catalog import CatalogDocuments, component_tokens
+
+
+class SyntheticProductVersion():
+    """A product version with the component attributes of InstalledProductVersion."""
+
+    def __init__(self, name, version, data):
+        self.name = name
+        self.version = version
+        self.data = data
+        components = data.get('component_versions', {})
+        self.docker_images = [(image['name'], image['version']) for image in components.get('docker', [])]
+        self.helm_charts = [(chart['name'], chart['version']) for chart in components.get('helm', [])]
+        self.s3_artifacts = [(artifact['bucket'], artifact['key']) for artifact in components.get('s3', [])]
+        self.loftsman_manifests = components.get('manifests', [])
+        self.hosted_repositories = [repo for repo in components.get('repositories', [])
+                                    if repo['type'] == 'hosted']
+        self.recipes = [{'name': name, 'id': recipe['id']}
+                        for name, recipe in data.get('configuration', {}).get('recipes', {}).items()]
+        self.images = [{'name': name, 'id': image['id']}
+                       for name, image in data.get('configuration', {}).get('images', {}).items()]
+
+
+def synthetic_version(product, family, version, index):
+    """Create the catalog data of one product version.
+    The products of a family share a few Docker images and a chart of a
+    common base, as products built on the same platform do.
+    """
+    return {
+        'component_versions': {
+            'docker': [{'name': f'cray/{product}-service-{n}', 'version': version} for n in range(20)] +
+                      [{'name': f'cray/{family}-base-{n}', 'version': f'1.{index % 5}.0'} for n in range(5)],
+            'helm': ([{'name': f'{product}-chart-{n}', 'version': version} for n in range(5)] +
+                     [{'name': f'{family}-base', 'version': f'1.{index % 5}.0'}]),
+            's3': [{'bucket': 'boot-images', 'key': f'{product}/{version}/artifact-{n}.squashfs'}
+                   for n in range(5)],
+            'repositories': [{'name': f'{product}-{version}-sle-15sp4', 'type': 'hosted'},
+                             {'name': f'{product}-sle-15sp4', 'type': 'group',
+                              'members': [f'{product}-{version}-sle-15sp4']}],
+            'manifests': [f'config-data/argo/loftsman/{product}/{version}/manifests/{product}.yaml'],
+        },
+        'configuration': {
+            'clone_url': f'https://vcs.local/vcs/cray/{product}-config-management.git',
+            'commit': f'{index:040x}',
+            'import_branch': f'cray/{product}/{version}',
+        },
+        'images': {f'{product}-{version}-image': {'id': f'{index:08x}-0000-4000-8000-000000000001'}},
+        'recipes': {f'{product}-{version}-recipe': {'id': f'{index:08x}-0000-4000-8000-000000000002'}},
+    }
+
+
+def synthetic_catalog(product_count, version_count, family_size=10):
+    """Create the data of a product catalog ConfigMap.
+    Args:
+        product_count (int): The number of products.
+        version_count (int): The number of versions of each product.
+        family_size (int): The number of products sharing base components.
+    Returns:
+        dict: The YAML document of each product's versions, by product name.
+    """
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    return {
+        f'product-{p}': yaml.dump({
+            f'{v}.0.0': synthetic_version(f'product-{p}', f'family-{p // family_size}', f'{v}.0.0',
+                                          p * version_count + v)
+            for v in range(version_count)
+        }, Dumper=dumper, default_flow_style=False)
+        for p in range(product_count)
+    }
+
+
+def load_everything(configmap_data):
+    """Parse every product with the pure Python loader, as cray-product-catalog does."""
+    return [
+        SyntheticProductVersion(name, version, data)
+        for name, document in configmap_data.items()
+        for version, data in yaml.load(document, Loader=yaml.SafeLoader).items()
+    ]
+
+
+def load_for_deletion(configmap_data, product_name, version):
+    """Parse the target product, and the products which may share its components.
+    The document of the target product contains all of its tokens, so it is
+    among the products mentioning them.
+    """
+    documents = CatalogDocuments(configmap_data, SyntheticProductVersion)
+    target = [product for product in documents.product_versions(product_name) if product.version == version]
+    return documents.products_mentioning(component_tokens(target))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--versions', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    configmap_data = synthetic_catalog(args.products, args.versions)
+    size = sum(len(document) for document in configmap_data.values())
+    print(f'Synthetic catalog: {args.products} products, {args.versions} versions each, '
+          f'{size / 1e6:.1f} MB of YAML, generated in {time.monotonic() - start:.1f}s')
+
+    target = (f'product-{args.products // 2}', '1.0.0')
+    parsed = len(load_for_deletion(configmap_data, *target))
+    print(f'Product versions parsed for a deletion of {target[0]}:{target[1]}: {parsed} '
+          f'of {args.products * args.versions}')
+    for description, function in (
+            ('every product, pure Python SafeLoader', lambda: load_everything(configmap_data)),
+            ('every product, CatalogDocuments',
+             lambda: CatalogDocuments(configmap_data, SyntheticProductVersion).products),
+            ('target and sharing products, CatalogDocuments',
+             lambda: load_for_deletion(configmap_data, *target))):
+        best = min(repeat(function, number=1, repeat=args.repeat))
+        print(f'{description}: {best:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Benchmark of deleting product versions end to end.
+
+Generates a synthetic product catalog, starts local stand-ins for the Docker
+registry, Nexus, S3 and the API gateway holding every component in it, and
+deletes a batch of product versions with DeleteProductComponent. Reports the
+throughput, the latency percentiles and number of requests to each service,
+the peak memory used, and whether exactly the planned components were removed.
+
+The stand-ins add the same latency and failures to every service. They run
+in the benchmark process, so the latencies they record and the peak memory include their own
+overhead, which is the same from one run to the next.
+
+Usage:
+    python -m benchmarks.deletion [--products 50] [--components 40] [--share-ratio 0.2]
+        [--delete 5] [--latency 0.005] [--error-rate 0] [--throttle-rate 0]
+        [--engine threads] [--json]
+"""
+
+import argparse
+from base64 import b64encode
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+import uuid
+
+from cray_product_catalog.query import InstalledProductVersion
+
+from benchmarks.fake_services import (
+    FakeApiGateway,
+    FakeNexus,
+    FakeRegistry,
+    FakeS3,
+    FaultProfile,
+    percentile,
+)
+from benchmarks.synthetic import synthetic_catalog
+from product_deletion_utility.components.catalog import CatalogDocuments
+from product_deletion_utility.components.constants import (
+    CHART_LOOKUP_LIST,
+    CHART_LOOKUP_SEARCH,
+    DEFAULT_DOCKER_CONCURRENCY,
+    DEFAULT_IMS_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_NEXUS_CONCURRENCY,
+    DEFAULT_PHASE_CONCURRENCY,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_S3_CONCURRENCY,
+    ENGINE_ASYNC,
+    ENGINE_THREADS,
+)
+from product_deletion_utility.components.delete import BackendClients, DeleteProductComponent
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.nexus import NEXUS_CHARTS_REPOSITORY
+from product_deletion_utility.components.ownership import (
+    DOCKER_IMAGE,
+    HELM_CHART,
+    HOSTED_REPO,
+    IMS_IMAGE,
+    IMS_RECIPE,
+    LOFTSMAN_MANIFEST,
+    S3_ARTIFACT,
+)
+from product_deletion_utility.components.retry import configure_retries
+from product_deletion_utility.components.s3 import IMS_IMAGES_BUCKET, IMS_RECIPES_BUCKET
+from product_deletion_utility.main import _remove_components
+
+# The artifacts of each IMS image, linked from its manifest.
+IMAGE_ARTIFACTS = ('rootfs', 'kernel', 'initrd')
+
+
+class FakeKubernetesApi():
+    """The Kubernetes API calls made when the catalog is passed to DeleteProductComponent."""
+
+    def read_namespaced_secret(self, name, namespace):
+        """Get the Nexus credentials secret."""
+        return SimpleNamespace(data={'username': b64encode(b'admin').decode(),
+                                     'password': b64encode(b'admin').decode()})
+
+
+class BenchmarkServices():
+    """The fake services, holding the components of every product version in a catalog."""
+
+    def __init__(self, faults):
+        """Create the services.
+        Args:
+            faults (dict): The FaultProfile of each service, by name.
+        """
+        self.registry = FakeRegistry(faults['registry'])
+        self.nexus = FakeNexus(faults['nexus'])
+        self.s3 = FakeS3(faults['s3'])
+        self.gateway = None
+        self._faults = faults
+
+    def start(self):
+        """Start every service."""
+        self.registry.start()
+        self.nexus.start()
+        self.s3.start()
+        self.gateway = FakeApiGateway(self.s3.url, self._faults['gateway']).start()
+
+    def stop(self):
+        """Stop every service."""
+        for service in self.services.values():
+            service.stop()
+
+    @property
+    def services(self):
+        """dict: Every service, by name."""
+        return {'registry': self.registry, 'nexus': self.nexus, 's3': self.s3, 'gateway': self.gateway}
+
+    def populate(self, products, extra_objects, seed=0):
+        """Store the components of product versions.
+        Args:
+            products (list): The InstalledProductVersion objects.
+            extra_objects (int): The number of objects added to each IMS
+                bucket which no product owns, so listings are realistic.
+            seed (int): The seed of the keys of the extra objects.
+        Returns:
+            None
+        """
+        self.nexus.add_repository(NEXUS_CHARTS_REPOSITORY, 'hosted', 'helm')
+        for product in products:
+            for name, version in product.docker_images:
+                self.registry.add_image(name, version)
+            for name, version in product.helm_charts:
+                self.nexus.add_component(NEXUS_CHARTS_REPOSITORY, name, version)
+            for bucket, key in product.s3_artifacts:
+                self.s3.add_object(bucket, key)
+            for key in product.loftsman_manifests:
+                self.s3.add_object('config-data', key.replace('config-data/', ''))
+            for repo in product.hosted_repositories:
+                self.nexus.add_repository(repo['name'])
+            for image in product.images:
+                manifest = {'version': '1.0', 'artifacts': []}
+                for artifact in IMAGE_ARTIFACTS:
+                    key = f'{image["id"]}/{artifact}'
+                    self.s3.add_object(IMS_IMAGES_BUCKET, key)
+                    manifest['artifacts'].append({'link': {'type': 's3', 'path': f's3://{IMS_IMAGES_BUCKET}/{key}'}})
+                manifest_key = f'{image["id"]}/manifest.json'
+                self.s3.add_object(IMS_IMAGES_BUCKET, manifest_key, json.dumps(manifest).encode())
+                self.gateway.add_ims_record('images', image['id'], image['name'], (IMS_IMAGES_BUCKET, manifest_key))
+            for recipe in product.recipes:
+                recipe_key = f'recipes/{recipe["id"]}/recipe.tar.gz'
+                self.s3.add_object(IMS_RECIPES_BUCKET, recipe_key)
+                self.gateway.add_ims_record('recipes', recipe['id'], recipe['name'], (IMS_RECIPES_BUCKET, recipe_key))
+        for index in range(extra_objects):
+            self.s3.add_object(IMS_IMAGES_BUCKET, f'{uuid.UUID(int=seed * extra_objects + index)}/rootfs')
+            self.s3.add_object(IMS_RECIPES_BUCKET, f'{uuid.UUID(int=seed * extra_objects + index)}/recipe.tar.gz')
+
+    def exists(self, component_type, key):
+        """Check whether a component is still stored.
+        Args:
+            component_type (str): The type of the component.
+            key (tuple): The identifier of the component in the deletion plan.
+        Returns:
+            bool: True if the component is stored.
+        """
+        if component_type == DOCKER_IMAGE:
+            return key[1] in self.registry.images.get(key[0], {})
+        if component_type == HELM_CHART:
+            return any((component['name'], component['version']) == tuple(key)
+                       for component in self.nexus.components[NEXUS_CHARTS_REPOSITORY].values())
+        if component_type in (S3_ARTIFACT, LOFTSMAN_MANIFEST):
+            return key[1] in self.s3.buckets.get(key[0], ())
+        if component_type == HOSTED_REPO:
+            return key[0] in self.nexus.repositories
+        if component_type in (IMS_IMAGE, IMS_RECIPE):
+            return key[1] in self.gateway.ims['images' if component_type == IMS_IMAGE else 'recipes']
+        raise ValueError(f'Unknown component type {component_type}')
+
+    def request_stats(self):
+        """Get the number of requests and their latency for every route of every service.
+        Returns:
+            list: A dict for each route.
+        """
+        stats = []
+        for service_name, service in self.services.items():
+            for (method, route), latencies in sorted(service.latencies.items()):
+                statuses = {status: count for (status_method, status_route, status), count
+                            in service.statuses.items() if (status_method, status_route) == (method, route)}
+                stats.append({
+                    'service': service_name,
+                    'method': method,
+                    'route': route,
+                    'calls': service.calls[(method, route)],
+                    'throttled': statuses.get(429, 0),
+                    'errors': sum(count for status, count in statuses.items() if status >= 500),
+                    'p50_ms': percentile(latencies, 0.5) * 1000,
+                    'p95_ms': percentile(latencies, 0.95) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                })
+        return stats
+
+
+def verify(services, plan):
+    """Compare the components left in the fake services with the deletion plan.
+    Args:
+        services (BenchmarkServices): The fake services.
+        plan (DeletionPlan): The plan of the deletion.
+    Returns:
+        dict: The number of planned removals still stored, and of kept
+            components which were removed.
+    """
+    leftover = sum(
+        services.exists(component_type, key)
+        for component_type in (DOCKER_IMAGE, HELM_CHART, S3_ARTIFACT, LOFTSMAN_MANIFEST,
+                               HOSTED_REPO, IMS_IMAGE, IMS_RECIPE)
+        for key in plan.removals(component_type)
+    )
+    lost = sum(not services.exists(skipped['type'], skipped['key']) for skipped in plan.skipped)
+    return {'leftover': leftover, 'lost': lost}
+
+
+def run(args):
+    """Run the benchmark.
+    Args:
+        args (argparse.Namespace): The benchmark options.
+    Returns:
+        dict: The results.
+    """
+    faults = {
+        name: FaultProfile(args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                           args.retry_after, seed=args.seed + index)
+        for index, name in enumerate(('registry', 'nexus', 's3', 'gateway'))
+    }
+    services = BenchmarkServices(faults)
+    services.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            credentials_file = os.path.join(directory, 'credentials.json')
+            with open(credentials_file, 'w') as f:
+                json.dump({'access_token': 'benchmark'}, f)
+            os.environ['CRAY_CREDENTIALS'] = credentials_file
+            return _run(args, services)
+    finally:
+        services.stop()
+
+
+def _run(args, services):
+    """Populate the fake services, and delete a batch of product versions from them."""
+    catalog_data = synthetic_catalog(args.products, args.components, args.share_ratio, args.versions, args.seed)
+    documents = CatalogDocuments(catalog_data, InstalledProductVersion)
+    products = documents.products
+    # Delete the newest version of the first products, so the older versions stay.
+    targets = [(name, max(documents.product_versions(name), key=lambda product: product.version).version)
+               for name in documents.product_names[:args.delete]]
+    services.populate(products, args.extra_objects, args.seed)
+    for service in services.services.values():
+        service.reset_stats()
+
+    configure_retries(args.max_retries, args.rate_limit)
+    clients = BackendClients(
+        FakeKubernetesApi(),
+        nexus_url=services.nexus.url,
+        docker_url=services.registry.url,
+        docker_concurrency=args.docker_concurrency,
+        s3_concurrency=args.s3_concurrency,
+        api_gateway_url=services.gateway.url,
+        ims_concurrency=args.ims_concurrency,
+    )
+    tracemalloc.start()
+    start = time.monotonic()
+    component = DeleteProductComponent(
+        product_versions=targets,
+        clients=clients,
+        catalog_documents=CatalogDocuments(catalog_data, InstalledProductVersion),
+        engine=args.engine,
+        chart_lookup=args.chart_lookup,
+        docker_concurrency=args.docker_concurrency,
+        nexus_concurrency=args.nexus_concurrency,
+        s3_concurrency=args.s3_concurrency,
+        ims_concurrency=args.ims_concurrency,
+    )
+    planned = time.monotonic()
+    error = None
+    try:
+        _remove_components(component, args.phase_concurrency)
+    except ProductInstallException as err:
+        error = str(err)
+    finished = time.monotonic()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    removals = {
+        component_type: len(component.plan.removals(component_type))
+        for component_type in (DOCKER_IMAGE, HELM_CHART, S3_ARTIFACT, LOFTSMAN_MANIFEST,
+                               HOSTED_REPO, IMS_IMAGE, IMS_RECIPE)
+    }
+    removed = sum(removals.values())
+    requests = services.request_stats()
+    return {
+        'options': vars(args),
+        'product_versions': [f'{name}:{version}' for name, version in targets],
+        'planned_removals': removals,
+        'kept': len(component.plan.skipped),
+        'plan_seconds': planned - start,
+        'remove_seconds': finished - planned,
+        'components_per_second': removed / (finished - planned) if finished > planned else 0.0,
+        'requests': requests,
+        'requests_per_second': sum(stats['calls'] for stats in requests) / (finished - planned),
+        'peak_traced_memory_bytes': peak_memory,
+        # ru_maxrss is in kilobytes on Linux.
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'error': error,
+        'verification': verify(services, component.plan),
+    }
+
+
+def print_report(results):
+    """Print the results of the benchmark as text."""
+    removed = sum(results['planned_removals'].values())
+    print(f'Deleted {len(results["product_versions"])} product versions: {removed} components '
+          f'planned for removal, {results["kept"]} kept because they are shared')
+    print(f'Planning: {results["plan_seconds"]:.3f}s  Removal: {results["remove_seconds"]:.3f}s  '
+          f'({results["components_per_second"]:.1f} components/s, '
+          f'{results["requests_per_second"]:.1f} requests/s)')
+    print(f'Peak traced memory: {results["peak_traced_memory_bytes"] / 2 ** 20:.1f} MiB  '
+          f'Max RSS: {results["max_rss_bytes"] / 2 ** 20:.1f} MiB')
+    print()
+    print(f'{"service":<9}{"method":<8}{"route":<18}{"calls":>7}{"429":>6}{"5xx":>6}'
+          f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for stats in results['requests']:
+        print(f'{stats["service"]:<9}{stats["method"]:<8}{stats["route"]:<18}{stats["calls"]:>7}'
+              f'{stats["throttled"]:>6}{stats["errors"]:>6}'
+              f'{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}')
+    print()
+    verification = results['verification']
+    print(f'Planned removals left behind: {verification["leftover"]}  '
+          f'Shared components removed: {verification["lost"]}')
+    if results['error']:
+        print(f'Deletion failed: {results["error"]}')
+
+
+def main():
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--products', type=int, default=50, help='The number of products in the catalog.')
+    parser.add_argument('--versions', type=int, default=2, help='The number of versions of each product.')
+    parser.add_argument('--components', type=int, default=40,
+                        help='The number of Docker images, Helm charts and S3 artifacts of each version.')
+    parser.add_argument('--share-ratio', type=float, default=0.2,
+                        help='The share of the components of a version shared with other products.')
+    parser.add_argument('--delete', type=int, default=5,
+                        help='The number of products whose newest version is deleted.')
+    parser.add_argument('--extra-objects', type=int, default=1000,
+                        help='The number of unowned objects in each IMS bucket.')
+    parser.add_argument('--latency', type=float, default=0.005, help='The seconds added to each request.')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='The maximum seconds randomly added to the latency.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='The share of requests failed with 503.')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='The share of requests throttled with 429.')
+    parser.add_argument('--retry-after', type=int, default=0, help='The Retry-After header of throttled requests.')
+    parser.add_argument('--seed', type=int, default=0, help='The seed of the catalog and the failures.')
+    parser.add_argument('--engine', choices=(ENGINE_THREADS, ENGINE_ASYNC), default=ENGINE_THREADS)
+    parser.add_argument('--chart-lookup', choices=(CHART_LOOKUP_LIST, CHART_LOOKUP_SEARCH),
+                        default=CHART_LOOKUP_LIST)
+    parser.add_argument('--docker-concurrency', type=int, default=DEFAULT_DOCKER_CONCURRENCY)
+    parser.add_argument('--nexus-concurrency', type=int, default=DEFAULT_NEXUS_CONCURRENCY)
+    parser.add_argument('--s3-concurrency', type=int, default=DEFAULT_S3_CONCURRENCY)
+    parser.add_argument('--ims-concurrency', type=int, default=DEFAULT_IMS_CONCURRENCY)
+    parser.add_argument('--phase-concurrency', type=int, default=DEFAULT_PHASE_CONCURRENCY)
+    parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE_LIMIT)
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,480 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Local stand-ins for the services the deletion utility removes components
+from: the Docker registry v2 API, the Nexus REST API, S3, and the API gateway
+serving STS and IMS.
+
+Each service runs an HTTP server in a background thread on 127.0.0.1. A
+FaultProfile adds latency to every request, and fails a share of requests
+with HTTP 503 or throttles them with HTTP 429 and a Retry-After header. Every
+request is counted and timed per route, including the added latency.
+"""
+
+from collections import Counter, defaultdict
+import hashlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import random
+from socketserver import ThreadingMixIn
+import threading
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+S3_NAMESPACE = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class FaultProfile():
+    """The latency and failures added to the requests to a service."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=0, seed=0):
+        """Create the profile.
+        Args:
+            latency (float): The number of seconds added to every request.
+            jitter (float): The maximum number of seconds randomly added to the latency.
+            error_rate (float): The share of requests failed with HTTP 503.
+            throttle_rate (float): The share of requests throttled with HTTP 429.
+            retry_after (int): The Retry-After header of throttled requests.
+            seed (int): The seed of the random failures, so runs are repeatable.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Choose the latency and any failure of a request.
+        Returns:
+            tuple: The number of seconds to wait, and the HTTP status to fail
+                the request with, or None.
+        """
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return delay, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, 503
+        return delay, None
+
+
+class Response():
+    """The response to a request to a fake service."""
+
+    def __init__(self, status, body=b'', headers=None):
+        self.status = status
+        self.body = body if isinstance(body, bytes) else body.encode()
+        self.headers = headers or {}
+
+    @classmethod
+    def json(cls, status, document, headers=None):
+        """Create a JSON response."""
+        return cls(status, json.dumps(document), dict(headers or {}, **{'Content-Type': 'application/json'}))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Dispatch every request to the FakeService of the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _dispatch(self):
+        service = self.server.service
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        start = time.monotonic()
+        url = urlsplit(self.path)
+        route, response = service.handle(
+            self.command, unquote(url.path), parse_qs(url.query, keep_blank_values=True), self.headers, body)
+        service.record(self.command, route, response.status, time.monotonic() - start)
+        self.send_response(response.status)
+        for header, value in response.headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(response.body)
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FakeService():
+    """A fake HTTP service running in a background thread."""
+
+    def __init__(self, faults=None):
+        """Create the service.
+        Args:
+            faults (FaultProfile): The latency and failures to add to requests.
+        """
+        self.faults = faults or FaultProfile()
+        self.calls = Counter()
+        self.statuses = Counter()
+        self.latencies = defaultdict(list)
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving on an ephemeral port.
+        Returns:
+            FakeService: This service.
+        """
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.service = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self):
+        """str: The base URL of the service."""
+        return 'http://%s:%d' % self._server.server_address
+
+    def record(self, method, route, status, seconds):
+        """Record a request."""
+        with self._lock:
+            self.calls[(method, route)] += 1
+            self.statuses[(method, route, status)] += 1
+            self.latencies[(method, route)].append(seconds)
+
+    def reset_stats(self):
+        """Forget the requests recorded so far."""
+        with self._lock:
+            self.calls.clear()
+            self.statuses.clear()
+            self.latencies.clear()
+
+    def handle(self, method, path, query, headers, body):
+        """Handle a request, adding the latency and failures of the fault profile.
+        Returns:
+            tuple: The name of the route, and the Response.
+        """
+        route, handler = self.route(method, path)
+        delay, failure = self.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if handler is None:
+            return route, Response(404)
+        if failure == 429:
+            return route, Response(429, headers={'Retry-After': str(self.faults.retry_after)})
+        if failure:
+            return route, Response(failure)
+        with self._lock:
+            return route, handler(method, path, query, headers, body)
+
+    def route(self, method, path):
+        """Find the handler of a request.
+        Returns:
+            tuple: The name of the route, and a function handling the request
+                or None if there is no such route.
+        """
+        raise NotImplementedError
+
+
+def _digest(*parts):
+    return 'sha256:' + hashlib.sha256('/'.join(parts).encode()).hexdigest()
+
+
+class FakeRegistry(FakeService):
+    """The Docker registry v2 API: resolving tags, listing tags, and deleting manifests."""
+
+    def __init__(self, faults=None, page_size=100):
+        super().__init__(faults)
+        self.page_size = page_size
+        # The tags of each image, and the digest each tag refers to.
+        self.images = defaultdict(dict)
+
+    def add_image(self, name, tag, digest=None):
+        """Add a tag of an image. Tags of the same name and tag share a manifest by default."""
+        with self._lock:
+            self.images[name][tag] = digest or _digest(name, tag)
+
+    def route(self, method, path):
+        if not path.startswith('/v2/'):
+            return 'unknown', None
+        name, _, rest = path[len('/v2/'):].rpartition('/manifests/')
+        if name and method in ('HEAD', 'GET'):
+            return 'manifest', lambda *args: self._get_manifest(name, rest)
+        if name and method == 'DELETE':
+            return 'delete-manifest', lambda *args: self._delete_manifest(name, rest)
+        if path.endswith('/tags/list') and method == 'GET':
+            return 'tags', lambda method, path, query, *args: self._tags(path[len('/v2/'):-len('/tags/list')], query)
+        return 'unknown', None
+
+    def _get_manifest(self, name, reference):
+        tags = self.images.get(name, {})
+        digest = reference if reference in tags.values() else tags.get(reference)
+        if digest is None:
+            return Response(404)
+        return Response(200, headers={'Docker-Content-Digest': digest})
+
+    def _delete_manifest(self, name, digest):
+        tags = self.images.get(name, {})
+        removed = [tag for tag, tag_digest in tags.items() if tag_digest == digest]
+        if not removed:
+            return Response(404)
+        for tag in removed:
+            del tags[tag]
+        return Response(202)
+
+    def _tags(self, name, query):
+        if name not in self.images:
+            return Response(404)
+        tags = sorted(self.images[name])
+        count = int(query.get('n', [self.page_size])[0])
+        last = query.get('last', [None])[0]
+        if last is not None:
+            tags = [tag for tag in tags if tag > last]
+        headers = {}
+        if len(tags) > count:
+            headers['Link'] = f'</v2/{name}/tags/list?n={count}&last={tags[count - 1]}>; rel="next"'
+        return Response.json(200, {'name': name, 'tags': tags[:count]}, headers)
+
+
+class FakeNexus(FakeService):
+    """The Nexus REST API: paginated components, assets and search, and repository removal."""
+
+    def __init__(self, faults=None, page_size=100):
+        super().__init__(faults)
+        self.page_size = page_size
+        self.repositories = {}
+        # The components of each repository by ID.
+        self.components = defaultdict(dict)
+
+    def add_repository(self, name, repository_type='hosted', repository_format='raw'):
+        """Add a repository."""
+        with self._lock:
+            self.repositories[name] = {'name': name, 'type': repository_type, 'format': repository_format}
+
+    def add_component(self, repository, name, version, size=1024):
+        """Add a component with a single asset, returning its ID."""
+        with self._lock:
+            component_id = hashlib.sha1(f'{repository}/{name}/{version}'.encode()).hexdigest()
+            self.components[repository][component_id] = {
+                'id': component_id, 'repository': repository, 'name': name, 'version': version,
+                'assets': [{'id': component_id, 'path': f'{name}-{version}.tgz', 'fileSize': size}],
+            }
+            return component_id
+
+    def route(self, method, path):
+        path = path[len('/service/rest'):] if path.startswith('/service/rest') else path
+        if path == '/v1/repositories' and method == 'GET':
+            return 'repositories', lambda *args: Response.json(200, list(self.repositories.values()))
+        if path.startswith('/v1/repositories/') and method == 'DELETE':
+            return 'delete-repository', lambda *args: self._delete_repository(path[len('/v1/repositories/'):])
+        if path.startswith('/v1/components/') and method == 'DELETE':
+            return 'delete-component', lambda *args: self._delete_component(path[len('/v1/components/'):])
+        for resource in ('components', 'assets', 'search'):
+            if path == f'/v1/{resource}' and method == 'GET':
+                return resource, lambda method, path, query, *args: self._page(resource, query)
+        return 'unknown', None
+
+    def _delete_repository(self, name):
+        if self.repositories.pop(name, None) is None:
+            return Response(404)
+        self.components.pop(name, None)
+        return Response(204)
+
+    def _delete_component(self, component_id):
+        for components in self.components.values():
+            if components.pop(component_id, None) is not None:
+                return Response(204)
+        return Response(404)
+
+    def _page(self, resource, query):
+        repository = query.get('repository', [None])[0]
+        if repository not in self.repositories:
+            return Response.json(404, {'message': f'Repository not found: {repository}'})
+        items = sorted(self.components[repository].values(), key=lambda component: component['id'])
+        if resource == 'search':
+            items = [component for component in items
+                     if component['name'] == query.get('name', [None])[0]
+                     and component['version'] == query.get('version', [None])[0]]
+        elif resource == 'assets':
+            items = [asset for component in items for asset in component['assets']]
+        start = int(query.get('continuationToken', ['0'])[0])
+        page = items[start:start + self.page_size]
+        token = str(start + self.page_size) if start + self.page_size < len(items) else None
+        return Response.json(200, {'items': page, 'continuationToken': token})
+
+
+class FakeS3(FakeService):
+    """The S3 ListObjectsV2, GetObject and DeleteObjects APIs with path-style addressing."""
+
+    def __init__(self, faults=None, page_size=1000):
+        super().__init__(faults)
+        self.page_size = page_size
+        # The content of each object of each bucket.
+        self.buckets = defaultdict(dict)
+
+    def add_object(self, bucket, key, body=b''):
+        """Add an object."""
+        with self._lock:
+            self.buckets[bucket][key] = body
+
+    def route(self, method, path):
+        bucket, _, key = path.lstrip('/').partition('/')
+        if bucket and key and method == 'GET':
+            return 'get-object', lambda *args: self._get(bucket, key)
+        if not bucket or key:
+            return 'unknown', None
+        if method == 'GET':
+            return 'list-objects', lambda method, path, query, *args: self._list(bucket, query)
+        if method == 'POST':
+            return 'delete-objects', lambda method, path, query, headers, body: self._delete(bucket, body)
+        return 'unknown', None
+
+    def _list(self, bucket, query):
+        if bucket not in self.buckets:
+            return Response(404, f'<Error><Code>NoSuchBucket</Code><BucketName>{escape(bucket)}</BucketName></Error>')
+        keys = sorted(self.buckets[bucket])
+        start = int(query.get('continuation-token', ['0'])[0])
+        count = min(int(query.get('max-keys', [self.page_size])[0]), self.page_size)
+        page = keys[start:start + count]
+        truncated = start + count < len(keys)
+        contents = ''.join(f'<Contents><Key>{escape(key)}</Key><Size>1024</Size></Contents>' for key in page)
+        next_token = f'<NextContinuationToken>{start + count}</NextContinuationToken>' if truncated else ''
+        return Response(200, f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="{S3_NAMESPACE}">'
+                             f'<Name>{escape(bucket)}</Name><KeyCount>{len(page)}</KeyCount>'
+                             f'<IsTruncated>{str(truncated).lower()}</IsTruncated>{next_token}{contents}'
+                             f'</ListBucketResult>', {'Content-Type': 'application/xml'})
+
+    def _get(self, bucket, key):
+        body = self.buckets.get(bucket, {}).get(key)
+        if body is None:
+            return Response(404, f'<Error><Code>NoSuchKey</Code><Key>{escape(key)}</Key></Error>',
+                            {'Content-Type': 'application/xml'})
+        return Response(200, body, {'Content-Type': 'application/octet-stream'})
+
+    def _delete(self, bucket, body):
+        root = ElementTree.fromstring(body)
+        keys = [element.text for element in root.iter() if element.tag.split('}')[-1] == 'Key']
+        for key in keys:
+            self.buckets[bucket].pop(key, None)
+        # A quiet DeleteObjects request only reports errors, and deleting a
+        # missing key is not an error.
+        return Response(200, f'<?xml version="1.0" encoding="UTF-8"?><DeleteResult xmlns="{S3_NAMESPACE}">'
+                             f'</DeleteResult>', {'Content-Type': 'application/xml'})
+
+
+class FakeApiGateway(FakeService):
+    """The API gateway routes of the STS token service and the IMS v3 API."""
+
+    def __init__(self, s3_url, faults=None):
+        """Create the gateway.
+        Args:
+            s3_url (str): The S3 endpoint returned with STS credentials.
+            faults (FaultProfile): The latency and failures to add to requests.
+        """
+        super().__init__(faults)
+        self.s3_url = s3_url
+        self.sts_expiration = '2099-01-01T00:00:00Z'
+        self.ims = {'images': {}, 'recipes': {}}
+
+    def add_ims_record(self, kind, ims_id, name, link=None):
+        """Add an IMS image or recipe.
+        Args:
+            kind (str): 'images' or 'recipes'.
+            ims_id (str): The IMS ID.
+            name (str): The name of the image or recipe.
+            link (tuple): The (bucket, key) of the manifest of an image or
+                the archive of a recipe, or None for a record without a link.
+        """
+        with self._lock:
+            self.ims[kind][ims_id] = {'id': ims_id, 'name': name}
+            if link:
+                self.ims[kind][ims_id]['link'] = {'type': 's3', 'path': f's3://{link[0]}/{link[1]}', 'etag': ''}
+
+    def route(self, method, path):
+        if path == '/apis/sts/token' and method == 'PUT':
+            return 'sts-token', self._authenticated(self._token)
+        for kind in self.ims:
+            prefix = f'/apis/ims/v3/{kind}'
+            if path.rstrip('/') == prefix and method == 'GET':
+                return f'list-{kind}', self._authenticated(
+                    lambda *args: Response.json(200, list(self.ims[kind].values())))
+            if path.startswith(f'{prefix}/'):
+                ims_id = path[len(prefix) + 1:]
+                if method == 'GET':
+                    return f'get-{kind}', self._authenticated(lambda *args: self._get_record(kind, ims_id))
+                if method == 'DELETE':
+                    return f'delete-{kind}', self._authenticated(lambda *args: self._delete_record(kind, ims_id))
+        return 'unknown', None
+
+    @staticmethod
+    def _authenticated(handler):
+        """Reject requests to a route without an API gateway token."""
+        def handle(method, path, query, headers, body):
+            if not (headers.get('Authorization') or '').startswith('Bearer '):
+                return Response(401)
+            return handler(method, path, query, headers, body)
+        return handle
+
+    def _token(self, method, path, query, headers, body):
+        return Response.json(200, {'Credentials': {
+            'EndpointURL': self.s3_url, 'AccessKeyId': 'benchmark', 'SecretAccessKey': 'benchmark',
+            'SessionToken': 'benchmark', 'Expiration': self.sts_expiration,
+        }})
+
+    def _get_record(self, kind, ims_id):
+        record = self.ims[kind].get(ims_id)
+        if record is None:
+            return Response.json(404, {'title': 'Not Found'})
+        return Response.json(200, record)
+
+    def _delete_record(self, kind, ims_id):
+        if self.ims[kind].pop(ims_id, None) is None:
+            return Response.json(404, {'title': 'Not Found', 'detail': f'{kind} not found'})
+        return Response(204)
+
+
+def percentile(samples, fraction):
+    """Get a percentile of a list of samples by the nearest rank method.
+    Args:
+        samples (list): The samples.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+    Returns:
+        float: The percentile, or 0 if there are no samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
@@ -0,0 +1,118 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Generator of synthetic product catalogs for benchmarks.
+
+Every product version has the same number of Docker images, Helm charts and
+S3 artifacts, a share of which comes from a pool common to every product, as
+components of a shared platform do. Each version also has a loftsman
+manifest, a hosted repository, an IMS image and an IMS recipe of its own.
+"""
+
+import random
+import uuid
+
+import yaml
+
+# The share of the components of a product version which are Docker images,
+# Helm charts and S3 artifacts.
+DOCKER_SHARE = 0.6
+HELM_SHARE = 0.2
+
+
+def _split(count):
+    """Split a number of components into Docker images, Helm charts and S3 artifacts."""
+    docker_count = int(round(count * DOCKER_SHARE))
+    helm_count = min(count - docker_count, int(round(count * HELM_SHARE)))
+    return docker_count, helm_count, count - docker_count - helm_count
+
+
+def _pick(rng, own, shared_pool, count, share_ratio):
+    """Choose the components of a product version from its own and the shared ones."""
+    shared_count = min(len(shared_pool), int(round(count * share_ratio)))
+    return rng.sample(shared_pool, shared_count) + own[:count - shared_count]
+
+
+def synthetic_version(rng, product, version, components, share_ratio):
+    """Create the catalog data of one product version.
+    Args:
+        rng (random.Random): The source of the shared components chosen and the IMS IDs.
+        product (str): The name of the product.
+        version (str): The version of the product.
+        components (int): The number of Docker images, Helm charts and S3 artifacts.
+        share_ratio (float): The share of those components which are shared.
+    Returns:
+        dict: The catalog data of the product version.
+    """
+    docker_count, helm_count, s3_count = _split(components)
+    docker = _pick(
+        rng, [{'name': f'cray/{product}-{n}', 'version': version} for n in range(docker_count)],
+        [{'name': f'cray/platform-{n}', 'version': '1.0.0'} for n in range(docker_count)],
+        docker_count, share_ratio)
+    helm = _pick(
+        rng, [{'name': f'{product}-{n}', 'version': version} for n in range(helm_count)],
+        [{'name': f'platform-{n}', 'version': '1.0.0'} for n in range(helm_count)],
+        helm_count, share_ratio)
+    s3 = _pick(
+        rng, [{'bucket': 'boot-images', 'key': f'{product}/{version}/artifact-{n}'} for n in range(s3_count)],
+        [{'bucket': 'boot-images', 'key': f'platform/1.0.0/artifact-{n}'} for n in range(s3_count)],
+        s3_count, share_ratio)
+    image_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    recipe_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    return {
+        'component_versions': {
+            'docker': docker,
+            'helm': helm,
+            's3': s3,
+            'manifests': [f'config-data/argo/loftsman/{product}/{version}/manifests/{product}.yaml'],
+            'repositories': [{'name': f'{product}-{version}-sle-15sp4', 'type': 'hosted'},
+                             {'name': f'{product}-sle-15sp4', 'type': 'group',
+                              'members': [f'{product}-{version}-sle-15sp4']}],
+        },
+        'images': {f'{product}-{version}-image': {'id': image_id}},
+        'recipes': {f'{product}-{version}-recipe': {'id': recipe_id}},
+    }
+
+
+def synthetic_catalog(products, components, share_ratio=0.2, versions=1, seed=0):
+    """Create the data of a product catalog ConfigMap.
+    Args:
+        products (int): The number of products.
+        components (int): The number of Docker images, Helm charts and S3
+            artifacts of each product version.
+        share_ratio (float): The share of those components which are shared
+            with other products, from 0 to 1.
+        versions (int): The number of versions of each product.
+        seed (int): The seed of the random choices, so catalogs are repeatable.
+    Returns:
+        dict: The YAML document of each product's versions, by product name.
+    """
+    rng = random.Random(seed)
+    return {
+        f'product-{index:04d}': yaml.safe_dump({
+            f'{minor}.0.0': synthetic_version(rng, f'product-{index:04d}', f'{minor}.0.0', components, share_ratio)
+            for minor in range(1, versions + 1)
+        }, default_flow_style=False)
+        for index in range(products)
+    }
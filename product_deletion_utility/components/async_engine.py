@@ -0,0 +1,348 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+An asyncio engine for removing the components of a product version.
+"""
+
+import asyncio
+import logging
+import os
+import ssl
+import subprocess
+import threading
+
+import aiohttp
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ims import IMS_IMAGES, IMS_RECIPES
+from product_deletion_utility.components.metrics import METRICS
+from product_deletion_utility.components.nexus import nexus_auth, nexus_rest_url
+from product_deletion_utility.components.ownership import (
+    COMPONENT_BACKENDS,
+    DOCKER_BACKEND,
+    DOCKER_IMAGE,
+    S3_ARTIFACT,
+    S3_BACKEND,
+    HELM_CHART,
+    IMS_BACKEND,
+    IMS_RECIPE,
+    IMS_IMAGE,
+    HOSTED_REPO,
+    NEXUS_BACKEND,
+)
+from product_deletion_utility.components.registry import MANIFEST_MEDIA_TYPES, is_digest, registry_api_url
+from product_deletion_utility.components.retry import async_call_with_retry, host_of
+from product_deletion_utility.components.s3 import CrayCliS3Backend, batch_keys
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+
+class AsyncDeletionEngine():
+    """Remove components with asyncio rather than a thread per request.
+    The engine runs an event loop in a background thread. The removal phases
+    submit their items with remove(), and the requests of every phase share
+    one pool of HTTP connections, so hundreds of deletions may be in flight
+    at once. The number of concurrent deletions per backend is bounded by a
+    semaphore. Requests are retried, and limited per host, with the same
+    policy and limiters as the threads engine. cray CLI commands are run
+    with asyncio subprocesses, and the blocking S3 and IMS clients in the
+    default executor.
+    """
+
+    def __init__(self, docker_url, nexus_url, s3_backend, concurrency, ims_client=None, auth=None,
+                 metrics=None):
+        """Create the engine and start its event loop.
+        Args:
+            docker_url (str): The base URL of the Docker registry.
+            nexus_url (str): The base URL of Nexus.
+            s3_backend (ClientS3Backend, CrayCliS3Backend or callable): The
+                backend used to delete S3 objects, or a function returning it
+                which is called the first time S3 is used.
+            concurrency (dict): The maximum number of concurrent deletions for
+                each of the 'docker', 'nexus', 's3' and 'ims' backends.
+            ims_client (ImsClient or callable): The client used to delete IMS
+                images and recipes, or a function returning it which is
+                called the first time IMS is used.
+            auth (tuple): The (username, password) of the Docker registry
+                and Nexus. Defaults to the NEXUS_USERNAME and NEXUS_PASSWORD
+                environment variables.
+            metrics (Metrics): Where to record removals and requests.
+                Defaults to METRICS.
+        """
+        self.docker_url = registry_api_url(docker_url)
+        self.nexus_url = nexus_rest_url(nexus_url)
+        self._s3_backend = s3_backend
+        self._ims_client = ims_client
+        self._auth = auth or nexus_auth()
+        self.concurrency = concurrency
+        self.metrics = metrics or METRICS
+        self._removers = {
+            DOCKER_IMAGE: self._delete_docker_image,
+            HELM_CHART: self._delete_helm_chart,
+            HOSTED_REPO: self._delete_hosted_repo,
+            S3_ARTIFACT: self._delete_s3_objects,
+            IMS_IMAGE: self._delete_ims_image,
+            IMS_RECIPE: self._delete_ims_recipe,
+        }
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='async-deletion-engine', daemon=True)
+        self._thread.start()
+        self._run(self._open())
+
+    @property
+    def s3_backend(self):
+        """ClientS3Backend or CrayCliS3Backend: The backend used to delete S3 objects."""
+        if callable(self._s3_backend):
+            self._s3_backend = self._s3_backend()
+        return self._s3_backend
+
+    @s3_backend.setter
+    def s3_backend(self, s3_backend):
+        self._s3_backend = s3_backend
+
+    @property
+    def ims_client(self):
+        """ImsClient: The client used to delete IMS images and recipes."""
+        if callable(self._ims_client):
+            self._ims_client = self._ims_client()
+        return self._ims_client
+
+    @ims_client.setter
+    def ims_client(self, ims_client):
+        self._ims_client = ims_client
+
+    def _run(self, coroutine):
+        """Run a coroutine on the engine's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _open(self):
+        """Create the HTTP session and per-backend semaphores on the event loop."""
+        ssl_context = ssl.create_default_context(cafile=os.environ.get('REQUESTS_CA_BUNDLE'))
+        connector = aiohttp.TCPConnector(limit=sum(self.concurrency.values()), ssl=ssl_context)
+        self._session = aiohttp.ClientSession(
+            connector=connector, auth=aiohttp.BasicAuth(*self._auth) if self._auth else None,
+            trace_configs=[self._trace_config()])
+        self._semaphores = {
+            backend: asyncio.Semaphore(max(1, limit)) for backend, limit in self.concurrency.items()
+        }
+
+    def _trace_config(self):
+        """Create a trace configuration which records every request in the engine's metrics."""
+        def request_backend(params):
+            return DOCKER_BACKEND if str(params.url).startswith(self.docker_url) else NEXUS_BACKEND
+
+        async def on_request_start(session, context, params):
+            context.start = self.loop.time()
+
+        async def on_request_end(session, context, params):
+            self.metrics.record_request(
+                request_backend(params), params.method, self.loop.time() - context.start,
+                params.response.status, params.response.content_length or 0)
+
+        async def on_request_exception(session, context, params):
+            self.metrics.record_request(
+                request_backend(params), params.method, self.loop.time() - context.start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def close(self):
+        """Close the HTTP session and stop the event loop.
+        Returns:
+            None
+        """
+        self._run(self._session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def remove(self, component_type, items):
+        """Remove components of a single type.
+        A failure for one item does not prevent the remaining items being removed.
+        Args:
+            component_type (str): One of the component type constants in
+                product_deletion_utility.components.ownership.
+            items (list): The items to remove, in the same form as they are
+                passed to the methods of UninstallComponents.
+        Returns:
+            list: (item, ProductInstallException) tuples for the items which
+                failed, in the same order as the given items.
+        """
+        if not items:
+            return []
+        return self._run(self._remove(component_type, items))
+
+    async def _remove(self, component_type, items):
+        remover = self._removers[component_type]
+        semaphore = self._semaphores[COMPONENT_BACKENDS[component_type]]
+
+        async def remove_item(item):
+            async with semaphore:
+                try:
+                    with self.metrics.removal(component_type):
+                        await remover(item)
+                except ProductInstallException as err:
+                    return err
+                except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                    return ProductInstallException(f'Request failed: {err!r}')
+            return None
+
+        results = await asyncio.gather(*(remove_item(item) for item in items))
+        return [(item, err) for item, err in zip(items, results) if err is not None]
+
+    @staticmethod
+    def _already_removed(response, description):
+        """Check the response to a request made while removing a component.
+        Args:
+            response (aiohttp.ClientResponse): The response.
+            description (str): The component, used in messages.
+        Returns:
+            bool: True if the component did not exist.
+        Raises:
+            ProductInstallException: If the request failed.
+        """
+        if response.status == 404:
+            d_logger.warning(f'{description} has already been removed')
+            return True
+        if response.status >= 400:
+            raise ProductInstallException(
+                f'Failed to remove {description}: HTTP {response.status} {response.reason}')
+        return False
+
+    async def _request(self, backend, method, url, **kwargs):
+        """Make a request, retrying transient failures.
+        Args:
+            backend (str): The backend the request is made to.
+            method (str): The HTTP method.
+            url (str): The URL.
+            kwargs: Passed to aiohttp.ClientSession.request.
+        Returns:
+            aiohttp.ClientResponse: The last response, whose body has been read.
+        """
+        async def call():
+            async with self._session.request(method, url, **kwargs) as response:
+                await response.read()
+                return response
+        return await async_call_with_retry(
+            call, host_of(url), backend, method,
+            transient_errors=(aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+    async def _delete_docker_image(self, image):
+        image_name, image_version = image
+        manifests_url = f'{self.docker_url}/{image_name}/manifests'
+        if is_digest(image_version):
+            # The tag was already resolved, e.g. by plan_manifest_deletions.
+            docker_image_short_name = f'{image_name}@{image_version}'
+            digest = image_version
+        else:
+            docker_image_short_name = f'{image_name}:{image_version}'
+            response = await self._request(DOCKER_BACKEND, 'HEAD', f'{manifests_url}/{image_version}',
+                                           headers={'Accept': MANIFEST_MEDIA_TYPES})
+            if self._already_removed(response, docker_image_short_name):
+                return
+            digest = response.headers.get('Docker-Content-Digest')
+        if not digest:
+            raise ProductInstallException(
+                f'Failed to remove image {docker_image_short_name}: the registry did not return a digest')
+        response = await self._request(DOCKER_BACKEND, 'DELETE', f'{manifests_url}/{digest}')
+        if self._already_removed(response, docker_image_short_name):
+            return
+        d_logger.info(f'Successfully removed the docker image {docker_image_short_name}')
+
+    async def _delete_helm_chart(self, chart):
+        chart_name, chart_version, component_id = chart
+        helm_chart_short_name = f'Helm chart {chart_name}:{chart_version}'
+        response = await self._request(NEXUS_BACKEND, 'DELETE', f'{self.nexus_url}/v1/components/{component_id}')
+        if self._already_removed(response, helm_chart_short_name):
+            return
+        d_logger.info(f'Successfully removed the helm chart {chart_name}:{chart_version}')
+
+    async def _delete_hosted_repo(self, hosted_repo_name):
+        response = await self._request(NEXUS_BACKEND, 'DELETE', f'{self.nexus_url}/v1/repositories/{hosted_repo_name}')
+        if self._already_removed(response, hosted_repo_name):
+            return
+        d_logger.info(f'Successfully removed the repository {hosted_repo_name}')
+
+    @staticmethod
+    async def _run_cray(*args):
+        """Run a cray CLI command.
+        Returns:
+            tuple: The exit code and the combined stdout and stderr.
+        """
+        process = await asyncio.create_subprocess_exec(
+            'cray', *args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = await process.communicate()
+        return process.returncode, output.decode(errors='replace')
+
+    async def _delete_s3_objects(self, batch):
+        bucket, keys = batch
+        if not isinstance(self.s3_backend, CrayCliS3Backend):
+            # A batch is a single DeleteObjects request for up to 1000 keys,
+            # so it is cheap to hand it to the default executor.
+            await self.loop.run_in_executor(None, self.s3_backend.delete_objects, bucket, keys)
+            return
+        for key in keys:
+            returncode, output = await self._run_cray('artifacts', 'delete', bucket, key)
+            if returncode == 0:
+                d_logger.info(f'Successfully removed the artifact {bucket}:{key}')
+            elif 'not found' in output:
+                self.metrics.record_not_found(S3_BACKEND, 'DeleteObject')
+                d_logger.warning(f'Artifact {key} not available in S3 bucket - {bucket}')
+            else:
+                raise ProductInstallException(
+                    f'Failed to remove S3 artifacts {bucket}:{key} with error: {output}')
+
+    async def _delete_ims_object(self, ims_type, name, ims_id, s3_objects):
+        """Remove an IMS image or recipe from S3 and then from IMS.
+        Args:
+            ims_type (str): IMS_IMAGES or IMS_RECIPES.
+            name (str): The name of the image or recipe.
+            ims_id (str): The IMS ID of the image or recipe.
+            s3_objects (list): The (bucket, key) tuples of its S3 objects.
+        """
+        description = f'IMS {ims_type[:-1]} {name}'
+        if not s3_objects:
+            d_logger.warning(f'S3 key could not be retrieved for {ims_type[:-1]} ID - {ims_id}')
+            return
+        try:
+            for batch in batch_keys(s3_objects, self.s3_backend.batch_size):
+                await self._delete_s3_objects(batch)
+        except ProductInstallException as err:
+            raise ProductInstallException(f'Failed to remove {description} with error: {err}')
+        d_logger.info(f'Successfully deleted {ims_type[:-1]} - {name} from S3')
+
+        if await self.loop.run_in_executor(None, self.ims_client.delete_record, ims_type, ims_id):
+            d_logger.info(f'Successfully deleted {ims_type[:-1]} - {name} from IMS')
+        else:
+            self.metrics.record_not_found(IMS_BACKEND, 'DELETE')
+            d_logger.warning(f'{description} has already been removed from IMS')
+
+    async def _delete_ims_image(self, image):
+        await self._delete_ims_object(IMS_IMAGES, *image)
+
+    async def _delete_ims_recipe(self, recipe):
+        await self._delete_ims_object(IMS_RECIPES, *recipe)
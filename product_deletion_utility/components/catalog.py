@@ -0,0 +1,244 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Parsing of the product catalog ConfigMap, one product at a time as needed.
+"""
+
+import logging
+
+from yaml import YAMLError, load
+try:
+    # libyaml is several times faster than the pure Python parser.
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ownership import (
+    DOCKER_IMAGE,
+    HELM_CHART,
+    HOSTED_REPO,
+    IMS_IMAGE,
+    IMS_RECIPE,
+    S3_ARTIFACT,
+    product_component_keys,
+)
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+# The element of the key of each type of shareable component which appears
+# verbatim in the YAML document of every product version owning the component:
+# the image, chart, recipe, image or repository name, or the S3 object key.
+COMPONENT_KEY_TOKENS = {
+    DOCKER_IMAGE: 0,
+    S3_ARTIFACT: 1,
+    HELM_CHART: 0,
+    IMS_RECIPE: 0,
+    IMS_IMAGE: 0,
+    HOSTED_REPO: 0,
+}
+
+
+def found_verbatim(token):
+    """Check whether a token is written verbatim by every YAML representation of a string containing it.
+    Quoting a scalar adds delimiters around it, but only changes its
+    characters with escapes in a double-quoted scalar, which start with a
+    backslash, or by doubling a single quote in a single-quoted scalar.
+    Folding a scalar over several lines only breaks it at whitespace.
+    Args:
+        token (str): The token.
+    Returns:
+        bool: True if a YAML document without a backslash owns the token only
+            if it contains the token as text.
+    """
+    return not any(character.isspace() or character == "'" for character in token)
+
+
+def load_yaml(text):
+    """Parse a YAML document with the fastest safe loader available.
+    Args:
+        text (str): The YAML document.
+    Returns:
+        The parsed document.
+    Raises:
+        YAMLError: If the document is not valid YAML.
+    """
+    return load(text, Loader=SafeLoader)
+
+
+def component_tokens(products):
+    """Get the strings which a product version owning a component of the given ones must contain.
+    Args:
+        products (list): InstalledProductVersion objects.
+    Returns:
+        set: The identifying element of the key of every shareable component
+            of the product versions.
+    """
+    return {
+        str(key[COMPONENT_KEY_TOKENS[component_type]])
+        for product in products
+        for component_type, key in product_component_keys(product)
+    }
+
+
+def merge_versions(versions, split_versions):
+    """Merge the versions of a product from its product-specific ConfigMap into those from the catalog.
+    The catalog ConfigMap lists the installed versions, so data for any other
+    version, e.g. left behind by an interrupted deletion, is ignored.
+    Args:
+        versions (dict): The data of each version from the catalog ConfigMap.
+        split_versions (dict): The data of each version from the
+            product-specific ConfigMap of a split catalog, e.g. its
+            component_versions.
+    Returns:
+        dict: The merged data of each version.
+    """
+    return {
+        version: dict(version_data or {}, **(split_versions.get(version) or {}))
+        for version, version_data in versions.items()
+    }
+
+
+class CatalogDocuments():
+    """The YAML documents of the product catalog ConfigMap, one per product,
+    each parsed into InstalledProductVersion objects the first time one of
+    its versions is needed.
+    """
+
+    def __init__(self, configmap_data, product_factory, split_data=None):
+        """Create the documents.
+        Args:
+            configmap_data (dict): The data of the ConfigMap, mapping the name
+                of each product to a YAML document of its versions.
+            product_factory (callable): Creates a product version from its
+                name, version and data, e.g. InstalledProductVersion.
+            split_data (dict): The data of the product-specific ConfigMaps of
+                a split catalog, in the same form as configmap_data. The
+                versions in them are merged into those in configmap_data.
+        """
+        self._documents = dict(configmap_data)
+        self._split_documents = dict(split_data or {})
+        self._product_factory = product_factory
+        self._parsed = {}
+        # Whether products were parsed since the documents were last stored.
+        self.changed = True
+
+    @property
+    def product_names(self):
+        """list: The name of every product in the catalog."""
+        return list(self._documents)
+
+    def _texts(self, product_name):
+        """Get the unparsed documents of a product.
+        Args:
+            product_name (str): The name of the product.
+        Returns:
+            tuple: The documents from the catalog ConfigMap and from the
+                product-specific ConfigMap, either of which may be None.
+        """
+        return self._documents.get(product_name), self._split_documents.get(product_name)
+
+    def product_versions(self, product_name):
+        """Get the versions of a product.
+        Args:
+            product_name (str): The name of the product.
+        Returns:
+            list: The InstalledProductVersion objects of the product, or an
+                empty list if the product is not in the catalog.
+        Raises:
+            ProductInstallException: If the document of the product is not valid YAML.
+        """
+        if product_name not in self._parsed:
+            document, split_document = self._texts(product_name)
+            if document is None:
+                return []
+            try:
+                versions = load_yaml(document) or {}
+                if split_document is not None:
+                    versions = merge_versions(versions, load_yaml(split_document) or {})
+            except YAMLError as err:
+                raise ProductInstallException(
+                    f'Failed to parse the product catalog entry of {product_name}: {err}')
+            self._parsed[product_name] = [
+                self._product_factory(product_name, version, version_data)
+                for version, version_data in versions.items()
+            ]
+            self.changed = True
+        return self._parsed[product_name]
+
+    @property
+    def products(self):
+        """list: Every InstalledProductVersion in the catalog, parsing every document."""
+        return [
+            product
+            for product_name in self.product_names
+            for product in self.product_versions(product_name)
+        ]
+
+    def products_mentioning(self, tokens):
+        """Get the versions of the products which may own a component identified by any of the given strings.
+        Documents are searched as text, so a document which cannot own a
+        component identified by one of the strings is never parsed. A
+        document which does not contain a string as text, but could still
+        mention it written differently, e.g. with escapes, is parsed and its
+        parsed components compared instead.
+        Args:
+            tokens (iterable): The strings to search for.
+        Returns:
+            list: The InstalledProductVersion objects of the matching products.
+        """
+        tokens = {token for token in tokens if token}
+        verbatim = all(found_verbatim(token) for token in tokens)
+        products = []
+        for product_name in self.product_names:
+            documents = [document for document in self._texts(product_name) if document]
+            if any(token in document for token in tokens for document in documents):
+                products.extend(self.product_versions(product_name))
+            elif not verbatim or any('\\' in document for document in documents):
+                versions = self.product_versions(product_name)
+                if tokens.intersection(component_tokens(versions)):
+                    products.extend(versions)
+        return products
+
+    def updated(self, configmap_data, split_data=None):
+        """Get the documents of a new version of the catalog.
+        The parsed versions of the products whose documents did not change
+        are kept, so only the changed products are parsed again.
+        Args:
+            configmap_data (dict): The data of the new version of the ConfigMap.
+            split_data (dict): The data of the new versions of the
+                product-specific ConfigMaps.
+        Returns:
+            tuple: The new CatalogDocuments, and the set of the names of the
+                products which were added, changed or removed.
+        """
+        documents = CatalogDocuments(configmap_data, self._product_factory, split_data)
+        changed = set()
+        for product_name in set(self._documents).union(self._split_documents, documents._documents,
+                                                       documents._split_documents):
+            if self._texts(product_name) != documents._texts(product_name):
+                changed.add(product_name)
+            elif product_name in self._parsed:
+                documents._parsed[product_name] = self._parsed[product_name]
+        return documents, changed
@@ -0,0 +1,112 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+A cache on local disk of the parsed product catalog.
+"""
+
+import logging
+import os
+import pickle
+import re
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+# Incremented whenever the layout of a snapshot changes, invalidating older snapshots.
+SNAPSHOT_FORMAT = 3
+
+
+class CatalogSnapshotCache():
+    """Snapshots of the parsed product catalog, keyed by the resourceVersion
+    of the product catalog ConfigMap.
+    A snapshot is only returned for the resourceVersion it was taken at, so
+    any change to the ConfigMap, including removing a product version's entry,
+    invalidates it. Snapshots are pickled, so they are only loaded from a
+    directory and file which no other user can write to.
+    """
+
+    def __init__(self, cache_dir, name, namespace):
+        """Create the cache.
+        Args:
+            cache_dir (str): The directory holding snapshots. It is created
+                if it does not exist.
+            name (str): The name of the product catalog ConfigMap.
+            namespace (str): The namespace of the product catalog ConfigMap.
+        """
+        self.cache_dir = cache_dir
+        file_name = re.sub(r'[^A-Za-z0-9._-]', '_', f'{namespace}-{name}')
+        self.path = os.path.join(cache_dir, f'catalog-{file_name}.pickle')
+
+    @staticmethod
+    def _is_private(path):
+        """Check that a path is owned by this user and not writable by others."""
+        status = os.stat(path)
+        return status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+    def load(self, resource_version):
+        """Load the snapshot taken at a resourceVersion.
+        Args:
+            resource_version (str): The current resourceVersion of the ConfigMap.
+        Returns:
+            CatalogDocuments or None: The catalog, or None if there is no
+                valid snapshot for the resourceVersion.
+        """
+        try:
+            if not (self._is_private(self.cache_dir) and self._is_private(self.path)):
+                d_logger.warning(f'Ignoring catalog snapshot {self.path} which other users may modify')
+                return None
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as err:
+            # A truncated snapshot, or one of classes which have since changed.
+            d_logger.warning(f'Ignoring unreadable catalog snapshot {self.path}: {err}')
+            return None
+        if snapshot.get('format') != SNAPSHOT_FORMAT or snapshot.get('resource_version') != resource_version:
+            d_logger.debug(f'Catalog snapshot {self.path} is out of date')
+            return None
+        d_logger.debug(f'Loaded the product catalog at resourceVersion {resource_version} from {self.path}')
+        return snapshot['catalog']
+
+    def store(self, resource_version, catalog):
+        """Store a snapshot of the catalog.
+        Failing to store a snapshot is logged but is not an error.
+        Args:
+            resource_version (str): The resourceVersion of the ConfigMap the
+                catalog was read from.
+            catalog (CatalogDocuments): The catalog, with the products parsed so far.
+        Returns:
+            None
+        """
+        snapshot = {'format': SNAPSHOT_FORMAT, 'resource_version': resource_version, 'catalog': catalog}
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            # Written to a private temporary file and renamed, so the snapshot
+            # is never read partially written.
+            temporary_path = f'{self.path}.{os.getpid()}.tmp'
+            with os.fdopen(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, self.path)
+        except (OSError, pickle.PicklingError) as err:
+            d_logger.warning(f'Unable to store a snapshot of the product catalog in {self.path}: {err}')
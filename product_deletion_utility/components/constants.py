@@ -23,13 +23,30 @@
 """
 Contains constant values for product-deletion-utility
 """
-from nexusctl.common import DEFAULT_DOCKER_REGISTRY_API_BASE_URL
-from nexusctl.common import DEFAULT_NEXUS_API_BASE_URL
 
-DEFAULT_DOCKER_URL = DEFAULT_DOCKER_REGISTRY_API_BASE_URL
-DEFAULT_NEXUS_URL = DEFAULT_NEXUS_API_BASE_URL
+# The same defaults as nexusctl.common. They are repeated here so that parsing
+# arguments does not import nexusctl.
+DEFAULT_DOCKER_URL = 'https://registry.local'
+DEFAULT_NEXUS_URL = 'https://packages.local/service/rest'
 NEXUS_CREDENTIALS_SECRET_NAME = 'nexus-admin-credential'
 NEXUS_CREDENTIALS_SECRET_NAMESPACE = 'nexus'
 PRODUCT_CATALOG_CONFIG_MAP_NAME = 'cray-product-catalog'
 PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE = 'services'
-DEFAULT_LOG_DIR = '/etc/cray/upgrade/csm/iuf/deletion'
\ No newline at end of file
+DEFAULT_LOG_DIR = '/etc/cray/upgrade/csm/iuf/deletion'
+DEFAULT_CATALOG_CACHE_DIR = '/etc/cray/upgrade/csm/iuf/deletion/catalog-cache'
+DEFAULT_PHASE_CONCURRENCY = 7
+DEFAULT_DOCKER_CONCURRENCY = 8
+DEFAULT_NEXUS_CONCURRENCY = 4
+DEFAULT_S3_CONCURRENCY = 8
+DEFAULT_IMS_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_RATE_LIMIT = 100
+DEFAULT_API_GATEWAY_URL = 'https://api-gw-service-nmn.local'
+DEFAULT_SERVE_ADDRESS = '127.0.0.1:8480'
+DEFAULT_JOB_CONCURRENCY = 2
+S3_BACKEND_CLIENT = 'client'
+S3_BACKEND_CLI = 'cli'
+CHART_LOOKUP_LIST = 'list'
+CHART_LOOKUP_SEARCH = 'search'
+ENGINE_THREADS = 'threads'
+ENGINE_ASYNC = 'async'
@@ -27,12 +27,14 @@ Entry point for the product deletion utility.
 
 import subprocess
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from base64 import b64decode
 import warnings
 
 import logging
 
-from cray_product_catalog.query import ProductCatalog, ProductCatalogError
+from cray_product_catalog.query import InstalledProductVersion, ProductCatalog, ProductCatalogError
 from cray_product_catalog.constants import (
     PRODUCT_CATALOG_CONFIG_MAP_NAME,
     PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE,
@@ -42,63 +44,152 @@ from product_deletion_utility.components.constants import (
     NEXUS_CREDENTIALS_SECRET_NAMESPACE,
     DEFAULT_NEXUS_URL,
     DEFAULT_DOCKER_URL,
+    DEFAULT_DOCKER_CONCURRENCY,
+    DEFAULT_NEXUS_CONCURRENCY,
+    DEFAULT_S3_CONCURRENCY,
+    DEFAULT_IMS_CONCURRENCY,
+    DEFAULT_API_GATEWAY_URL,
+    S3_BACKEND_CLIENT,
+    CHART_LOOKUP_LIST,
+    CHART_LOOKUP_SEARCH,
+    ENGINE_THREADS,
+    ENGINE_ASYNC,
 )
+from product_deletion_utility.components.async_engine import AsyncDeletionEngine
+from product_deletion_utility.components.catalog import CatalogDocuments, component_tokens
+from product_deletion_utility.components.catalog_cache import CatalogSnapshotCache
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.gc import (
+    GC_BACKENDS,
+    OrphanReport,
+    catalog_components,
+    find_orphans,
+    is_product_repository,
+    s3_key_directory,
+    s3_scopes,
+)
+from product_deletion_utility.components.ims import IMS_IMAGES, IMS_RECIPES, ImsClient
+from product_deletion_utility.components.metrics import METRICS
+from product_deletion_utility.components.nexus import (
+    NEXUS_CHARTS_REPOSITORY,
+    NexusRestClient,
+    index_chart_components,
+    iter_components,
+)
+from product_deletion_utility.components.ownership import (
+    ComponentOwnershipIndex,
+    DOCKER_BACKEND,
+    DOCKER_IMAGE,
+    S3_ARTIFACT,
+    S3_BACKEND,
+    HELM_CHART,
+    IMS_BACKEND,
+    IMS_RECIPE,
+    IMS_IMAGE,
+    HOSTED_REPO,
+    LOFTSMAN_MANIFEST,
+    NEXUS_BACKEND,
+)
+from product_deletion_utility.components.plan import DeletionPlan, compile_plan
+from product_deletion_utility.components.registry import RegistryClient, plan_manifest_deletions
+from product_deletion_utility.components.retry import call_with_retry, host_of
+from product_deletion_utility.components.s3 import (
+    ClientS3Backend,
+    CrayCliS3Backend,
+    IMS_IMAGES_BUCKET,
+    IMS_RECIPES_BUCKET,
+    S3KeyIndex,
+    batch_keys,
+    describe_batch,
+)
+from product_deletion_utility.components.scheduler import map_concurrently
+from product_deletion_utility.components.session import SessionBroker
 from kubernetes.client import CoreV1Api
 from kubernetes.client.rest import ApiException
 from kubernetes.config import load_kube_config, ConfigException
+from kubernetes.watch import Watch
 from urllib3.exceptions import MaxRetryError
 from urllib.error import HTTPError
-from nexusctl import DockerApi, DockerClient, NexusApi, NexusClient
+from nexusctl import NexusApi, NexusClient
 from nexusctl.common import NexusCtlHttpError
 from yaml import YAMLLoadWarning
 
 d_logger = logging.getLogger('product-deletion-utility')
 
+# Requests only the metadata of a Kubernetes object.
+PARTIAL_OBJECT_METADATA = 'application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1'
 
-class ProductInstallException(Exception):
-    """An error occurred reading or manipulating product installs."""
-    pass
+# The number of seconds each watch of the product catalog ConfigMap lasts
+# before it is renewed, and waited before watching again after an error.
+CATALOG_WATCH_TIMEOUT = 300
+CATALOG_WATCH_RETRY_DELAY = 5
+
+# The label which cray-product-catalog gives the product-specific ConfigMaps
+# of a split catalog.
+PRODUCT_CATALOG_LABEL = 'type'
+PRODUCT_CATALOG_LABEL_VALUE = 'cray-product-catalog'
+
+
+def get_k8s_api():
+    """Load a Kubernetes CoreV1Api and return it.
+    Returns:
+        CoreV1Api: The Kubernetes API.
+    Raises:
+        ProductInstallException: if there was an error loading the
+            Kubernetes configuration.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', category=YAMLLoadWarning)
+            load_kube_config()
+        return CoreV1Api()
+    except ConfigException as err:
+        raise ProductInstallException(
+            f'Unable to load kubernetes configuration: {err}')
 
 
 class UninstallComponents():
     """"Uninstall individual components of the product version.
     """
 
-    def uninstall_docker_image(self, docker_image_name, docker_image_version, docker_api):
-        """Remove a Docker image.
-        It is not recommended to call this function directly, instead use
-        ProductCatalog.remove_product_docker_images to check that the image
-        is not in use by another product.
+    def __init__(self, s3_backend=None, nexus_url=DEFAULT_NEXUS_URL, docker_url=DEFAULT_DOCKER_URL,
+                 ims_client=None):
+        """Create the uninstaller.
         Args:
-            docker_image_name (str): The name of the Docker image to uninstall.
-            docker_image_version (str): The version of the Docker image to uninstall.
-            docker_api (DockerApi): The nexusctl Docker API to interface with
-                the Docker registry.
-        Returns:
-            None
-        Raises:
-            ProductInstallException: If an error occurred removing the image.
+            s3_backend (ClientS3Backend, CrayCliS3Backend or callable): The
+                backend used to delete S3 objects, or a function returning it
+                which is called the first time S3 is used. Defaults to the
+                cray CLI.
+            nexus_url (str): The base URL of Nexus, used to rate limit and
+                retry requests to it.
+            docker_url (str): The base URL of the Docker registry, used to
+                rate limit and retry requests to it.
+            ims_client (ImsClient or callable): The client used to delete IMS
+                images and recipes, or a function returning it which is
+                called the first time IMS is used. Defaults to a client of
+                the default API gateway.
         """
-        docker_image_short_name = f'{docker_image_name}:{docker_image_version}'
-        try:
-            docker_api.delete_image(
-                docker_image_name, docker_image_version
-            )
-            d_logger.info(
-                f'Successfully removed the docker image {docker_image_short_name}')
+        self.nexus_url = nexus_url
+        self.docker_url = docker_url
+        self._s3_backend = s3_backend or CrayCliS3Backend
+        self._ims_client = ims_client or (lambda: ImsClient(DEFAULT_API_GATEWAY_URL))
+        self._backends_lock = threading.Lock()
 
-        except (HTTPError, NexusCtlHttpError) as err:
-            if err.code == 404:
-                d_logger.warning(
-                    f'{docker_image_short_name} has already been removed')
-            else:
-                raise ProductInstallException(
-                    f'Failed to remove image {docker_image_short_name}: {err}'
-                )
-        except Exception as e:
-            raise ProductInstallException(
-                f'Failed to remove image {docker_image_short_name}: {e}'
-            )
+    @property
+    def s3_backend(self):
+        """ClientS3Backend or CrayCliS3Backend: The backend used to delete S3 objects."""
+        with self._backends_lock:
+            if callable(self._s3_backend):
+                self._s3_backend = self._s3_backend()
+            return self._s3_backend
+
+    @property
+    def ims_client(self):
+        """ImsClient: The client used to delete IMS images and recipes."""
+        with self._backends_lock:
+            if callable(self._ims_client):
+                self._ims_client = self._ims_client()
+            return self._ims_client
 
     def uninstall_S3_artifact(self, s3_bucket, s3_key):
         """Removes an S3 artifact.
@@ -113,22 +204,20 @@ class UninstallComponents():
         Raises:
             ProductInstallException: If an error occurred removing the artifact.
         """
-        s3_artifact_short_name = f'{s3_bucket}:{s3_key}'
-        try:
-            output = subprocess.check_output(
-                ["cray", "artifacts", "delete", "%s" % s3_bucket, "%s" % s3_key], stderr=subprocess.STDOUT, universal_newlines=True)
-            d_logger.info(
-                f'Successfully removed the artifact {s3_artifact_short_name}')
-        except subprocess.CalledProcessError as err:
-            if 'not found' in err.output:
-                d_logger.warning(
-                    f'Artifact {s3_key} not available in S3 bucket - {s3_bucket}')
-                d_logger.debug(
-                    f'Output of cray artifacts delete is {err.output}')
-            else:
-                raise ProductInstallException(
-                    f'Failed to remove S3 artifacts {s3_artifact_short_name} with error: {err}'
-                )
+        self.uninstall_S3_artifacts(s3_bucket, [s3_key])
+
+    def uninstall_S3_artifacts(self, s3_bucket, s3_keys):
+        """Removes S3 artifacts from a single bucket.
+        The in-process S3 backend removes up to 1000 keys with each request.
+        Args:
+            s3_bucket (str): The name of the S3 bucket which has the artifacts to be deleted.
+            s3_keys (list): The keys of the artifacts to be removed.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If an error occurred removing an artifact.
+        """
+        self.s3_backend.delete_objects(s3_bucket, s3_keys)
 
     def uninstall_hosted_repos(self, hosted_repo_name, nexus_api):
         """Remove a version's package repositories from Nexus.
@@ -143,11 +232,13 @@ class UninstallComponents():
             ProductInstallException: If an error occurred removing a repository.
         """
         try:
-            nexus_api.repos.delete(hosted_repo_name)
+            call_with_retry(lambda: nexus_api.repos.delete(hosted_repo_name),
+                            host_of(self.nexus_url), NEXUS_BACKEND, 'DELETE')
             d_logger.info(
                 f'Successfully removed the repository {hosted_repo_name}')
         except (HTTPError, NexusCtlHttpError) as err:
             if err.code == 404:
+                METRICS.record_not_found(NEXUS_BACKEND, 'DELETE')
                 d_logger.warning(
                     f'{hosted_repo_name} has already been removed')
             else:
@@ -176,11 +267,13 @@ class UninstallComponents():
         """
         helm_chart_short_name: str = f"{chart_name}:{chart_version}"
         try:
-            nexus_api.components.delete(component_nexus_id)
+            call_with_retry(lambda: nexus_api.components.delete(component_nexus_id),
+                            host_of(self.nexus_url), NEXUS_BACKEND, 'DELETE')
             d_logger.info(
                 f'Successfully removed the helm chart {helm_chart_short_name}')
         except (HTTPError, NexusCtlHttpError) as err:
             if err.code == 404:
+                METRICS.record_not_found(NEXUS_BACKEND, 'DELETE')
                 d_logger.warning(
                     f"Helm chart {helm_chart_short_name} has already been removed")
             else:
@@ -191,157 +284,138 @@ class UninstallComponents():
                 f"Failed to remove helm chart {helm_chart_short_name} from nexus : {e}"
             )
 
-    def uninstall_loftsman_manifests(self, manifest_keys):
-        """Removes loftsman manifests for a product version from the repo.
+    def _uninstall_ims_object(self, ims_type, name, ims_id, s3_objects):
+        """Remove an IMS image or recipe from S3 and then from IMS.
         Args:
-            manifests (list): List of yaml files containing loftsman manifest
-                              for deletion.
+            ims_type (str): IMS_IMAGES or IMS_RECIPES.
+            name (str): The name of the image or recipe.
+            ims_id (str): The IMS ID of the image or recipe.
+            s3_objects (list): The (bucket, key) tuples of its S3 objects.
         Returns:
             None
         Raises:
-            ProductInstallException: If an error occurred removing the artifact.
+            ProductInstallException: If an error occurred removing the image or recipe.
         """
+        description = f'IMS {ims_type[:-1]} {name}'
+        d_logger.debug(f'S3 objects of {description} are: {s3_objects}')
+        if not s3_objects:
+            d_logger.warning(
+                f'S3 key could not be retrieved for {ims_type[:-1]} ID - {ims_id}')
+            return
         try:
-            for manifest_key in manifest_keys:
-                manifest_key = manifest_key.replace('config-data/', '')
-                d_logger.debug(
-                    f'Removing the following manifest - {manifest_key}')
-                output = subprocess.check_output(
-                    ["cray", "artifacts", "delete", "config-data", "%s" % manifest_key], stderr=subprocess.STDOUT, universal_newlines=True)
-                d_logger.info(
-                    f'Successfully removed the manifest - {manifest_key}')
-        except subprocess.CalledProcessError as err:
-            if 'not found' in err.output:
-                d_logger.warning(
-                    f'Manifest {manifest_key} not available in S3 bucket config-data')
-                d_logger.debug(
-                    f'Output of cray artifacts delete is {err.output}')
+            for bucket, keys in batch_keys(s3_objects, self.s3_backend.batch_size):
+                self.s3_backend.delete_objects(bucket, keys)
+        except ProductInstallException as err:
             raise ProductInstallException(
-                f'Failed to remove loftsman manifest {manifest_key} from S3 with error: {err}'
+                f'Failed to remove {description} with error: {err}'
             )
+        d_logger.info(
+            f'Successfully deleted {ims_type[:-1]} - {name} from S3')
+
+        if self.ims_client.delete_record(ims_type, ims_id):
+            d_logger.info(
+                f'Successfully deleted {ims_type[:-1]} - {name} from IMS')
+        else:
+            METRICS.record_not_found(IMS_BACKEND, 'DELETE')
+            d_logger.warning(f'{description} has already been removed from IMS')
 
-    def uninstall_ims_recipes(self, recipe_name, recipe_id):
-        """Removes ims recipes for a product version from the S3.
+    def uninstall_ims_recipes(self, recipe_name, recipe_id, recipe_s3_objects):
+        """Removes an IMS recipe and its S3 objects.
         Args:
-            recipes (list of dictionaries): List of recipe names and ids
+            recipe_name (str): The name of the IMS recipe.
+            recipe_id (str): The IMS ID of the recipe.
+            recipe_s3_objects (list): The (bucket, key) tuples of the recipe's S3 objects.
         Returns:
             None
         Raises:
             ProductInstallException: If an error occurred removing the IMS recipe.
         """
-        try:
-            command = "cray artifacts list ims --format json | jq -r '.artifacts[] | select(.Key|test(\"^.*{}.*$\")) | .Key'".format(
-                recipe_id)
-            recipe_s3_key = subprocess.check_output(
-                command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
-            d_logger.debug(f'Recipe S3 key is: {recipe_s3_key}')
-            if not recipe_s3_key:
-                d_logger.warning(
-                    f'S3 key could not be retrieved for recipe ID - {recipe_id}')
-            else:
-                s3_delete_command = "cray artifacts delete ims {}".format(
-                    recipe_s3_key)
-                output = subprocess.check_output(
-                    s3_delete_command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
-                d_logger.info(
-                    f'Successfully deleted recipe - {recipe_name} from S3')
-
-                ims_delete_command = "cray ims recipes delete {}".format(
-                    recipe_id)
-                output = subprocess.check_output(
-                    ims_delete_command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
-                d_logger.info(
-                    f'Successfully deleted recipe - {recipe_name} from IMS')
+        self._uninstall_ims_object(IMS_RECIPES, recipe_name, recipe_id, recipe_s3_objects)
 
-        except subprocess.CalledProcessError as err:
-            if 'not found' in err.output:
-                d_logger.warning(
-                    f'Failed to remove IMS recipe {recipe_name} with error: {err.output}')
-            else:
-                raise ProductInstallException(
-                    f'Failed to remove IMS recipe {recipe_name} with error: {err}'
-                )
-
-    def uninstall_ims_images(self, image_name, image_id):
-        """Removes ims images for a product version from the S3.
+    def uninstall_ims_images(self, image_name, image_id, image_s3_objects):
+        """Removes an IMS image and its S3 objects.
         Args:
-            images (list of dictionaries): List of image names and ids
+            image_name (str): The name of the IMS image.
+            image_id (str): The IMS ID of the image.
+            image_s3_objects (list): The (bucket, key) tuples of the image's S3 objects.
         Returns:
             None
         Raises:
             ProductInstallException: If an error occurred removing the IMS image.
         """
-        try:
-            command = "cray artifacts list boot-images --format json | jq -r '.artifacts[] | select(.Key|test(\"^.*{}.*$\")) | .Key'".format(
-                image_id)
-            image_s3_keys = subprocess.check_output(
-                command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
-            d_logger.debug(f'Image S3 key is {image_s3_keys}')
-            if not image_s3_keys:
-                d_logger.warning(
-                    f'S3 key could not be retrieved for image ID - {image_id}')
-            else:
-                for image_s3_key in image_s3_keys.rstrip().split('\n'):
-                    s3_delete_command = "cray artifacts delete boot-images {}".format(
-                        image_s3_key)
-                    output = subprocess.check_output(
-                        s3_delete_command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
-                    d_logger.info(
-                        f'Successfully deleted image - {image_name} from S3')
-
-                ims_delete_command = "cray ims images delete {}".format(
-                    image_id)
-                output = subprocess.check_output(
-                    ims_delete_command, shell=True, stderr=subprocess.STDOUT, universal_newlines=True)
-                d_logger.info(
-                    f'Successfully deleted image - {image_name} from IMS')
-
-        except subprocess.CalledProcessError as err:
-            if 'not found' in err.output:
-                d_logger.warning(
-                    f'Failed to remove IMS image {image_name} with error: {err.output}')
-            else:
-                raise ProductInstallException(
-                    f'Failed to remove IMS image {image_name} with error: {err}'
-                )
+        self._uninstall_ims_object(IMS_IMAGES, image_name, image_id, image_s3_objects)
 
 
-class DeleteProductComponent(ProductCatalog):
-    """"Inherit the ProductCatalog from cray-product-catalog and add additional methods for supporting deletion of components.
-    Delete each component of a product currently installed.
-    Attributes:
-        name: The product name.
-        version: The product version.
+class BackendClients():
+    """The clients of the services which components are removed from.
+    Each client is created the first time it is used, so a dry run, or a
+    phase with nothing to remove, does not pay for it. The clients share one
+    SessionBroker, so the Nexus credentials secret is read and the API
+    gateway token is loaded once. The deletion service shares one instance
+    between its jobs, so their connection pools and credentials are reused.
     """
 
-    @staticmethod
-    def _get_k8s_api():
-        """Load a Kubernetes CoreV1Api and return it.
-        Returns:
-            CoreV1Api: The Kubernetes API.
-        Raises:
-            ProductInstallException: if there was an error loading the
-                Kubernetes configuration.
+    def __init__(self, k8s_client,
+                 nexus_url=DEFAULT_NEXUS_URL,
+                 docker_url=DEFAULT_DOCKER_URL,
+                 nexus_credentials_secret_name=NEXUS_CREDENTIALS_SECRET_NAME,
+                 nexus_credentials_secret_namespace=NEXUS_CREDENTIALS_SECRET_NAMESPACE,
+                 docker_concurrency=DEFAULT_DOCKER_CONCURRENCY,
+                 s3_concurrency=DEFAULT_S3_CONCURRENCY,
+                 s3_backend=S3_BACKEND_CLIENT,
+                 api_gateway_url=DEFAULT_API_GATEWAY_URL,
+                 ims_concurrency=DEFAULT_IMS_CONCURRENCY):
+        """Create the clients.
+        Args:
+            k8s_client (CoreV1Api): The Kubernetes API.
+            nexus_url (str): The base URL of Nexus.
+            docker_url (str): The base URL of the Docker registry.
+            nexus_credentials_secret_name (str): The name of the secret
+                holding the Nexus credentials.
+            nexus_credentials_secret_namespace (str): The namespace of the
+                secret holding the Nexus credentials.
+            docker_concurrency (int): The size of the Docker registry connection pool.
+            s3_concurrency (int): The size of the S3 connection pool.
+            s3_backend (str): S3_BACKEND_CLIENT or S3_BACKEND_CLI.
+            api_gateway_url (str): The base URL of the API gateway used to
+                obtain S3 credentials and to reach IMS.
+            ims_concurrency (int): The size of the IMS connection pool.
         """
-        try:
-            with warnings.catch_warnings():
-                warnings.filterwarnings('ignore', category=YAMLLoadWarning)
-                load_kube_config()
-            return CoreV1Api()
-        except ConfigException as err:
-            raise ProductInstallException(
-                f'Unable to load kubernetes configuration: {err}')
+        self.k8s_client = k8s_client
+        self.nexus_url = nexus_url
+        self.docker_url = docker_url
+        self.nexus_credentials_secret_name = nexus_credentials_secret_name
+        self.nexus_credentials_secret_namespace = nexus_credentials_secret_namespace
+        self.docker_concurrency = docker_concurrency
+        self.broker = SessionBroker(api_gateway_url, self._read_nexus_credentials)
+        s3_backend_class = ClientS3Backend if s3_backend == S3_BACKEND_CLIENT else CrayCliS3Backend
+        self.s3_batch_size = s3_backend_class.batch_size
+        if s3_backend_class is ClientS3Backend:
+            def s3_backend_factory():
+                return ClientS3Backend.from_sts(api_gateway_url, s3_concurrency,
+                                                session=self.broker.gateway_session(S3_BACKEND, 1))
+        else:
+            s3_backend_factory = CrayCliS3Backend
+
+        def ims_client_factory():
+            return ImsClient(api_gateway_url, self.broker.gateway_session(IMS_BACKEND, ims_concurrency))
+        self.uninstall_component = UninstallComponents(
+            s3_backend_factory, nexus_url, docker_url, ims_client_factory)
+        self._lock = threading.RLock()
+        self._nexus_credentials_exported = None
+        self._registry_client = None
+        self._nexus_api = None
+        self._nexus_rest_client = None
 
-    def _update_environment_with_nexus_credentials(self, secret_name, secret_namespace):
+    def _read_nexus_credentials(self):
         """Get the credentials for Nexus HTTP API access from a Kubernetes secret.
-        Nexusctl expects these to be set as environment variables. If they
-        cannot be obtained from a k8s secret, then print a warning and return.
-        Args:
-            secret_name (str): The name of the secret.
-            secret_namespace (str): The namespace of the secret.
+        If they cannot be obtained from the secret, then print a warning and return.
         Returns:
-            None. Updates os.environ as is expected by Nexusctl.
+            tuple or None: The (username, password), or None if the secret
+                could not be read.
         """
+        secret_name = self.nexus_credentials_secret_name
+        secret_namespace = self.nexus_credentials_secret_namespace
         try:
             secret = self.k8s_client.read_namespaced_secret(
                 secret_name, secret_namespace
@@ -349,16 +423,343 @@ class DeleteProductComponent(ProductCatalog):
         except (MaxRetryError, ApiException):
             d_logger.error(
                 f'WARNING: unable to read Kubernetes secret {secret_namespace}/{secret_name}')
-            return
+            return None
         if secret.data is None:
             d_logger.error(
                 f'WARNING: unable to read Kubernetes secret {secret_namespace}/{secret_name}')
-            return
+            return None
 
-        os.environ.update({
-            'NEXUS_USERNAME': b64decode(secret.data['username']).decode(),
-            'NEXUS_PASSWORD': b64decode(secret.data['password']).decode()
-        })
+        return (b64decode(secret.data['username']).decode(),
+                b64decode(secret.data['password']).decode())
+
+    def _lazy(self, attribute, create):
+        """Get a client, creating it the first time it is used.
+        Args:
+            attribute (str): The name of the attribute holding the client.
+            create (callable): Creates the client.
+        Returns:
+            The client.
+        """
+        with self._lock:
+            if getattr(self, attribute) is None:
+                setattr(self, attribute, create())
+            return getattr(self, attribute)
+
+    def load_nexus_credentials(self):
+        """Export the Nexus credentials to the environment for nexusctl, once.
+        Nexusctl only reads credentials from the NEXUS_USERNAME and
+        NEXUS_PASSWORD environment variables. The other clients are given
+        them by the broker.
+        Returns:
+            None
+        """
+        def export():
+            credentials = self.broker.nexus_credentials
+            if credentials:
+                os.environ.update({'NEXUS_USERNAME': credentials[0], 'NEXUS_PASSWORD': credentials[1]})
+            return True
+        self._lazy('_nexus_credentials_exported', export)
+
+    @property
+    def registry_client(self):
+        """RegistryClient: The client of the Docker registry API."""
+        def create():
+            return RegistryClient(
+                self.docker_url, self.broker.nexus_session(DOCKER_BACKEND, self.docker_concurrency))
+        return self._lazy('_registry_client', create)
+
+    @property
+    def nexus_api(self):
+        """NexusApi: The nexusctl API of Nexus."""
+        def create():
+            self.load_nexus_credentials()
+            return NexusApi(NexusClient(self.nexus_url))
+        return self._lazy('_nexus_api', create)
+
+    @property
+    def nexus_rest_client(self):
+        """NexusRestClient: The client of the Nexus REST API endpoints not provided by nexusctl."""
+        def create():
+            return NexusRestClient(self.nexus_url, self.broker.nexus_session(NEXUS_BACKEND))
+        return self._lazy('_nexus_rest_client', create)
+
+    @property
+    def ims_client(self):
+        """ImsClient: The client of the IMS API."""
+        return self.uninstall_component.ims_client
+
+    def warm(self):
+        """Create every client, and load every credential, now instead of when first used.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If S3 credentials or the API gateway
+                token could not be obtained.
+        """
+        self.registry_client
+        self.nexus_api
+        self.nexus_rest_client
+        self.uninstall_component.s3_backend
+        self.ims_client
+        self.broker.token.access_token()
+
+
+class CatalogWatcher():
+    """Keep the product catalog, and the index of the owners of each component, current.
+    The deletion service starts each job from the catalog kept here instead
+    of reading and parsing the ConfigMap. A split catalog also keeps the data
+    of each product in a ConfigMap which cray-product-catalog names after the
+    catalog and the product, e.g. cray-product-catalog-cos, and labels
+    type=cray-product-catalog. The catalog ConfigMap is watched by name and
+    the product ConfigMaps by label, so no other ConfigMaps are read. When
+    one changes, only the products whose documents changed are parsed again,
+    and their versions are replaced in a copy of the ownership index, which
+    then replaces the index in use.
+    """
+
+    def __init__(self, k8s_client, name=PRODUCT_CATALOG_CONFIG_MAP_NAME,
+                 namespace=PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE):
+        """Create the watcher.
+        Args:
+            k8s_client (CoreV1Api): The Kubernetes API.
+            name (str): The name of the product catalog ConfigMap.
+            namespace (str): The namespace of the product catalog ConfigMap.
+        """
+        self.k8s_client = k8s_client
+        self.name = name
+        self.namespace = namespace
+        # The resourceVersion of the latest change to the catalog.
+        self.resource_version = None
+        # The selectors of the ConfigMaps listed by each watch, and the
+        # resourceVersion each watch resumes from.
+        self._selectors = (
+            {'field_selector': f'metadata.name={name}'},
+            {'label_selector': f'{PRODUCT_CATALOG_LABEL}={PRODUCT_CATALOG_LABEL_VALUE}'},
+        )
+        self._watch_versions = [None] * len(self._selectors)
+        self.ownership_index = ComponentOwnershipIndex()
+        self._configmaps = {}
+        self._documents = None
+        self._stale_version = None
+        self._condition = threading.Condition()
+        # Held while the ConfigMaps are read or applied, which each watch and
+        # a job reading the ConfigMaps in snapshot() may do.
+        self._update_lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._watches = {}
+        self._threads = []
+
+    def start(self):
+        """Read the catalog, then keep it current from background threads.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If the ConfigMaps could not be read.
+        """
+        self._reload()
+        self._threads = [
+            threading.Thread(target=self._watch_forever, args=(index,), name=f'catalog-watch-{index}', daemon=True)
+            for index in range(len(self._selectors))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop watching the catalog.
+        Returns:
+            None
+        """
+        self._stopped.set()
+        for watch in list(self._watches.values()):
+            watch.stop()
+
+    def _is_catalog_configmap(self, configmap):
+        """Check whether a ConfigMap is the catalog or one of its product-specific ConfigMaps.
+        Args:
+            configmap (V1ConfigMap): The ConfigMap.
+        Returns:
+            bool: True if the ConfigMap holds catalog data.
+        """
+        if configmap.metadata.name == self.name:
+            return True
+        labels = configmap.metadata.labels or {}
+        return (labels.get(PRODUCT_CATALOG_LABEL) == PRODUCT_CATALOG_LABEL_VALUE and
+                configmap.metadata.name.startswith(f'{self.name}-'))
+
+    def _indexed_versions(self, documents, product_name):
+        """Get the versions of a product to index, logging a product which cannot be parsed.
+        Args:
+            documents (CatalogDocuments): The catalog.
+            product_name (str): The name of the product.
+        Returns:
+            list: The InstalledProductVersion objects of the product.
+        """
+        try:
+            return documents.product_versions(product_name)
+        except ProductInstallException as err:
+            d_logger.warning(f'{err}')
+            return []
+
+    def _apply(self, resource_version):
+        """Apply the data of the catalog ConfigMaps to the catalog and the ownership index.
+        The index is updated in a copy, so jobs may keep using the index they
+        were given while the catalog changes.
+        Args:
+            resource_version (str): The resourceVersion of the change.
+        Returns:
+            None
+        """
+        split_data = {}
+        for configmap_name, data in self._configmaps.items():
+            if configmap_name != self.name:
+                split_data.update(data)
+        configmap_data = self._configmaps.get(self.name, {})
+        old_documents = self._documents
+        if old_documents is None:
+            documents = CatalogDocuments(configmap_data, InstalledProductVersion, split_data)
+            changed = documents.product_names
+        else:
+            documents, changed = old_documents.updated(configmap_data, split_data)
+        ownership_index = self.ownership_index.copy() if changed else self.ownership_index
+        for product_name in changed:
+            ownership_index.replace_products(
+                self._indexed_versions(old_documents, product_name) if old_documents else [],
+                self._indexed_versions(documents, product_name))
+        with self._condition:
+            self._documents = documents
+            self.ownership_index = ownership_index
+            self.resource_version = resource_version
+            self._condition.notify_all()
+        d_logger.debug(f'Product catalog updated to resourceVersion {resource_version}: '
+                       f'{len(changed)} products changed')
+
+    def _reload(self):
+        """Read every catalog ConfigMap.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If the ConfigMaps could not be read.
+        """
+        with self._update_lock:
+            catalog_configmaps = {}
+            watch_versions = []
+            for selector in self._selectors:
+                try:
+                    configmaps = self.k8s_client.list_namespaced_config_map(self.namespace, **selector)
+                except (MaxRetryError, ApiException) as err:
+                    raise ProductInstallException(
+                        f'Unable to list the product catalog ConfigMaps of the {self.namespace} namespace: {err}')
+                catalog_configmaps.update(
+                    (configmap.metadata.name, configmap.data or {})
+                    for configmap in configmaps.items
+                    if self._is_catalog_configmap(configmap)
+                )
+                watch_versions.append(configmaps.metadata.resource_version)
+            if self.name not in catalog_configmaps:
+                raise ProductInstallException(f'{self.namespace}/{self.name} ConfigMap not found.')
+            self._configmaps = catalog_configmaps
+            self._watch_versions = watch_versions
+            self._apply(watch_versions[0])
+
+    def _watch_forever(self, index):
+        """Watch ConfigMaps until stopped, reading them again after any error.
+        Args:
+            index (int): The index of the selector of the ConfigMaps to watch.
+        Returns:
+            None
+        """
+        while not self._stopped.is_set():
+            try:
+                self._watch_once(index)
+            except Exception as err:
+                if self._stopped.is_set():
+                    return
+                d_logger.warning(f'Watch of the product catalog ConfigMaps failed: {err}')
+                self._stopped.wait(CATALOG_WATCH_RETRY_DELAY)
+                try:
+                    self._reload()
+                except ProductInstallException as err:
+                    d_logger.warning(f'{err}')
+
+    def _watch_once(self, index):
+        """Apply the changes to the watched ConfigMaps until the watch times out.
+        Args:
+            index (int): The index of the selector of the ConfigMaps to watch.
+        Returns:
+            None
+        """
+        watch = self._watches[index] = Watch()
+        for event in watch.stream(
+                self.k8s_client.list_namespaced_config_map, self.namespace,
+                resource_version=self._watch_versions[index],
+                timeout_seconds=CATALOG_WATCH_TIMEOUT, **self._selectors[index]):
+            if event['type'] == 'ERROR':
+                # The resourceVersion is too old to watch from, e.g. HTTP 410 Gone.
+                self._reload()
+                return
+            configmap = event['object']
+            configmap_name = configmap.metadata.name
+            with self._update_lock:
+                self._watch_versions[index] = configmap.metadata.resource_version
+                # A ConfigMap whose label is removed is reported as deleted.
+                if event['type'] == 'DELETED':
+                    if self._configmaps.pop(configmap_name, None) is None:
+                        continue
+                    d_logger.warning(f'{self.namespace}/{configmap_name} ConfigMap was deleted')
+                elif self._is_catalog_configmap(configmap):
+                    self._configmaps[configmap_name] = configmap.data or {}
+                else:
+                    continue
+                self._apply(configmap.metadata.resource_version)
+
+    def invalidate(self, resource_version):
+        """Record that a version of the catalog has been changed by this process.
+        The next call to snapshot() waits for the watch to deliver the change.
+        Args:
+            resource_version (str): The resourceVersion the change was based on.
+        Returns:
+            None
+        """
+        with self._condition:
+            self._stale_version = resource_version
+
+    def snapshot(self, timeout=CATALOG_WATCH_RETRY_DELAY):
+        """Get the current catalog and the ownership index built from it.
+        Args:
+            timeout (float): The number of seconds to wait for the watch to
+                deliver a change made with invalidate() before reading the
+                ConfigMaps instead.
+        Returns:
+            tuple: The CatalogDocuments, the ComponentOwnershipIndex of the
+                same version of the catalog, which is not changed afterwards,
+                and its resourceVersion.
+        Raises:
+            ProductInstallException: If the ConfigMaps had to be read and could not be.
+        """
+        with self._condition:
+            current = self._condition.wait_for(
+                lambda: self.resource_version != self._stale_version, timeout)
+        if not current:
+            self._reload()
+        with self._condition:
+            self._stale_version = None
+            return self._documents, self.ownership_index, self.resource_version
+
+
+class DeleteProductComponent(ProductCatalog):
+    """"Inherit the ProductCatalog from cray-product-catalog and add additional methods for supporting deletion of components.
+    Delete each component of a product currently installed.
+    Attributes:
+        name: The product name.
+        version: The product version.
+        product_versions: The (name, version) tuples of every product version
+            being deleted. In batch mode there is more than one, and
+            components are only kept if a product version outside the batch
+            uses them.
+        metrics: The Metrics the phases, removals and requests of the
+            deletion are recorded in. The requests made by clients shared
+            with other deletions are recorded in METRICS.
+    """
 
     def __init__(self, catalogname=PRODUCT_CATALOG_CONFIG_MAP_NAME,
                  catalognamespace=PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE,
@@ -368,33 +769,351 @@ class DeleteProductComponent(ProductCatalog):
                  docker_url=DEFAULT_DOCKER_URL,
                  nexus_credentials_secret_name=NEXUS_CREDENTIALS_SECRET_NAME,
                  nexus_credentials_secret_namespace=NEXUS_CREDENTIALS_SECRET_NAMESPACE,
-                 dry_run=False):
+                 dry_run=False,
+                 docker_concurrency=DEFAULT_DOCKER_CONCURRENCY,
+                 nexus_concurrency=DEFAULT_NEXUS_CONCURRENCY,
+                 s3_concurrency=DEFAULT_S3_CONCURRENCY,
+                 ims_concurrency=DEFAULT_IMS_CONCURRENCY,
+                 s3_backend=S3_BACKEND_CLIENT,
+                 api_gateway_url=DEFAULT_API_GATEWAY_URL,
+                 chart_lookup=CHART_LOOKUP_LIST,
+                 engine=ENGINE_THREADS,
+                 product_versions=None,
+                 journal=None,
+                 report_repo_sizes=False,
+                 catalog_cache_dir=None,
+                 clients=None,
+                 catalog_documents=None,
+                 ownership_index=None,
+                 metrics=None):
 
-        self.pname = productname
-        self.pversion = productversion
+        # In batch mode several product versions are deleted together.
+        if product_versions is None:
+            product_versions = [(productname, productversion)]
+        self.product_versions = product_versions
+        self.pname, self.pversion = product_versions[0] if product_versions else (None, None)
+        self.target_description = ', '.join(
+            f'{name}:{version}' for name, version in self.product_versions)
         self.catalogname = catalogname
         self.catalognamespace = catalognamespace
         self.dry_run = dry_run
-        self.uninstall_component = UninstallComponents()
-        self.k8s_client = self._get_k8s_api()
-        self._update_environment_with_nexus_credentials(
-            nexus_credentials_secret_name, nexus_credentials_secret_namespace
-        )
-        self.docker_api = DockerApi(DockerClient(docker_url))
-        self.nexus_api = NexusApi(NexusClient(nexus_url))
+        self.journal = journal
+        self.chart_lookup = chart_lookup
+        self.report_repo_sizes = report_repo_sizes
+        self.docker_concurrency = docker_concurrency
+        self.nexus_concurrency = nexus_concurrency
+        self.s3_concurrency = s3_concurrency
+        self.ims_concurrency = ims_concurrency
+        self.metrics = metrics or METRICS
+        if clients is None:
+            clients = BackendClients(
+                get_k8s_api(), nexus_url, docker_url, nexus_credentials_secret_name,
+                nexus_credentials_secret_namespace, docker_concurrency, s3_concurrency,
+                s3_backend, api_gateway_url, ims_concurrency)
+        self.clients = clients
+        self.nexus_url = clients.nexus_url
+        self.docker_url = clients.docker_url
+        self.s3_batch_size = clients.s3_batch_size
+        self.uninstall_component = clients.uninstall_component
+        self.engine = engine
+        self._clients_lock = threading.RLock()
+        self._nexus_repositories = None
+        self._async_engine = None
         d_logger.debug(
             f'catalog name and namespace are {self.catalogname}, {self.catalognamespace}')
-        # inheriting the properties of parent ProductCatalog class
-        super().__init__(self.catalogname, self.catalognamespace)
+        self._load_catalog(catalog_cache_dir, catalog_documents)
+        # An index kept current by a CatalogWatcher, or None to build one.
+        self.ownership_index = ownership_index
+        self._compile_plan()
+
+    def _compile_plan(self):
+        """Find the product versions being deleted and plan the removal of their components.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If a product version is not in the catalog.
+        """
         try:
-            self.product = self.get_product(self.pname, self.pversion)
+            self.products_to_delete = [
+                self.get_product(name, version) for name, version in self.product_versions
+            ]
         except ProductCatalogError as err:
             raise ProductInstallException(f'{err}')
+        self.product = self.products_to_delete[0]
+        # Built once so that checking for shared components is a lookup. Only
+        # the products whose catalog entry mentions a component being deleted
+        # can share it, so the entries of other products are not parsed.
+        if self.ownership_index is None:
+            self.ownership_index = ComponentOwnershipIndex(
+                self.catalog_documents.products_mentioning(component_tokens(self.products_to_delete)))
+        # The remove_* methods execute this plan.
+        self.plan = compile_plan(self.products_to_delete, self.ownership_index)
+        self._store_catalog_snapshot()
+
+    def _catalog_resource_version(self, k8s_client):
+        """Get the resourceVersion of the product catalog ConfigMap without reading its data.
+        Args:
+            k8s_client (CoreV1Api): The Kubernetes API.
+        Returns:
+            str or None: The resourceVersion, or None if it could not be read.
+        """
+        try:
+            # Request only the metadata, so the cost does not grow with the catalog.
+            configmap_metadata = k8s_client.api_client.call_api(
+                '/api/v1/namespaces/{namespace}/configmaps/{name}', 'GET',
+                path_params={'namespace': self.catalognamespace, 'name': self.catalogname},
+                header_params={'Accept': PARTIAL_OBJECT_METADATA},
+                response_type='object',
+                auth_settings=['BearerToken'],
+                _return_http_data_only=True
+            )
+            return configmap_metadata['metadata']['resourceVersion']
+        except (MaxRetryError, ApiException, KeyError, TypeError) as err:
+            d_logger.warning(f'Unable to read the resourceVersion of {self.catalognamespace}/'
+                             f'{self.catalogname} ConfigMap: {err}')
+            return None
+
+    def _read_catalog_data(self):
+        """Read the data of the product catalog ConfigMap.
+        Returns:
+            dict: The unparsed YAML document of each product's versions, by product name.
+        Raises:
+            ProductInstallException: If the ConfigMap could not be read.
+        """
+        try:
+            configmap = self.k8s_client.read_namespaced_config_map(self.catalogname, self.catalognamespace)
+        except MaxRetryError as err:
+            raise ProductInstallException(f'Unable to connect to Kubernetes to read '
+                                          f'{self.catalognamespace}/{self.catalogname} ConfigMap: {err}')
+        except ApiException as err:
+            raise ProductInstallException(f'Error reading {self.catalognamespace}/'
+                                          f'{self.catalogname} ConfigMap: {err.reason}')
+        if configmap.data is None:
+            raise ProductInstallException(f'No data found in {self.catalognamespace}/'
+                                          f'{self.catalogname} ConfigMap.')
+        return configmap.data
+
+    def _load_catalog(self, catalog_cache_dir, catalog_documents=None):
+        """Load the product catalog, from a snapshot if the ConfigMap is unchanged.
+        This replaces ProductCatalog.__init__, which parses the entry of every
+        product, so that entries are only parsed when they are needed.
+        Args:
+            catalog_cache_dir (str): The directory holding catalog snapshots,
+                or None to always read the ConfigMap.
+            catalog_documents (CatalogDocuments): The current catalog, e.g.
+                kept by a CatalogWatcher, or None to load it.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If the product catalog could not be read.
+        """
+        # The attributes set by ProductCatalog.__init__.
+        self.name = self.catalogname
+        self.namespace = self.catalognamespace
+        self.k8s_client = self.clients.k8s_client
+        self.catalog_documents = catalog_documents
+        self._catalog_snapshot = None
+        if catalog_documents is None and catalog_cache_dir:
+            catalog_cache = CatalogSnapshotCache(catalog_cache_dir, self.catalogname, self.catalognamespace)
+            # Read before the ConfigMap, so that a change made in between leaves
+            # the snapshot keyed by an older resourceVersion, and it is not used.
+            resource_version = self._catalog_resource_version(self.k8s_client)
+            if resource_version:
+                self._catalog_snapshot = (catalog_cache, resource_version)
+                self.catalog_documents = catalog_cache.load(resource_version)
+                if self.catalog_documents is not None:
+                    d_logger.info(f'Using the cached product catalog at resourceVersion {resource_version}')
+        if self.catalog_documents is None:
+            self.catalog_documents = CatalogDocuments(self._read_catalog_data(), InstalledProductVersion)
+
+    def _store_catalog_snapshot(self):
+        """Store the catalog, with the products parsed so far, if it changed since it was loaded.
+        Returns:
+            None
+        """
+        if self._catalog_snapshot and self.catalog_documents.changed:
+            catalog_cache, resource_version = self._catalog_snapshot
+            self.catalog_documents.changed = False
+            catalog_cache.store(resource_version, self.catalog_documents)
+
+    @property
+    def products(self):
+        """list: Every InstalledProductVersion in the catalog. Each entry is parsed when this is first used."""
+        return self.catalog_documents.products
+
+    def get_product(self, name, version):
+        """Get a product version, parsing only the catalog entry of the product.
+        Args:
+            name (str): The name of the product.
+            version (str): The version of the product.
+        Returns:
+            InstalledProductVersion: The product version.
+        Raises:
+            ProductCatalogError: If the product version is not in the catalog.
+        """
+        for product in self.catalog_documents.product_versions(name):
+            if product.version == version:
+                return product
+        raise ProductCatalogError(f'No installed products with name {name} and version {version}.')
+
+    def _lazy(self, attribute, create):
+        """Get a client, creating it the first time it is used.
+        Args:
+            attribute (str): The name of the attribute holding the client.
+            create (callable): Creates the client.
+        Returns:
+            The client.
+        """
+        with self._clients_lock:
+            if getattr(self, attribute) is None:
+                setattr(self, attribute, create())
+            return getattr(self, attribute)
+
+    @property
+    def registry_client(self):
+        """RegistryClient: The client of the Docker registry API."""
+        return self.clients.registry_client
+
+    @property
+    def nexus_api(self):
+        """NexusApi: The nexusctl API of Nexus."""
+        return self.clients.nexus_api
+
+    @property
+    def nexus_rest_client(self):
+        """NexusRestClient: The client of the Nexus REST API endpoints not provided by nexusctl."""
+        return self.clients.nexus_rest_client
+
+    @property
+    def ims_client(self):
+        """ImsClient: The client of the IMS API."""
+        return self.clients.ims_client
+
+    @property
+    def nexus_repositories(self):
+        """set: The names of the repositories in Nexus, listed once per run.
+        None if the repositories could not be listed, in which case listing
+        is attempted again the next time this is used.
+        """
+        def load():
+            try:
+                return self.nexus_rest_client.list_repositories()
+            except ProductInstallException as err:
+                d_logger.warning(f'Unable to list the Nexus repositories: {err}')
+                return None
+        return self._lazy('_nexus_repositories', load)
+
+    @property
+    def async_engine(self):
+        """AsyncDeletionEngine: The asyncio engine, or None if the threads engine is used."""
+        if self.engine != ENGINE_ASYNC or self.dry_run:
+            return None
+
+        def create():
+            return AsyncDeletionEngine(
+                self.docker_url, self.nexus_url,
+                lambda: self.uninstall_component.s3_backend,
+                {DOCKER_BACKEND: self.docker_concurrency, NEXUS_BACKEND: self.nexus_concurrency,
+                 S3_BACKEND: self.s3_concurrency, IMS_BACKEND: self.ims_concurrency},
+                lambda: self.uninstall_component.ims_client,
+                self.clients.broker.nexus_credentials,
+                self.metrics
+            )
+        return self._lazy('_async_engine', create)
+
+    def _planned(self, component_type, description):
+        """Get the planned removals of one type of component.
+        Args:
+            component_type (str): One of the component type constants in
+                product_deletion_utility.components.ownership.
+            description (str): The plural name of the components for log messages.
+        Returns:
+            list: The identifiers of the components to remove. In a dry run
+                nothing is removed, so the list is empty.
+        """
+        keys = self.plan.removals(component_type)
+        d_logger.debug(f'{description.capitalize()} to remove are - {keys}')
+        if not keys:
+            d_logger.info(f'No {description} to remove for {self.target_description}')
+        if self.dry_run:
+            return []
+        return keys
+
+    def _sync_remover(self, component_type):
+        """Get the function and concurrency used to remove components of a type with threads.
+        Args:
+            component_type (str): One of the component type constants in
+                product_deletion_utility.components.ownership.
+        Returns:
+            tuple: A function which removes a single item, and the maximum
+                number of concurrent removals.
+        """
+        return {
+            DOCKER_IMAGE: (lambda manifest: self.registry_client.delete_manifest(
+                *manifest), self.docker_concurrency),
+            S3_ARTIFACT: (lambda batch: self.uninstall_component.uninstall_S3_artifacts(
+                *batch), self.s3_concurrency),
+            HELM_CHART: (lambda chart: self.uninstall_component.uninstall_helm_charts(
+                chart[0], chart[1], self.nexus_api, chart[2]), self.nexus_concurrency),
+            IMS_RECIPE: (lambda recipe: self.uninstall_component.uninstall_ims_recipes(
+                *recipe), self.ims_concurrency),
+            IMS_IMAGE: (lambda image: self.uninstall_component.uninstall_ims_images(
+                *image), self.ims_concurrency),
+            HOSTED_REPO: (lambda repo_name: self.uninstall_component.uninstall_hosted_repos(
+                repo_name, self.nexus_api), self.nexus_concurrency),
+        }[component_type]
+
+    def _remove_items(self, component_type, items, describe):
+        """Remove components of a single type with the selected engine, logging each failure.
+        Args:
+            component_type (str): One of the component type constants in
+                product_deletion_utility.components.ownership.
+            items (list): The items to remove.
+            describe (callable): Returns the name of an item for log messages.
+        Returns:
+            bool: True if one or more items failed to be removed.
+        """
+        if self.journal:
+            items = self.journal.outstanding(component_type, items)
+        if not items:
+            return False
+        if self.async_engine:
+            failures = self.async_engine.remove(component_type, items)
+        else:
+            remove_item, max_workers = self._sync_remover(component_type)
+
+            def timed_remove_item(item):
+                with self.metrics.removal(component_type):
+                    remove_item(item)
+            failures = map_concurrently(timed_remove_item, items, max_workers)
+        if self.journal:
+            self.journal.record_results(component_type, items, failures)
+        for item, err in failures:
+            message = str(err)
+            # Most removal errors already name the component they failed to remove.
+            if not message.startswith('Failed to '):
+                message = f'Failed to remove {describe(item)}: {message}'
+            d_logger.error(message)
+        return bool(failures)
+
+    def _protected_images(self):
+        """Get the Docker images used by product versions which are not being deleted.
+        Returns:
+            dict: A map from each (name, tag) tuple to the product versions using it.
+        """
+        protected_images = {}
+        for image in self.ownership_index.components(DOCKER_IMAGE):
+            owners = self.ownership_index.remaining_owners(
+                DOCKER_IMAGE, image, self.products_to_delete)
+            if owners:
+                protected_images[image] = owners
+        return protected_images
 
     def remove_product_docker_images(self):
-        """Remove a product's Docker images.
-        This function will only remove images that are not used by another
-        product in the catalog.
+        """Remove the Docker images in the deletion plan.
+        The tags are resolved to manifest digests first, so a manifest tagged
+        several times is deleted once, and a manifest also tagged by another
+        product version is kept.
         Args:
             None
         Returns:
@@ -402,56 +1121,22 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred removing an image.
         """
-        images_to_remove = self.product.docker_images
-        d_logger.debug(f'Images to remove are - {images_to_remove}')
-        if not images_to_remove:
-            d_logger.info(
-                f"No docker images found in the configmap data for {self.pname}:{self.pversion}")
+        images = self._planned(DOCKER_IMAGE, 'Docker images')
+        if not images:
             return
-        other_products = [
-            p for p in self.products
-            if p.name != self.product.name or p.version != self.product.version
-        ]
-
-        errors = False
-        # For each image to remove, check if it is shared by any other products.
-        for image_name, image_version in images_to_remove:
-            other_products_with_same_docker_image = [
-                other_product for other_product in other_products
-                if any([
-                    other_image_name == image_name and other_image_version == image_version
-                    for other_image_name, other_image_version in other_product.docker_images
-                ])
-            ]
-            if other_products_with_same_docker_image:
-                d_logger.info(f'Not removing Docker image {image_name}:{image_version} '
-                              f'used by the following other product versions: '
-                              f'{", ".join(str(p) for p in other_products_with_same_docker_image)}')
-            else:
-                try:
-                    if not self.dry_run:
-                        d_logger.debug(
-                            f'The following docker image would be removed - {image_name}:{image_version}')
-                        self.uninstall_component.uninstall_docker_image(
-                            image_name, image_version, self.docker_api)
-                    else:
-                        d_logger.info(
-                            f'The following docker image would be removed - {image_name}:{image_version}')
-
-                except ProductInstallException as err:
-                    d_logger.error(
-                        f'Failed to remove {image_name}:{image_version}: {err}')
-                    errors = True
-                    continue
 
-        if errors:
+        manifests, failures = plan_manifest_deletions(
+            self.registry_client, images, self._protected_images(), self.docker_concurrency)
+        for (image_name, image_version), err in failures:
+            d_logger.error(f'Failed to remove {image_name}:{image_version}: {err}')
+        errors = self._remove_items(
+            DOCKER_IMAGE, manifests, lambda manifest: f'{manifest[0]}@{manifest[1]}')
+        if errors or failures:
             raise ProductInstallException(f'One or more errors occurred removing '
-                                          f'Docker images for {self.pname} {self.pversion}')
+                                          f'Docker images for {self.target_description}')
 
     def remove_product_S3_artifacts(self):
-        """Remove a product's S3 artifacts.
-        This function will only remove artifacts that are not used by another
-        product in the catalog.
+        """Remove the S3 artifacts in the deletion plan.
         Args:
             None
         Returns:
@@ -459,57 +1144,41 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred removing an artifact.
         """
-
-        artifacts_to_remove = self.product.s3_artifacts
-        d_logger.debug(f'Artifacts to remove are - {artifacts_to_remove}')
-        if not artifacts_to_remove:
-            d_logger.info(
-                f"No S3 artifacts found in the configmap data for {self.pname}:{self.pversion}")
-            return
-        other_products = [
-            p for p in self.products
-            if p.name != self.product.name or p.version != self.product.version
-        ]
-
-        errors = False
-        # For each artifact to remove, check if it is shared by any other products.
-        for artifact_bucket, artifact_key in artifacts_to_remove:
-            other_products_with_same_artifact_key = [
-                other_product for other_product in other_products
-                if any([
-                    other_artifact_bucket == artifact_bucket and other_artifact_key == artifact_key
-                    for other_artifact_bucket, other_artifact_key in other_product.s3_artifacts
-                ])
-            ]
-            if other_products_with_same_artifact_key:
-                d_logger.info(f'Not removing S3 artifact {artifact_bucket}:{artifact_key} '
-                              f'used by the following other product versions: '
-                              f'{", ".join(str(p) for p in other_products_with_same_artifact_key)}')
-            else:
-                try:
-                    if not self.dry_run:
-                        d_logger.debug(
-                            f'The following artifact would be removed - {artifact_bucket}:{artifact_key}')
-                        self.uninstall_component.uninstall_S3_artifact(
-                            artifact_bucket, artifact_key)
-                    else:
-                        d_logger.info(
-                            f'The following artifact would be removed - {artifact_bucket}:{artifact_key}')
-
-                except ProductInstallException as err:
-                    d_logger.error(
-                        f'Failed to remove {artifact_bucket}:{artifact_bucket}: {err}')
-                    errors = True
-                    continue
-
+        artifacts = self._planned(S3_ARTIFACT, 'S3 artifacts')
+        errors = self._remove_items(
+            S3_ARTIFACT,
+            batch_keys(artifacts, self.s3_batch_size),
+            describe_batch
+        )
         if errors:
             raise ProductInstallException(f'One or more errors occurred removing '
-                                          f'S3 artifacts for {self.pname} {self.pversion}.')
+                                          f'S3 artifacts for {self.target_description}.')
+
+    def _get_chart_component_ids(self, charts):
+        """Find the Nexus components which store the given Helm charts.
+        Args:
+            charts (list): The (name, version) tuples of the charts.
+        Returns:
+            dict: A map from each (name, version) tuple found to a list of
+                Nexus component IDs.
+        Raises:
+            ProductInstallException: If the charts repository could not be queried.
+        """
+        if self.chart_lookup == CHART_LOOKUP_SEARCH:
+            return self.nexus_rest_client.search_chart_components(charts)
+        try:
+            return index_chart_components(
+                iter_components(self.nexus_api, NEXUS_CHARTS_REPOSITORY, host_of(self.nexus_url)),
+                charts)
+        except (HTTPError, NexusCtlHttpError) as err:
+            raise ProductInstallException(
+                f"Failed to load Nexus components for '{NEXUS_CHARTS_REPOSITORY}' repository: {err}"
+            )
 
     def remove_product_helm_charts(self):
-        """Remove a product's helm charts.
-        This function will only remove helm charts that are not used by another
-        product in the catalog.
+        """Remove the Helm charts in the deletion plan.
+        The Nexus components storing the charts are found when the plan is
+        executed.
         Args:
             None
         Returns:
@@ -517,62 +1186,26 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred removing a helm chart.
         """
-        charts_to_remove = self.product.helm_charts
-        d_logger.debug(f'Charts to remove are - {charts_to_remove}')
-        if not charts_to_remove:
-            d_logger.info(
-                f"No helm charts found in the configmap data for {self.pname}:{self.pversion}")
+        charts = self._planned(HELM_CHART, 'Helm charts')
+        if not charts:
             return
-        try:
-            nexus_charts = self.nexus_api.components.list("charts")
-        except HTTPError as err:
-            raise ProductInstallException(
-                f"Failed to load Nexus components for 'charts' repository: {err}"
-            )
-        other_products = [
-            p for p in self.products
-            if p.name != self.product.name or p.version != self.product.version
-        ]
-
-        errors = False
-        # For each chart to remove, check if it is shared by any other products.
-        for chart_name, chart_version in charts_to_remove:
-            other_products_with_same_helm_chart = [
-                other_product for other_product in other_products
-                if any([
-                    other_chart_name == chart_name and other_chart_version == chart_version
-                    for other_chart_name, other_chart_version in other_product.helm_charts
-                ])
-            ]
-            if other_products_with_same_helm_chart:
-                d_logger.info(f'Not removing Helm chart {chart_name}:{chart_version} '
-                              f'used by the following other product versions: '
-                              f'{", ".join(str(p) for p in other_products_with_same_helm_chart)}')
-            else:
-                try:
-                    for component in nexus_charts.components:
-                        if component.name == chart_name and component.version == chart_version:
-                            if not self.dry_run:
-                                d_logger.debug(
-                                    f'The following chart - {chart_name}:{chart_version} with ID {component.id} would be removed')
-                                self.uninstall_component.uninstall_helm_charts(
-                                    chart_name, chart_version, self.nexus_api, component.id)
-                            else:
-                                d_logger.info(
-                                    f'The following chart - {chart_name}:{chart_version} with ID {component.id} would be removed')
 
-                except ProductInstallException as err:
-                    d_logger.error(
-                        f'Failed to remove {chart_name}:{chart_version}: {err}')
-                    errors = True
-                    continue
+        chart_component_ids = self._get_chart_component_ids(charts)
+        chart_components = []
+        for chart_name, chart_version in charts:
+            for component_id in chart_component_ids.get((chart_name, chart_version), []):
+                d_logger.debug(
+                    f'The following chart - {chart_name}:{chart_version} with ID {component_id} would be removed')
+                chart_components.append((chart_name, chart_version, component_id))
 
+        errors = self._remove_items(
+            HELM_CHART, chart_components, lambda chart: f'{chart[0]}:{chart[1]}')
         if errors:
             raise ProductInstallException(f'One or more errors occurred while removing '
-                                          f'Helm Charts for {self.pname} {self.pversion}')
+                                          f'Helm Charts for {self.target_description}')
 
     def remove_product_loftsman_manifests(self):
-        """Remove a product's loftsman manifests.
+        """Remove the loftsman manifests in the deletion plan.
         Args:
             None
         Returns:
@@ -580,28 +1213,80 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred removing loftsman manifest.
         """
-        manifests_to_remove = self.product.loftsman_manifests
-        d_logger.debug(f'Manifests to remove are - {manifests_to_remove}')
-        if not manifests_to_remove:
-            d_logger.info(
-                f"No loftsman manifests found in the configmap data for {self.pname}:{self.pversion}")
-            return
-        try:
-            if not self.dry_run:
-                d_logger.debug(
-                    f'The following manifests would be removed - {manifests_to_remove}')
-                self.uninstall_component.uninstall_loftsman_manifests(
-                    manifests_to_remove)
-            else:
-                d_logger.info(
-                    f'The following manifests would be removed - {manifests_to_remove}')
-
-        except ProductInstallException as err:
+        manifest_keys = self._planned(LOFTSMAN_MANIFEST, 'loftsman manifests')
+        errors = self._remove_items(
+            S3_ARTIFACT,
+            batch_keys(manifest_keys, self.s3_batch_size),
+            describe_batch
+        )
+        if errors:
             raise ProductInstallException(f'One or more errors occurred while removing '
-                                          f'loftsman manifests for {self.pname} {self.pversion} \n {err}')
+                                          f'loftsman manifests for {self.target_description}')
+
+    def _find_ims_artifacts(self, component_type, bucket, ims_objects):
+        """Find the S3 objects of IMS images or recipes.
+        The objects are found from the links of each IMS record, requested
+        concurrently. The bucket is only listed, once, for records without a
+        usable link.
+        Args:
+            component_type (str): IMS_IMAGE or IMS_RECIPE.
+            bucket (str): The S3 bucket searched for the artifacts of records without a link.
+            ims_objects (list): The (name, id) tuples of the IMS objects.
+        Returns:
+            tuple: A dict from each (name, id) tuple still in IMS to the
+                (bucket, key) tuples of its S3 objects, and a list of
+                ((name, id), ProductInstallException) tuples for the IMS
+                objects which could not be read.
+        """
+        ims_type = IMS_IMAGES if component_type == IMS_IMAGE else IMS_RECIPES
+        s3_backend = self.uninstall_component.s3_backend
+        artifacts = {}
+
+        def find_linked_artifacts(ims_object):
+            artifacts[ims_object] = self.ims_client.linked_artifacts(
+                ims_type, ims_object[1], s3_backend.read_object)
+
+        failures = map_concurrently(find_linked_artifacts, ims_objects, self.ims_concurrency)
+        for (name, ims_id), linked in list(artifacts.items()):
+            if linked is None:
+                self.metrics.record_not_found(IMS_BACKEND, 'GET')
+                d_logger.warning(f'IMS {ims_type[:-1]} {name} with ID {ims_id} has already been removed')
+                del artifacts[(name, ims_id)]
+        unlinked = [ims_object for ims_object, linked in artifacts.items() if not linked]
+        if unlinked:
+            key_index = S3KeyIndex(s3_backend.list_keys(bucket), [ims_id for _, ims_id in unlinked])
+            for ims_object in unlinked:
+                artifacts[ims_object] = [(bucket, key) for key in key_index.keys_for(ims_object[1])]
+        return artifacts, failures
+
+    def _remove_ims_objects(self, component_type, bucket, ims_objects):
+        """Remove IMS images or recipes together with their S3 objects.
+        Args:
+            component_type (str): IMS_IMAGE or IMS_RECIPE.
+            bucket (str): The S3 bucket searched for the artifacts of records without a link.
+            ims_objects (list): The (name, id) tuples of the IMS objects.
+        Returns:
+            bool: True if one or more IMS objects failed to be removed.
+        """
+        if self.journal:
+            # Records removed by a previous run are not looked up again.
+            ims_objects = [ims_object for ims_object in ims_objects
+                           if not self.journal.succeeded(component_type, list(ims_object))]
+        if not ims_objects:
+            return False
+        artifacts, failures = self._find_ims_artifacts(component_type, bucket, ims_objects)
+        for (name, ims_id), err in failures:
+            d_logger.error(f'Failed to remove {name}:{ims_id}: {err}')
+        errors = self._remove_items(
+            component_type,
+            [(name, ims_id, artifacts[(name, ims_id)]) for name, ims_id in ims_objects
+             if (name, ims_id) in artifacts],
+            lambda ims_object: f'{ims_object[0]}:{ims_object[1]}'
+        )
+        return errors or bool(failures)
 
     def remove_ims_recipes(self):
-        """Remove a product's ims recipes.
+        """Remove the IMS recipes in the deletion plan.
         Args:
             None
         Returns:
@@ -609,55 +1294,13 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred removing an IMS recipe.
         """
-        ims_recipes_to_remove = self.product.recipes
-        d_logger.debug(f'IMS recipes to remove are - {ims_recipes_to_remove}')
-        if not ims_recipes_to_remove:
-            d_logger.info(
-                f"No IMS recipes found in the configmap data for {self.pname}:{self.pversion}")
-            return
-        other_products = [
-            p for p in self.products
-            if p.name != self.product.name or p.version != self.product.version
-        ]
-
-        errors = False
-        # For each recipe to remove, check if it is shared by any other products.
-        for recipe in ims_recipes_to_remove:
-            recipe_name = recipe['name']
-            recipe_id = recipe['id']
-            other_products_with_same_recipe = [
-                other_product for other_product in other_products
-                if any([
-                    other_recipe['name'] == recipe_name and other_recipe['id'] == recipe_id
-                    for other_recipe in other_product.recipes
-                ])
-            ]
-            if other_products_with_same_recipe:
-                d_logger.info(f'Not removing IMS recipe {recipe_name}:{recipe_id} '
-                              f'used by the following other product versions: '
-                              f'{", ".join(str(p) for p in other_products_with_same_recipe)}')
-            else:
-                try:
-                    if not self.dry_run:
-                        d_logger.debug(
-                            f'The following IMS recipe - {recipe_name}:{recipe_id} would be removed')
-                        self.uninstall_component.uninstall_ims_recipes(
-                            recipe_name, recipe_id)
-                    else:
-                        d_logger.info(
-                            f'The following IMS recipe - {recipe_name}:{recipe_id} would be removed')
-                except ProductInstallException as err:
-                    d_logger.error(
-                        f'Failed to remove {recipe_name}:{recipe_id}: {err}')
-                    errors = True
-                    continue
-
-        if errors:
+        recipes = self._planned(IMS_RECIPE, 'IMS recipes')
+        if self._remove_ims_objects(IMS_RECIPE, IMS_RECIPES_BUCKET, recipes):
             raise ProductInstallException(f'One or more errors occurred removing '
-                                          f'IMS recipes for {self.pname} {self.pversion}')
+                                          f'IMS recipes for {self.target_description}')
 
     def remove_ims_images(self):
-        """Remove a product's ims images.
+        """Remove the IMS images in the deletion plan.
         Args:
             None
         Returns:
@@ -665,56 +1308,28 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred removing an IMS image.
         """
-        ims_images_to_remove = self.product.images
-        d_logger.debug(f'IMS images to remove are - {ims_images_to_remove}')
-        if not ims_images_to_remove:
-            d_logger.info(
-                f"No IMS images found in the configmap data for {self.pname}:{self.pversion}")
-            return
-        other_products = [
-            p for p in self.products
-            if p.name != self.product.name or p.version != self.product.version
-        ]
-
-        errors = False
-        # For each image to remove, check if it is shared by any other products.
-        for image in ims_images_to_remove:
-            image_name = image['name']
-            image_id = image['id']
-            other_products_with_same_image = [
-                other_product for other_product in other_products
-                if any([
-                    other_image['name'] == image_name and other_image['id'] == image_id
-                    for other_image in other_product.images
-                ])
-            ]
-            if other_products_with_same_image:
-                d_logger.info(f'Not removing IMS image {image_name}:{image_id} '
-                              f'used by the following other product versions: '
-                              f'{", ".join(str(p) for p in other_products_with_same_image)}')
-            else:
-                try:
-                    if not self.dry_run:
-                        d_logger.debug(
-                            f'The following IMS image - {image_name}:{image_id} would be removed')
-                        self.uninstall_component.uninstall_ims_images(
-                            image_name, image_id)
-                    else:
-                        d_logger.info(
-                            f'The following IMS image - {image_name}:{image_id} would be removed')
+        images = self._planned(IMS_IMAGE, 'IMS images')
+        if self._remove_ims_objects(IMS_IMAGE, IMS_IMAGES_BUCKET, images):
+            raise ProductInstallException(f'One or more errors occurred removing '
+                                          f'IMS images for {self.target_description}')
 
-                except ProductInstallException as err:
-                    d_logger.error(
-                        f'Failed to remove {image_name}:{image_id}: {err}')
-                    errors = True
-                    continue
+    def _report_repository_sizes(self, repo_names):
+        """Log and record the estimated storage reclaimed by removing repositories.
+        Args:
+            repo_names (list): The names of the repositories.
+        Returns:
+            None
+        """
+        def report_size(repo_name):
+            size = self.nexus_rest_client.repository_size(repo_name)
+            self.metrics.record_reclaimed(NEXUS_BACKEND, repo_name, size)
+            d_logger.info(f'Removing repository {repo_name} reclaims an estimated {size} bytes')
 
-        if errors:
-            raise ProductInstallException(f'One or more errors occurred removing '
-                                          f'IMS images for {self.pname} {self.pversion}')
+        for repo_name, err in map_concurrently(report_size, repo_names, self.nexus_concurrency):
+            d_logger.warning(f'Unable to estimate the size of repository {repo_name}: {err}')
 
     def remove_product_hosted_repos(self):
-        """Remove a product's hosted repositories.
+        """Remove the hosted repositories in the deletion plan.
         Args:
             None
         Returns:
@@ -722,56 +1337,38 @@ class DeleteProductComponent(ProductCatalog):
         Raises:
             ProductInstallException: If an error occurred uninstalling repositories.
         """
-        hosted_repos_to_remove = self.product.hosted_repositories
-        d_logger.debug(
-            f'Hosted repositories to remove are - {hosted_repos_to_remove}')
-        if not hosted_repos_to_remove:
-            d_logger.info(
-                f"No hosted repos found in the configmap data for {self.pname}:{self.pversion}")
+        repo_names = [name for name, _ in self._planned(HOSTED_REPO, 'hosted repositories')]
+        if not repo_names:
             return
-        other_products = [
-            p for p in self.products
-            if p.name != self.product.name or p.version != self.product.version
-        ]
-
-        errors = False
-        # For each hosted repo to remove, check if it is shared by any other products.
-        for hosted_repo in hosted_repos_to_remove:
-            hosted_repo_name = hosted_repo['name']
-            hosted_repo_type = hosted_repo['type']
-            other_products_with_same_hosted_repo = [
-                other_product for other_product in other_products
-                if any([
-                    other_hosted_repo['name'] == hosted_repo_name and other_hosted_repo['type'] == hosted_repo_type
-                    for other_hosted_repo in other_product.hosted_repositories
-                ])
-            ]
-            if other_products_with_same_hosted_repo:
-                d_logger.info(f'Not removing hosted repo {hosted_repo_name} '
-                              f'used by the following other product versions: '
-                              f'{", ".join(str(p) for p in other_products_with_same_hosted_repo)}')
-            else:
-                try:
-                    if not self.dry_run:
-                        d_logger.debug(
-                            f'The following hosted repo - {hosted_repo_name} would be removed')
-                        self.uninstall_component.uninstall_hosted_repos(
-                            hosted_repo_name, self.nexus_api)
-                    else:
-                        d_logger.info(
-                            f'The following hosted repo - {hosted_repo_name} would be removed')
-
-                except ProductInstallException as err:
-                    d_logger.error(
-                        f'Failed to remove {hosted_repo_name} : {err}')
-                    errors = True
-                    continue
+        existing_repos = self.nexus_repositories
+        if existing_repos is not None:
+            # Skip repositories a previous run removed without a request for each.
+            for repo_name in repo_names:
+                if repo_name not in existing_repos:
+                    self.metrics.record_not_found(NEXUS_BACKEND, 'DELETE')
+                    d_logger.warning(f'{repo_name} has already been removed')
+            repo_names = [repo_name for repo_name in repo_names if repo_name in existing_repos]
+        if self.report_repo_sizes:
+            self._report_repository_sizes(repo_names)
+        errors = self._remove_items(HOSTED_REPO, repo_names, str)
         if errors:
             raise ProductInstallException(f'One or more errors occurred removing '
-                                          f'hosted repos for {self.pname} {self.pversion}')
+                                          f'hosted repos for {self.target_description}')
+
+    def close(self):
+        """Release the resources used to remove components.
+        Args:
+            None
+        Returns:
+            None
+        """
+        with self._clients_lock:
+            if self._async_engine:
+                self._async_engine.close()
+                self._async_engine = None
 
     def remove_product_entry(self):
-        """Remove this product version's entry from the product catalog.
+        """Remove the entries of the product versions being deleted from the product catalog.
         This function uses the catalog_delete script provided by
         cray-product-catalog.
         Args:
@@ -779,21 +1376,192 @@ class DeleteProductComponent(ProductCatalog):
         Returns:
             None
         Raises:
-            ProductInstallException: If an error occurred removing the entry.
-        """
-        # Use os.environ so that PATH and VIRTUAL_ENV are used
-        os.environ.update({
-            'PRODUCT': self.pname,
-            'PRODUCT_VERSION': self.pversion,
-            'CONFIG_MAP': self.catalogname,
-            'CONFIG_MAP_NS': self.catalognamespace,
-            'VALIDATE_SCHEMA': 'true'
-        })
+            ProductInstallException: If an error occurred removing an entry.
+        """
+        errors = []
+        for pname, pversion in self.product_versions:
+            # Use os.environ so that PATH and VIRTUAL_ENV are used
+            os.environ.update({
+                'PRODUCT': pname,
+                'PRODUCT_VERSION': pversion,
+                'CONFIG_MAP': self.catalogname,
+                'CONFIG_MAP_NS': self.catalognamespace,
+                'VALIDATE_SCHEMA': 'true'
+            })
+            try:
+                subprocess.check_output(['catalog_delete'])
+                d_logger.info(
+                    f'Deleted {pname}-{pversion} from product catalog')
+            except subprocess.CalledProcessError as err:
+                errors.append(f'Error removing {pname}-{pversion} from product catalog: {err}')
+        if errors:
+            raise ProductInstallException('\n'.join(errors))
+
+
+class GarbageCollector(DeleteProductComponent):
+    """Find, and optionally remove, the artifacts which no product version in the catalog owns.
+    Only the places products install to are searched: the tags of registry
+    images, the versions of Helm charts, and the S3 directories, holding a
+    component of a product version, and hosted repositories named after a
+    product.
+    """
+
+    def __init__(self, backends=GC_BACKENDS, remove=False, **kwargs):
+        """Create the garbage collector.
+        Args:
+            backends (iterable): The backends to search, from GC_BACKENDS.
+            remove (bool): Remove the orphans found instead of only reporting them.
+            kwargs: The arguments of DeleteProductComponent other than the
+                product versions.
+        """
+        self.backends = list(backends)
+        self.remove = remove
+        self.report = OrphanReport(removed=remove)
+        super().__init__(product_versions=[], **kwargs)
+
+    def _compile_plan(self):
+        """Index the owners of every component in the catalog.
+        Returns:
+            None
+        """
+        self.target_description = 'orphaned artifacts'
+        self.products_to_delete = []
+        self.product = None
+        # Every component of every product version is owned, so every entry is parsed.
+        if self.ownership_index is None:
+            self.ownership_index = ComponentOwnershipIndex(self.products)
+        self.plan = DeletionPlan([])
+        self._store_catalog_snapshot()
+
+    def phases(self):
+        """Get the phases which search the selected backends.
+        Returns:
+            list: (name, callable) tuples for PhaseScheduler.
+        """
+        phases = {
+            DOCKER_BACKEND: [('orphaned Docker images', self.collect_docker_images)],
+            NEXUS_BACKEND: [('orphaned Helm charts', self.collect_helm_charts),
+                            ('orphaned hosted repositories', self.collect_hosted_repos)],
+            S3_BACKEND: [('orphaned S3 artifacts', self.collect_s3_artifacts)],
+        }
+        return [phase for backend in self.backends for phase in phases[backend]]
+
+    def _found(self, component_type, orphans, description):
+        """Report the orphans of one type of component.
+        Args:
+            component_type (str): The type of the components.
+            orphans (list): The identifiers of the orphans.
+            description (str): The plural name of the components for log messages.
+        Returns:
+            bool: True if the orphans should be removed.
+        """
+        self.report.add(component_type, orphans)
+        d_logger.info(f'Found {len(orphans)} orphaned {description}')
+        return bool(orphans) and self.remove and not self.dry_run
+
+    def collect_docker_images(self):
+        """Find the tags of registry images which no product version owns.
+        Only images with a tag owned by a product version are listed. A
+        manifest is kept if an owned tag points to it.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If an image could not be listed, or an
+                orphan could not be removed.
+        """
+        owned = set(self.ownership_index.components(DOCKER_IMAGE))
+        names = sorted({name for name, _ in owned})
+
+        def list_orphans(name):
+            try:
+                return find_orphans(((name, tag) for tag in self.registry_client.list_tags(name)), owned), None
+            except ProductInstallException as err:
+                return [], err
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.docker_concurrency, len(names)))) as executor:
+            results = list(executor.map(list_orphans, names))
+        orphans = [image for image_orphans, _ in results for image in image_orphans]
+        listing_errors = [err for _, err in results if err]
+        for err in listing_errors:
+            d_logger.error(err)
+
+        errors = False
+        if self._found(DOCKER_IMAGE, orphans, 'Docker image tags'):
+            protected_images = {
+                image: sorted(self.ownership_index.owners(DOCKER_IMAGE, image), key=str) for image in owned
+            }
+            manifests, failures = plan_manifest_deletions(
+                self.registry_client, orphans, protected_images, self.docker_concurrency)
+            for (image_name, image_version), err in failures:
+                d_logger.error(f'Failed to remove {image_name}:{image_version}: {err}')
+            errors = self._remove_items(
+                DOCKER_IMAGE, manifests, lambda manifest: f'{manifest[0]}@{manifest[1]}') or failures
+        if listing_errors or errors:
+            raise ProductInstallException('One or more errors occurred collecting orphaned Docker images')
+
+    def collect_helm_charts(self):
+        """Find the Helm charts in the charts repository which no product version owns.
+        Only the versions of charts with a version owned by a product version
+        are candidates, so charts uploaded by other means are kept.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If the charts repository could not be
+                listed, or an orphan could not be removed.
+        """
+        owned = set(self.ownership_index.components(HELM_CHART))
+        names = {name for name, _ in owned}
         try:
-            subprocess.check_output(['catalog_delete'])
-            d_logger.info(
-                f'Deleted {self.pname}-{self.pversion} from product catalog')
-        except subprocess.CalledProcessError as err:
+            orphans = [
+                (component.name, component.version, component.id)
+                for component in iter_components(self.nexus_api, NEXUS_CHARTS_REPOSITORY, host_of(self.nexus_url))
+                if component.name in names and (component.name, component.version) not in owned
+            ]
+        except (HTTPError, NexusCtlHttpError) as err:
             raise ProductInstallException(
-                f'Error removing {self.pname}-{self.pversion} from product catalog: {err}'
+                f"Failed to load Nexus components for '{NEXUS_CHARTS_REPOSITORY}' repository: {err}"
             )
+        if self._found(HELM_CHART, [chart[:2] for chart in orphans], 'Helm charts'):
+            if self._remove_items(HELM_CHART, orphans, lambda chart: f'{chart[0]}:{chart[1]}'):
+                raise ProductInstallException('One or more errors occurred removing orphaned Helm charts')
+
+    def collect_hosted_repos(self):
+        """Find the hosted repositories named after a product which no product version owns.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If the repositories could not be listed,
+                or an orphan could not be removed.
+        """
+        owned = {name for name, _ in self.ownership_index.components(HOSTED_REPO)}
+        product_names = sorted({product.name for product in self.products})
+        orphans = find_orphans(
+            (repository['name'] for repository in self.nexus_rest_client.repositories()
+             if is_product_repository(repository, product_names)),
+            owned
+        )
+        if self._found(HOSTED_REPO, orphans, 'hosted repositories'):
+            if self._remove_items(HOSTED_REPO, orphans, str):
+                raise ProductInstallException('One or more errors occurred removing orphaned hosted repositories')
+
+    def collect_s3_artifacts(self):
+        """Find the S3 objects which no product version owns in the directories holding product artifacts.
+        Loftsman manifests are owned S3 objects too.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If a bucket could not be listed, or an
+                orphan could not be removed.
+        """
+        owned = (set(self.ownership_index.components(S3_ARTIFACT)) |
+                 catalog_components(self.products, LOFTSMAN_MANIFEST))
+        orphans = []
+        for bucket, directories in s3_scopes(owned).items():
+            orphans.extend(find_orphans(
+                ((bucket, key) for key in self.uninstall_component.s3_backend.list_keys(bucket)
+                 if s3_key_directory(key) in directories),
+                owned
+            ))
+        if self._found(S3_ARTIFACT, orphans, 'S3 artifacts'):
+            if self._remove_items(S3_ARTIFACT, batch_keys(orphans, self.s3_batch_size), describe_batch):
+                raise ProductInstallException('One or more errors occurred removing orphaned S3 artifacts')
@@ -0,0 +1,163 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Finding the artifacts which no product version in the catalog owns.
+"""
+
+import json
+import threading
+
+from product_deletion_utility.components.ownership import (
+    COMPONENT_ATTRIBUTES,
+    DOCKER_BACKEND,
+    NEXUS_BACKEND,
+    S3_BACKEND,
+)
+
+# The backends searched for orphaned artifacts.
+GC_BACKENDS = (DOCKER_BACKEND, NEXUS_BACKEND, S3_BACKEND)
+
+
+def catalog_components(products, component_type):
+    """Get the identifiers of every component of a type in the catalog.
+    Args:
+        products (iterable): InstalledProductVersion objects.
+        component_type (str): One of the component type constants in
+            product_deletion_utility.components.ownership.
+    Returns:
+        set: The identifiers of the components.
+    """
+    return {
+        component_key(component)
+        for attribute_type, attribute, component_key in COMPONENT_ATTRIBUTES
+        if attribute_type == component_type
+        for product in products
+        for component in getattr(product, attribute)
+    }
+
+
+def find_orphans(inventory, owned):
+    """Find the items of an inventory which are not owned.
+    Args:
+        inventory (iterable): The items found in a backend. It is consumed
+            once, so it may stream a listing page by page.
+        owned (set): The items owned by the product catalog.
+    Returns:
+        list: The items of the inventory which are not owned.
+    """
+    return [item for item in inventory if item not in owned]
+
+
+def s3_key_directory(key):
+    """Get the directory of an S3 key, e.g. cos/2.5.1/ for cos/2.5.1/kernel.
+    Args:
+        key (str): The key.
+    Returns:
+        str or None: The directory, ending with a slash, or None if the key
+            is at the top level of its bucket.
+    """
+    directory, separator, _ = key.rpartition('/')
+    return directory + separator if separator else None
+
+
+def s3_scopes(bucket_keys):
+    """Get the S3 directories holding the objects of products.
+    Only the objects directly in these directories are searched for orphans,
+    since the rest of a bucket may hold objects which were never installed
+    by a product, such as the artifacts of IMS images which were built on
+    the system. Keys at the top level of a bucket add no directory.
+    Args:
+        bucket_keys (iterable): (bucket, key) tuples owned by the catalog.
+    Returns:
+        dict: A map from each bucket to a frozenset of the directories of
+            its owned keys.
+    """
+    scopes = {}
+    for bucket, key in bucket_keys:
+        directory = s3_key_directory(key)
+        if directory:
+            scopes.setdefault(bucket, set()).add(directory)
+    return {bucket: frozenset(directories) for bucket, directories in scopes.items()}
+
+
+def is_product_repository(repository, product_names):
+    """Check whether a Nexus repository is a hosted repository named after a product.
+    Args:
+        repository (dict): The repository as listed by the Nexus REST API.
+        product_names (iterable): The names of the products in the catalog.
+    Returns:
+        bool: True if the repository is hosted and its name starts with the
+            name of a product followed by a dash, e.g. cos-2.5.1-sle-15sp4.
+    """
+    return (repository.get('type') == 'hosted'
+            and repository['name'].startswith(tuple(f'{name}-' for name in product_names)))
+
+
+class OrphanReport():
+    """The orphaned artifacts found by each garbage collection phase.
+    Phases may add to the report from any thread.
+    """
+
+    def __init__(self, removed=False):
+        """Create an empty report.
+        Args:
+            removed (bool): Whether the orphans are removed, or only reported.
+        """
+        self.removed = removed
+        self._lock = threading.Lock()
+        self._orphans = {}
+
+    def add(self, component_type, keys):
+        """Record the orphans of one type of component.
+        Args:
+            component_type (str): The type of the components.
+            keys (list): The identifiers of the orphaned components.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._orphans.setdefault(component_type, []).extend(keys)
+
+    def to_dict(self):
+        """Get a JSON-serializable representation of the report.
+        Returns:
+            dict: Whether the orphans were removed, the number of orphans of
+                each type, and their identifiers.
+        """
+        with self._lock:
+            return {
+                'removed': self.removed,
+                'counts': {component_type: len(keys) for component_type, keys in self._orphans.items()},
+                'orphans': {
+                    component_type: [list(key) if isinstance(key, tuple) else key for key in keys]
+                    for component_type, keys in self._orphans.items()
+                },
+            }
+
+    def to_json(self):
+        """Serialize the report as JSON.
+        Returns:
+            str: The report as an indented JSON document.
+        """
+        return json.dumps(self.to_dict(), indent=2)
@@ -0,0 +1,174 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Client of the Image Management Service (IMS) API.
+"""
+
+import json
+import logging
+
+import requests
+
+from product_deletion_utility.components.constants import DEFAULT_IMS_CONCURRENCY
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ownership import IMS_BACKEND
+from product_deletion_utility.components.retry import call_with_retry, host_of
+from product_deletion_utility.components.session import BearerTokenAuth, OidcToken, pooled_session
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+IMS_IMAGES = 'images'
+IMS_RECIPES = 'recipes'
+
+
+def ims_api_url(api_gateway_url):
+    """Get the base URL of the IMS v3 API.
+    Args:
+        api_gateway_url (str): The base URL of the API gateway, with or
+            without the /apis/ims/v3 suffix.
+    Returns:
+        str: The base URL of the IMS v3 API without a trailing slash.
+    """
+    api_gateway_url = api_gateway_url.rstrip('/')
+    if not api_gateway_url.endswith('/apis/ims/v3'):
+        api_gateway_url = f'{api_gateway_url}/apis/ims/v3'
+    return api_gateway_url
+
+
+def parse_s3_link(link):
+    """Get the S3 object an IMS link points to.
+    Args:
+        link (dict): The link of an IMS record or manifest artifact, with
+            type and path keys, e.g. {'type': 's3', 'path': 's3://boot-images/ID/manifest.json'}.
+    Returns:
+        tuple or None: The (bucket, key) of the object, or None if the link
+            is missing or is not an S3 link.
+    """
+    if not isinstance(link, dict) or link.get('type') != 's3':
+        return None
+    bucket, _, key = (link.get('path') or '').replace('s3://', '', 1).partition('/')
+    if not bucket or not key:
+        return None
+    return bucket, key
+
+
+class ImsClient():
+    """A client of the IMS API using a single pool of authenticated connections.
+    Requests are authenticated with the API gateway token used by the cray
+    CLI, which is read the first time a request is made.
+    """
+
+    def __init__(self, api_gateway_url, session=None, max_connections=DEFAULT_IMS_CONCURRENCY,
+                 credentials_file=None):
+        """Create the client.
+        Args:
+            api_gateway_url (str): The base URL of the API gateway.
+            session (requests.Session): The session to use, authenticated with
+                the API gateway token. A new session, whose requests are
+                recorded in METRICS, is created if not given.
+            max_connections (int): The size of the connection pool of a new session.
+            credentials_file (str): The API gateway token file of a new
+                session. Defaults to the file named by the CRAY_CREDENTIALS
+                environment variable.
+        """
+        self.ims_url = ims_api_url(api_gateway_url)
+        if session is None:
+            session = pooled_session(IMS_BACKEND, max_connections,
+                                     BearerTokenAuth(OidcToken(api_gateway_url, credentials_file)))
+        self.session = session
+
+    def get_record(self, ims_type, ims_id):
+        """Get an IMS image or recipe.
+        Args:
+            ims_type (str): IMS_IMAGES or IMS_RECIPES.
+            ims_id (str): The IMS ID of the image or recipe.
+        Returns:
+            dict or None: The record, or None if it does not exist.
+        Raises:
+            ProductInstallException: If the record could not be read.
+        """
+        url = f'{self.ims_url}/{ims_type}/{ims_id}'
+        try:
+            response = call_with_retry(lambda: self.session.get(url), host_of(url),
+                                       IMS_BACKEND, 'GET', check_response=True)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as err:
+            raise ProductInstallException(f'Failed to get IMS {ims_type[:-1]} {ims_id}: {err}')
+
+    def delete_record(self, ims_type, ims_id):
+        """Delete an IMS image or recipe.
+        Args:
+            ims_type (str): IMS_IMAGES or IMS_RECIPES.
+            ims_id (str): The IMS ID of the image or recipe.
+        Returns:
+            bool: True if the record was deleted, or False if it did not exist.
+        Raises:
+            ProductInstallException: If the record could not be deleted.
+        """
+        url = f'{self.ims_url}/{ims_type}/{ims_id}'
+        try:
+            response = call_with_retry(lambda: self.session.delete(url), host_of(url),
+                                       IMS_BACKEND, 'DELETE', check_response=True)
+            if response.status_code == 404:
+                return False
+            response.raise_for_status()
+        except requests.RequestException as err:
+            raise ProductInstallException(f'Failed to remove IMS {ims_type[:-1]} {ims_id}: {err}')
+        return True
+
+    def linked_artifacts(self, ims_type, ims_id, read_object):
+        """Find the S3 objects of an IMS image or recipe from its links.
+        The link of a recipe points to its archive. The link of an image
+        points to its manifest, which links to each artifact of the image.
+        Args:
+            ims_type (str): IMS_IMAGES or IMS_RECIPES.
+            ims_id (str): The IMS ID of the image or recipe.
+            read_object (callable): Reads an S3 object given its bucket and
+                key, returning its content or None if it does not exist.
+        Returns:
+            list or None: The (bucket, key) tuples of the objects, empty if
+                the record has no usable link, or None if the record does not exist.
+        Raises:
+            ProductInstallException: If the record or the manifest could not be read.
+        """
+        record = self.get_record(ims_type, ims_id)
+        if record is None:
+            return None
+        link = parse_s3_link(record.get('link'))
+        if link is None or ims_type == IMS_RECIPES:
+            return [link] if link else []
+        manifest = read_object(*link)
+        if manifest is None:
+            return []
+        try:
+            artifacts = json.loads(manifest).get('artifacts') or []
+        except (ValueError, AttributeError) as err:
+            raise ProductInstallException(
+                f'Failed to parse the manifest of IMS image {ims_id} at {link[0]}/{link[1]}: {err}')
+        linked = [parse_s3_link(artifact.get('link')) for artifact in artifacts if isinstance(artifact, dict)]
+        # The manifest is removed after the artifacts it links to.
+        return [artifact for artifact in linked if artifact] + [link]
@@ -0,0 +1,204 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+A persistent journal of the deletions made for a product version.
+"""
+
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ownership import IMS_IMAGE, IMS_RECIPE, S3_ARTIFACT
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+PENDING = 'pending'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+def journal_path(journal_dir, product_versions):
+    """Get the path of the journal for the given product versions.
+    Args:
+        journal_dir (str): The directory holding journals.
+        product_versions (list): The (name, version) tuples being deleted.
+    Returns:
+        str: The path of the journal file.
+    """
+    name = '_'.join(f'{name}-{version}' for name, version in product_versions)
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', name)
+    return os.path.join(journal_dir, f'deletion-journal-{name}.jsonl')
+
+
+def journal_entries(component_type, item):
+    """Get the journal keys of an item passed to a removal.
+    A batch of S3 objects is journaled per object, so that a resumed run
+    only removes the objects which are still outstanding. IMS images and
+    recipes are identified by their name and ID.
+    Args:
+        component_type (str): One of the component type constants in
+            product_deletion_utility.components.ownership.
+        item (tuple or str): The item being removed.
+    Returns:
+        list: The JSON-serializable keys of the item.
+    """
+    if component_type == S3_ARTIFACT:
+        bucket, keys = item
+        return [[bucket, key] for key in keys]
+    if component_type in (IMS_IMAGE, IMS_RECIPE):
+        return [list(item[:2])]
+    return [list(item) if isinstance(item, tuple) else item]
+
+
+class DeletionJournal():
+    """An append-only JSON Lines journal of planned and completed deletions.
+    Each line records the state of one item: pending when it is about to be
+    removed, then succeeded or failed. When resuming, the journal of the
+    previous run is replayed so items which were already removed are skipped.
+    """
+
+    def __init__(self, path, resume=False):
+        """Open the journal.
+        Args:
+            path (str): The path of the journal file.
+            resume (bool): If True, load the states recorded by a previous
+                run and append to its journal. Otherwise start a new journal.
+        Raises:
+            ProductInstallException: If the journal could not be opened.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._states = {}
+        if resume:
+            self._load()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._file = open(path, 'a' if resume else 'w')
+        except OSError as err:
+            raise ProductInstallException(f'Unable to open deletion journal {path}: {err}')
+
+    @staticmethod
+    def _entry_id(component_type, key):
+        return json.dumps([component_type, key], sort_keys=True)
+
+    def _load(self):
+        """Replay the states recorded in an existing journal."""
+        if not os.path.exists(self.path):
+            d_logger.warning(f'No deletion journal found at {self.path}; nothing to resume')
+            return
+        with open(self.path) as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                    self._states[self._entry_id(entry['type'], entry['key'])] = entry['state']
+                except (ValueError, KeyError):
+                    # The last line may be truncated if the previous run was killed.
+                    d_logger.warning(f'Ignoring unreadable line {line_number} of {self.path}')
+        d_logger.info(f'Resuming from deletion journal {self.path}')
+
+    def succeeded(self, component_type, key):
+        """Check whether an item was removed by this or a previous run.
+        Args:
+            component_type (str): The type of the component.
+            key: The journal key of the item.
+        Returns:
+            bool: True if the item was removed successfully.
+        """
+        with self._lock:
+            return self._states.get(self._entry_id(component_type, key)) == SUCCEEDED
+
+    def record(self, component_type, key, state, error=None):
+        """Append the state of an item to the journal.
+        Args:
+            component_type (str): The type of the component.
+            key: The journal key of the item.
+            state (str): One of PENDING, SUCCEEDED or FAILED.
+            error (Exception): The error if the item failed.
+        Returns:
+            None
+        """
+        entry = {
+            'time': datetime.datetime.utcnow().isoformat() + 'Z',
+            'type': component_type,
+            'key': key,
+            'state': state,
+        }
+        if error is not None:
+            entry['error'] = str(error)
+        with self._lock:
+            self._states[self._entry_id(component_type, key)] = state
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+
+    def outstanding(self, component_type, items):
+        """Drop the items already removed and record the rest as pending.
+        Args:
+            component_type (str): The type of the components.
+            items (list): The items about to be removed.
+        Returns:
+            list: The items which still need to be removed. S3 batches are
+                trimmed to the objects which were not removed yet.
+        """
+        remaining = []
+        for item in items:
+            if component_type == S3_ARTIFACT:
+                bucket, keys = item
+                keys = [key for key in keys if not self.succeeded(component_type, [bucket, key])]
+                if not keys:
+                    continue
+                item = (bucket, keys)
+            elif self.succeeded(component_type, journal_entries(component_type, item)[0]):
+                d_logger.info(f'Skipping {component_type} {item}; removed by a previous run')
+                continue
+            for key in journal_entries(component_type, item):
+                self.record(component_type, key, PENDING)
+            remaining.append(item)
+        return remaining
+
+    def record_results(self, component_type, items, failures):
+        """Record the outcome of removing items.
+        Args:
+            component_type (str): The type of the components.
+            items (list): The items which were removed.
+            failures (list): (item, error) tuples for the items which failed.
+        Returns:
+            None
+        """
+        errors = {id(item): err for item, err in failures}
+        for item in items:
+            err = errors.get(id(item))
+            for key in journal_entries(component_type, item):
+                self.record(component_type, key, FAILED if err else SUCCEEDED, err)
+
+    def close(self):
+        """Close the journal file.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._file.close()
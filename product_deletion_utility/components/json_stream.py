@@ -0,0 +1,144 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Incremental parsing of large JSON documents.
+"""
+
+import json
+
+# The number of characters read from the stream at a time.
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+# The characters which may follow the shortest valid prefix of a JSON number.
+_NUMBER_CONTINUATION = ('', '.', 'e', 'E', '+', '-') + tuple('0123456789')
+
+
+class _Reader():
+    """A buffer over a text stream, refilled as the document is parsed."""
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        """Read another chunk, discarding the part of the buffer already parsed.
+        Returns:
+            bool: False if the end of the stream was reached.
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self):
+        """Skip whitespace and get the next character, or '' at the end of the stream."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    def expect(self, characters):
+        """Consume the next character, which must be one of the given ones.
+        Returns:
+            str: The character.
+        Raises:
+            ValueError: If the next character is not one of them.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f'Expected one of {characters!r} in JSON document, found {character!r}')
+        self.position += 1
+        return character
+
+    def value(self, decoder):
+        """Decode the next complete JSON value, reading more of the stream as needed.
+        Returns:
+            The decoded value.
+        Raises:
+            ValueError: If the document is not valid JSON.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value may continue in the next chunk.
+                if self.fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk.
+            if (isinstance(value, (int, float)) and self.buffer[end:end + 1] in _NUMBER_CONTINUATION
+                    and self.fill()):
+                continue
+            self.position = end
+            return value
+
+
+def iter_array_items(stream, key, chunk_size=CHUNK_SIZE):
+    """Iterate over the items of an array in a JSON object without reading the whole object.
+    Only one item, and one chunk of the stream, is held in memory at a time,
+    so listings far larger than the memory available can be processed.
+    Args:
+        stream (io.TextIOBase): A stream of a JSON object, e.g. the standard
+            output of a command.
+        key (str): The key of the array in the top-level object. If the key
+            is absent, nothing is returned.
+        chunk_size (int): The number of characters read at a time.
+    Returns:
+        generator: The decoded items of the array.
+    Raises:
+        ValueError: If the document is not a valid JSON object.
+    """
+    reader = _Reader(stream, chunk_size)
+    decoder = json.JSONDecoder()
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        member = reader.value(decoder)
+        reader.expect(':')
+        if member == key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.position += 1
+            else:
+                while True:
+                    yield reader.value(decoder)
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            # Other members are small, so they are decoded whole and discarded.
+            reader.value(decoder)
+        if reader.expect(',}') == '}':
+            return
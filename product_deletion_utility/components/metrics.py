@@ -0,0 +1,386 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Timing and request metrics collected while deleting product versions.
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+# The upper bounds, in seconds, of the buckets of the latency histograms.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_PREFIX = 'product_deletion'
+
+
+class Histogram():
+    """A cumulative histogram of durations in the Prometheus style."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        """Record a duration.
+        Args:
+            seconds (float): The duration.
+        Returns:
+            None
+        """
+        self.count += 1
+        self.sum += seconds
+        for index, upper_bound in enumerate(self.buckets):
+            if seconds <= upper_bound:
+                self.counts[index] += 1
+
+    def to_dict(self):
+        """Get a JSON-serializable representation of the histogram."""
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 6),
+            'buckets': {str(upper_bound): count for upper_bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+class RequestStats():
+    """Counters for the requests made to one backend with one method."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.not_found = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency = Histogram()
+
+    def to_dict(self):
+        """Get a JSON-serializable representation of the counters."""
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'not_found': self.not_found,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'latency': self.latency.to_dict(),
+        }
+
+
+class Metrics():
+    """Metrics of a deletion: the wall time of each phase, and the latency and
+    outcome of each removal and backend request.
+    All methods may be called from any thread.
+    """
+
+    def __init__(self, parent=None):
+        """Create the metrics.
+        Args:
+            parent (Metrics): Metrics which everything recorded here is also
+                recorded in, e.g. those of the process for the metrics of a job.
+        """
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.phases = {}
+        self.removals = {}
+        self.requests = {}
+        self.reclaimed = {}
+
+    @contextmanager
+    def phase(self, phase_name):
+        """Time a removal phase.
+        Args:
+            phase_name (str): The name of the phase.
+        Returns:
+            A context manager timing the phase. The phase failed if it raises.
+        """
+        start = time.monotonic()
+        status = 'failed'
+        try:
+            yield
+            status = 'succeeded'
+        finally:
+            self._record_phase(phase_name, time.monotonic() - start, status)
+
+    def _record_phase(self, phase_name, seconds, status):
+        with self._lock:
+            self.phases[phase_name] = {'seconds': round(seconds, 6), 'status': status}
+        if self.parent:
+            self.parent._record_phase(phase_name, seconds, status)
+
+    @contextmanager
+    def removal(self, component_type):
+        """Time the removal of one item, e.g. one call to UninstallComponents.
+        Args:
+            component_type (str): The type of the component removed.
+        Returns:
+            A context manager timing the removal. The removal failed if it raises.
+        """
+        start = time.monotonic()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self._record_removal(component_type, time.monotonic() - start, failed)
+
+    def _record_removal(self, component_type, seconds, failed):
+        with self._lock:
+            stats = self.removals.setdefault(
+                component_type, {'count': 0, 'failed': 0, 'latency': Histogram()})
+            stats['count'] += 1
+            stats['failed'] += failed
+            stats['latency'].observe(seconds)
+        if self.parent:
+            self.parent._record_removal(component_type, seconds, failed)
+
+    def _request_stats(self, backend, method):
+        return self.requests.setdefault(backend, {}).setdefault(method, RequestStats())
+
+    def record_request(self, backend, method, seconds, status=None, size=0):
+        """Record a request made to a backend.
+        Args:
+            backend (str): The backend, e.g. 'docker' or 'nexus'.
+            method (str): The HTTP method or operation name.
+            seconds (float): The latency of the request.
+            status (int): The HTTP status of the response, or None if no
+                response was received.
+            size (int): The number of bytes in the response body.
+        Returns:
+            None
+        """
+        with self._lock:
+            stats = self._request_stats(backend, method)
+            stats.count += 1
+            stats.bytes += size
+            stats.latency.observe(seconds)
+            if status == 404:
+                stats.not_found += 1
+            elif status is None or status >= 400:
+                stats.errors += 1
+        if self.parent:
+            self.parent.record_request(backend, method, seconds, status, size)
+
+    def record_not_found(self, backend, method):
+        """Record a component which was already removed, found without an HTTP status.
+        Args:
+            backend (str): The backend, e.g. 's3' or 'ims'.
+            method (str): The operation name.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._request_stats(backend, method).not_found += 1
+        if self.parent:
+            self.parent.record_not_found(backend, method)
+
+    def record_retry(self, backend, method):
+        """Record a request which is retried.
+        Args:
+            backend (str): The backend.
+            method (str): The HTTP method or operation name.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._request_stats(backend, method).retries += 1
+        if self.parent:
+            self.parent.record_retry(backend, method)
+
+    def record_reclaimed(self, backend, component, size):
+        """Record the estimated storage reclaimed by removing a component.
+        Args:
+            backend (str): The backend storing the component.
+            component (str): The name of the component, e.g. a repository.
+            size (int): The estimated number of bytes.
+        Returns:
+            None
+        """
+        with self._lock:
+            self.reclaimed.setdefault(backend, {})[component] = size
+        if self.parent:
+            self.parent.record_reclaimed(backend, component, size)
+
+    def to_dict(self):
+        """Get a JSON-serializable summary of the metrics.
+        Returns:
+            dict: The phases, removals, requests and reclaimed storage recorded.
+        """
+        with self._lock:
+            return {
+                'started': self.started,
+                'wall_seconds': round(time.time() - self.started, 6),
+                'phases': dict(self.phases),
+                'removals': {
+                    component_type: dict(stats, latency=stats['latency'].to_dict())
+                    for component_type, stats in self.removals.items()
+                },
+                'requests': {
+                    backend: {method: stats.to_dict() for method, stats in methods.items()}
+                    for backend, methods in self.requests.items()
+                },
+                'reclaimed_bytes': {backend: dict(sizes) for backend, sizes in self.reclaimed.items()},
+            }
+
+    def to_prometheus(self):
+        """Format the metrics for the node_exporter textfile collector.
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f'# HELP {PROMETHEUS_PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}')
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+                lines.append(f'{PROMETHEUS_PREFIX}_{name}{suffix}{{{label_text}}} {value}')
+
+        def histogram_samples(labels, histogram):
+            samples = [
+                ('_bucket', labels + [('le', str(upper_bound))], count)
+                for upper_bound, count in zip(histogram.buckets, histogram.counts)
+            ]
+            samples.append(('_bucket', labels + [('le', '+Inf')], histogram.count))
+            samples.append(('_sum', labels, histogram.sum))
+            samples.append(('_count', labels, histogram.count))
+            return samples
+
+        with self._lock:
+            metric('phase_duration_seconds', 'gauge', 'Wall time of each removal phase.', [
+                ('', [('phase', phase_name), ('status', phase['status'])], phase['seconds'])
+                for phase_name, phase in self.phases.items()
+            ])
+            metric('removal_duration_seconds', 'histogram', 'Latency of each component removal.', [
+                sample
+                for component_type, stats in self.removals.items()
+                for sample in histogram_samples([('component', component_type)], stats['latency'])
+            ])
+            metric('removals_failed_total', 'counter', 'Component removals which failed.', [
+                ('', [('component', component_type)], stats['failed'])
+                for component_type, stats in self.removals.items()
+            ])
+            metric('reclaimed_bytes', 'gauge', 'Estimated storage reclaimed by removing each component.', [
+                ('', [('backend', backend), ('component', component)], size)
+                for backend, sizes in self.reclaimed.items()
+                for component, size in sizes.items()
+            ])
+            request_stats = [
+                ([('backend', backend), ('method', method)], stats)
+                for backend, methods in self.requests.items()
+                for method, stats in methods.items()
+            ]
+            metric('request_duration_seconds', 'histogram', 'Latency of backend requests.', [
+                sample for labels, stats in request_stats
+                for sample in histogram_samples(labels, stats.latency)
+            ])
+            for name, attribute, help_text in (
+                    ('request_errors_total', 'errors', 'Backend requests which failed.'),
+                    ('not_found_total', 'not_found', 'Components which were already removed.'),
+                    ('retries_total', 'retries', 'Backend requests which were retried.'),
+                    ('response_bytes_total', 'bytes', 'Bytes received from backends.')):
+                metric(name, 'counter', help_text, [
+                    ('', labels, getattr(stats, attribute)) for labels, stats in request_stats
+                ])
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_atomically(path, text):
+    """Write a file so that readers never see it partially written.
+    Args:
+        path (str): The path of the file.
+        text (str): The contents of the file.
+    Returns:
+        None
+    """
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as f:
+        f.write(text)
+    os.replace(temporary_path, path)
+
+
+def metrics_path(log_file, job_id=None):
+    """Get the path of the JSON metrics summary written next to a log file.
+    Args:
+        log_file (str): The path of the log file, or of the log directory.
+        job_id (str): The ID of the deletion service job the metrics are
+            of, or None for the metrics of the process.
+    Returns:
+        str: The path of the metrics summary.
+    """
+    suffix = f'-{job_id}-metrics.json' if job_id else '-metrics.json'
+    if os.path.isdir(log_file):
+        return os.path.join(log_file, f'deletion{suffix}')
+    return f'{os.path.splitext(log_file)[0]}{suffix}'
+
+
+def instrument_session(session, backend, metrics=None):
+    """Record the latency, status and size of every response of a requests session.
+    The size is taken from the Content-Length header so that streamed
+    responses are not read by the hook.
+    Args:
+        session (requests.Session): The session to instrument.
+        backend (str): The backend the session talks to.
+        metrics (Metrics): Where to record requests. Defaults to METRICS.
+    Returns:
+        requests.Session: The session.
+    """
+    def record(response, *args, **kwargs):
+        (metrics or METRICS).record_request(
+            backend, response.request.method, response.elapsed.total_seconds(),
+            response.status_code, int(response.headers.get('Content-Length') or 0))
+    session.hooks['response'].append(record)
+    return session
+
+
+def write_summary(log_file=None, textfile=None, metrics=None, job_id=None):
+    """Write the metrics of the run.
+    Args:
+        log_file (str): The log file or directory. The JSON summary is written
+            next to it if given.
+        textfile (str): The path of a Prometheus textfile to write, if given.
+        metrics (Metrics): The metrics to write. Defaults to METRICS.
+        job_id (str): The ID of the deletion service job the metrics are
+            of, which is included in the name of the JSON summary.
+    Returns:
+        None
+    """
+    metrics = metrics or METRICS
+    if log_file:
+        write_atomically(metrics_path(log_file, job_id), json.dumps(metrics.to_dict(), indent=2) + '\n')
+    if textfile:
+        write_atomically(textfile, metrics.to_prometheus())
+
+
+# The metrics of this process, shared by every backend client like the logger.
+METRICS = Metrics()
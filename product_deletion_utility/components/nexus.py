@@ -0,0 +1,237 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Lookup of components stored in Nexus.
+"""
+
+import logging
+import os
+
+import requests
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.metrics import instrument_session
+from product_deletion_utility.components.ownership import NEXUS_BACKEND
+from product_deletion_utility.components.retry import call_with_retry, host_of
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+NEXUS_CHARTS_REPOSITORY = 'charts'
+
+
+def nexus_rest_url(nexus_url):
+    """Get the base URL of the Nexus REST API.
+    Args:
+        nexus_url (str): The base URL of Nexus, with or without the
+            /service/rest suffix used by nexusctl.
+    Returns:
+        str: The base URL of the Nexus REST API without a trailing slash.
+    """
+    nexus_url = nexus_url.rstrip('/')
+    if not nexus_url.endswith('/service/rest'):
+        nexus_url = f'{nexus_url}/service/rest'
+    return nexus_url
+
+
+def nexus_auth():
+    """Get the Nexus credentials exported for nexusctl.
+    Returns:
+        tuple or None: The (username, password) from the NEXUS_USERNAME and
+            NEXUS_PASSWORD environment variables, or None if they are not set.
+    """
+    if 'NEXUS_USERNAME' in os.environ and 'NEXUS_PASSWORD' in os.environ:
+        return os.environ['NEXUS_USERNAME'], os.environ['NEXUS_PASSWORD']
+    return None
+
+
+def iter_components(nexus_api, repository, host=NEXUS_BACKEND):
+    """Iterate over the components of a Nexus repository one page at a time.
+    Args:
+        nexus_api (NexusApi): The nexusctl Nexus API to interface with Nexus.
+        repository (str): The name of the repository.
+        host (str): The host of Nexus, used to rate limit and retry requests.
+    Returns:
+        generator: The nexusctl components in the repository. The next page
+            is only requested once the previous page has been consumed.
+    """
+    def list_page(**kwargs):
+        return call_with_retry(lambda: nexus_api.components.list(repository, **kwargs),
+                               host, NEXUS_BACKEND, 'GET')
+
+    page = list_page()
+    while True:
+        yield from page.components
+        continuation_token = getattr(page, 'continuation_token', None)
+        if not continuation_token:
+            return
+        page = list_page(continuation_token=continuation_token)
+
+
+def index_chart_components(components, charts):
+    """Map Helm charts to the IDs of the Nexus components which store them.
+    Args:
+        components (iterable): Components of the charts repository, each with
+            name, version and id attributes.
+        charts (iterable): The (name, version) tuples of the charts to find.
+    Returns:
+        dict: A map from each (name, version) tuple found to a list of
+            component IDs. The components are consumed only until every
+            requested chart has been found.
+    """
+    remaining = set(charts)
+    component_ids = {}
+    if not remaining:
+        return component_ids
+    for component in components:
+        chart = (component.name, component.version)
+        if chart in remaining or chart in component_ids:
+            component_ids.setdefault(chart, []).append(component.id)
+            remaining.discard(chart)
+            if not remaining:
+                break
+    return component_ids
+
+
+class NexusRestClient():
+    """A client for the parts of the Nexus REST API not provided by nexusctl.
+    A session which is not already authenticated uses the credentials in the
+    NEXUS_USERNAME and NEXUS_PASSWORD environment variables, as for nexusctl.
+    """
+
+    def __init__(self, nexus_url, session=None):
+        """Create the client.
+        Args:
+            nexus_url (str): The base URL of Nexus.
+            session (requests.Session): The session to use. A new session,
+                whose requests are recorded in METRICS, is created if not given.
+        """
+        self.nexus_url = nexus_rest_url(nexus_url)
+        self.session = session or instrument_session(requests.Session(), NEXUS_BACKEND)
+        if not self.session.auth:
+            self.session.auth = nexus_auth()
+
+    def _get_pages(self, path, params):
+        """Get every page of a paginated Nexus REST API listing.
+        Args:
+            path (str): The path of the endpoint relative to the base URL.
+            params (dict): The query parameters.
+        Returns:
+            generator: The items of each page.
+        Raises:
+            ProductInstallException: If a page could not be retrieved.
+        """
+        params = dict(params)
+        while True:
+            url = f'{self.nexus_url}/{path}'
+            try:
+                response = call_with_retry(lambda: self.session.get(url, params=params), host_of(url),
+                                           NEXUS_BACKEND, 'GET', check_response=True)
+                response.raise_for_status()
+                page = response.json()
+            except (requests.RequestException, ValueError) as err:
+                raise ProductInstallException(f'Failed to query Nexus {path}: {err}')
+            yield from page.get('items', [])
+            if not page.get('continuationToken'):
+                return
+            params['continuationToken'] = page['continuationToken']
+
+    def _get(self, path):
+        """Get a Nexus REST API endpoint which is not paginated.
+        Args:
+            path (str): The path of the endpoint relative to the base URL.
+        Returns:
+            The decoded JSON response.
+        Raises:
+            ProductInstallException: If the request failed.
+        """
+        url = f'{self.nexus_url}/{path}'
+        try:
+            response = call_with_retry(lambda: self.session.get(url), host_of(url),
+                                       NEXUS_BACKEND, 'GET', check_response=True)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as err:
+            raise ProductInstallException(f'Failed to query Nexus {path}: {err}')
+
+    def repositories(self):
+        """Get every repository in Nexus with a single request.
+        Returns:
+            list: The repositories as dictionaries, with name, format and
+                type (hosted, proxy or group) keys.
+        Raises:
+            ProductInstallException: If the repositories could not be listed.
+        """
+        return self._get('v1/repositories')
+
+    def list_repositories(self):
+        """Get the names of every repository in Nexus with a single request.
+        Returns:
+            set: The names of the repositories.
+        Raises:
+            ProductInstallException: If the repositories could not be listed.
+        """
+        return {repository['name'] for repository in self.repositories()}
+
+    def repository_size(self, repository):
+        """Estimate the size of the blobs stored in a repository.
+        Blobs shared with other repositories of the same blob store are
+        counted, so this is an upper bound of the space a deletion reclaims.
+        Args:
+            repository (str): The name of the repository.
+        Returns:
+            int: The sum of the sizes of the assets of the repository. Assets
+                without a size, as listed by Nexus versions before 3.38, count
+                as zero bytes.
+        Raises:
+            ProductInstallException: If the assets could not be listed.
+        """
+        return sum(asset.get('fileSize') or 0
+                   for asset in self._get_pages('v1/assets', {'repository': repository}))
+
+    def search_components(self, repository, name, version):
+        """Search for components by name and version.
+        Args:
+            repository (str): The name of the repository.
+            name (str): The name of the component.
+            version (str): The version of the component.
+        Returns:
+            generator: The matching components as dictionaries.
+        """
+        return self._get_pages('v1/search', {'repository': repository, 'name': name, 'version': version})
+
+    def search_chart_components(self, charts):
+        """Map Helm charts to Nexus component IDs with the search API.
+        Args:
+            charts (iterable): The (name, version) tuples of the charts to find.
+        Returns:
+            dict: A map from each (name, version) tuple found to a list of
+                component IDs.
+        """
+        component_ids = {}
+        for chart_name, chart_version in charts:
+            for component in self.search_components(NEXUS_CHARTS_REPOSITORY, chart_name, chart_version):
+                # Only keep exact matches in case the search matched more loosely.
+                if component.get('name') == chart_name and component.get('version') == chart_version:
+                    component_ids.setdefault((chart_name, chart_version), []).append(component['id'])
+        return component_ids
@@ -0,0 +1,212 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Types of product components, and an index of the product versions that own
+each component in the product catalog.
+"""
+
+from collections import defaultdict
+import threading
+
+DOCKER_IMAGE = 'docker_image'
+S3_ARTIFACT = 's3_artifact'
+HELM_CHART = 'helm_chart'
+IMS_RECIPE = 'ims_recipe'
+IMS_IMAGE = 'ims_image'
+HOSTED_REPO = 'hosted_repo'
+LOFTSMAN_MANIFEST = 'loftsman_manifest'
+
+LOFTSMAN_MANIFESTS_BUCKET = 'config-data'
+
+# The InstalledProductVersion attribute listing each type of component, and a
+# function returning the identifier of a component from that list.
+COMPONENT_ATTRIBUTES = [
+    (DOCKER_IMAGE, 'docker_images', tuple),
+    (S3_ARTIFACT, 's3_artifacts', tuple),
+    (HELM_CHART, 'helm_charts', tuple),
+    (LOFTSMAN_MANIFEST, 'loftsman_manifests',
+     lambda key: (LOFTSMAN_MANIFESTS_BUCKET, key.replace(f'{LOFTSMAN_MANIFESTS_BUCKET}/', ''))),
+    (IMS_RECIPE, 'recipes', lambda recipe: (recipe['name'], recipe['id'])),
+    (IMS_IMAGE, 'images', lambda image: (image['name'], image['id'])),
+    (HOSTED_REPO, 'hosted_repositories', lambda repo: (repo['name'], repo['type'])),
+]
+
+# Loftsman manifests belong to a single product version, so they are never shared.
+SHAREABLE_COMPONENT_TYPES = (
+    DOCKER_IMAGE, S3_ARTIFACT, HELM_CHART, IMS_RECIPE, IMS_IMAGE, HOSTED_REPO
+)
+
+# The service which removes each type of component.
+DOCKER_BACKEND = 'docker'
+NEXUS_BACKEND = 'nexus'
+S3_BACKEND = 's3'
+IMS_BACKEND = 'ims'
+COMPONENT_BACKENDS = {
+    DOCKER_IMAGE: DOCKER_BACKEND,
+    HELM_CHART: NEXUS_BACKEND,
+    HOSTED_REPO: NEXUS_BACKEND,
+    S3_ARTIFACT: S3_BACKEND,
+    LOFTSMAN_MANIFEST: S3_BACKEND,
+    IMS_IMAGE: IMS_BACKEND,
+    IMS_RECIPE: IMS_BACKEND,
+}
+
+
+def product_component_keys(product):
+    """Get the shareable components of a product version.
+    Args:
+        product (InstalledProductVersion): The product version.
+    Returns:
+        list: (component type, component key) tuples for every component of
+            the product version that may be shared with other products.
+    """
+    return [
+        (component_type, component_key(component))
+        for component_type, attribute, component_key in COMPONENT_ATTRIBUTES
+        if component_type in SHAREABLE_COMPONENT_TYPES
+        for component in getattr(product, attribute)
+    ]
+
+
+class ComponentOwnershipIndex():
+    """Inverted index from a component to the product versions which own it.
+    The index is built once from the whole product catalog so that checking
+    whether a component is shared with another product is a dictionary lookup
+    instead of a scan of every other product's components. The deletion
+    service keeps the index current by updating a copy of it as the catalog
+    changes, so it may be updated and queried from several threads.
+    """
+
+    def __init__(self, products=()):
+        """Create the index.
+        Args:
+            products (list): InstalledProductVersion objects to index.
+        """
+        self._owners = defaultdict(set)
+        self._lock = threading.RLock()
+        for product in products:
+            self.add_product(product)
+
+    def add_product(self, product):
+        """Record every shareable component of a product version.
+        Args:
+            product (InstalledProductVersion): The product version to add.
+        Returns:
+            None
+        """
+        with self._lock:
+            for component in product_component_keys(product):
+                self._owners[component].add(product)
+
+    def remove_product(self, product):
+        """Forget the components of a product version added to the index.
+        Args:
+            product (InstalledProductVersion): The product version to remove.
+        Returns:
+            None
+        """
+        with self._lock:
+            for component in product_component_keys(product):
+                owners = self._owners.get(component)
+                if owners is not None:
+                    owners.discard(product)
+                    if not owners:
+                        del self._owners[component]
+
+    def copy(self):
+        """Get a copy of the index which may be changed without changing this one.
+        Returns:
+            ComponentOwnershipIndex: The copy.
+        """
+        index = ComponentOwnershipIndex()
+        with self._lock:
+            index._owners.update((component, set(owners)) for component, owners in self._owners.items())
+        return index
+
+    def replace_products(self, old_products, new_products):
+        """Replace the versions of a product which changed in the catalog.
+        Args:
+            old_products (list): The InstalledProductVersion objects to remove.
+            new_products (list): The InstalledProductVersion objects to add.
+        Returns:
+            None
+        """
+        with self._lock:
+            for product in old_products:
+                self.remove_product(product)
+            for product in new_products:
+                self.add_product(product)
+
+    def owners(self, component_type, key):
+        """Get the product versions which own a component.
+        Args:
+            component_type (str): One of the component type constants in this module.
+            key (tuple): The identifier of the component, e.g. (name, version).
+        Returns:
+            set: The InstalledProductVersion objects owning the component.
+        """
+        with self._lock:
+            return set(self._owners.get((component_type, key), ()))
+
+    def components(self, component_type):
+        """Get the identifiers of every indexed component of a type.
+        Args:
+            component_type (str): One of the component type constants in this module.
+        Returns:
+            list: The identifiers of the components.
+        """
+        with self._lock:
+            return [key for indexed_type, key in self._owners if indexed_type == component_type]
+
+    def other_owners(self, component_type, key, product):
+        """Get the product versions other than the given one which own a component.
+        Args:
+            component_type (str): One of the component type constants in this module.
+            key (tuple): The identifier of the component, e.g. (name, version).
+            product (InstalledProductVersion): The product version to exclude.
+        Returns:
+            list: The other InstalledProductVersion objects owning the
+                component, sorted by their string representation.
+        """
+        return self.remaining_owners(component_type, key, [product])
+
+    def remaining_owners(self, component_type, key, products):
+        """Get the owners of a component which are not among the given product versions.
+        Args:
+            component_type (str): One of the component type constants in this module.
+            key (tuple): The identifier of the component, e.g. (name, version).
+            products (list): The InstalledProductVersion objects to exclude,
+                e.g. every product version being deleted in a batch.
+        Returns:
+            list: The remaining InstalledProductVersion objects owning the
+                component, sorted by their string representation.
+        """
+        excluded = {(product.name, product.version) for product in products}
+        return sorted(
+            (
+                owner for owner in self.owners(component_type, key)
+                if (owner.name, owner.version) not in excluded
+            ),
+            key=str
+        )
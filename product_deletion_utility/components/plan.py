@@ -0,0 +1,232 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Planning of the removals made when deleting product versions.
+"""
+
+from collections import OrderedDict
+import json
+import logging
+
+from product_deletion_utility.components.ownership import (
+    COMPONENT_ATTRIBUTES,
+    COMPONENT_BACKENDS,
+    DOCKER_IMAGE,
+    HELM_CHART,
+    HOSTED_REPO,
+    IMS_IMAGE,
+    IMS_RECIPE,
+    LOFTSMAN_MANIFEST,
+    S3_ARTIFACT,
+    SHAREABLE_COMPONENT_TYPES,
+)
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+SKIP_SHARED = 'used by other product versions'
+
+COMPONENT_DESCRIPTIONS = {
+    DOCKER_IMAGE: 'Docker image',
+    S3_ARTIFACT: 'S3 artifact',
+    HELM_CHART: 'Helm chart',
+    LOFTSMAN_MANIFEST: 'loftsman manifest',
+    IMS_RECIPE: 'IMS recipe',
+    IMS_IMAGE: 'IMS image',
+    HOSTED_REPO: 'hosted repo',
+}
+
+
+def describe_component(component_type, key):
+    """Describe a component for log messages.
+    Args:
+        component_type (str): One of the component type constants in
+            product_deletion_utility.components.ownership.
+        key (tuple): The identifier of the component.
+    Returns:
+        str: A short description of the component.
+    """
+    if component_type == HOSTED_REPO:
+        # The type of a hosted repository is not part of its name.
+        return f'{COMPONENT_DESCRIPTIONS[component_type]} {key[0]}'
+    return f'{COMPONENT_DESCRIPTIONS[component_type]} {":".join(key)}'
+
+
+class DeletionPlan():
+    """The components to remove when deleting product versions, and the components kept.
+    A plan is compiled from the product catalog alone, so it can be built and
+    inspected without contacting the Docker registry, Nexus, S3 or IMS.
+    """
+
+    def __init__(self, product_versions):
+        """Create an empty plan.
+        Args:
+            product_versions (list): The (name, version) tuples being deleted.
+        """
+        self.product_versions = list(product_versions)
+        self._removals = OrderedDict(
+            (component_type, OrderedDict()) for component_type, _, _ in COMPONENT_ATTRIBUTES
+        )
+        self.skipped = []
+
+    def add_removal(self, component_type, key, owner):
+        """Plan the removal of a component.
+        Args:
+            component_type (str): The type of the component.
+            key (tuple): The identifier of the component.
+            owner (str): The product version being deleted which owns it.
+        Returns:
+            None
+        """
+        self._removals[component_type].setdefault(key, []).append(owner)
+
+    def add_skip(self, component_type, key, reason, owners):
+        """Record a component which will not be removed.
+        Args:
+            component_type (str): The type of the component.
+            key (tuple): The identifier of the component.
+            reason (str): Why the component is kept.
+            owners (list): The product versions which keep using it.
+        Returns:
+            None
+        """
+        self.skipped.append({
+            'type': component_type,
+            'key': list(key),
+            'reason': reason,
+            'owners': [str(owner) for owner in owners],
+        })
+
+    def removals(self, component_type):
+        """Get the components of one type to remove.
+        Args:
+            component_type (str): The type of the components.
+        Returns:
+            list: The identifiers of the components, in catalog order.
+        """
+        return list(self._removals[component_type])
+
+    def estimated_calls(self, s3_batch_size):
+        """Estimate the number of requests needed to carry out the plan.
+        The estimate is a lower bound: the S3 objects of IMS images and
+        recipes, and the pages of Nexus listings, are only known once the
+        plan is executed, and IMS records without a link need a listing of
+        their bucket.
+        Args:
+            s3_batch_size (int): The maximum number of S3 objects removed by
+                a single request.
+        Returns:
+            dict: The estimated number of requests made to each backend.
+        """
+        calls = dict.fromkeys(sorted(set(COMPONENT_BACKENDS.values())), 0)
+        for component_type, keys in self._removals.items():
+            if not keys:
+                continue
+            backend = COMPONENT_BACKENDS[component_type]
+            if component_type == DOCKER_IMAGE:
+                # The tag is resolved to a digest before the manifest is deleted.
+                calls[backend] += 2 * len(keys)
+            elif component_type in (S3_ARTIFACT, LOFTSMAN_MANIFEST):
+                keys_per_bucket = {}
+                for bucket, _ in keys:
+                    keys_per_bucket[bucket] = keys_per_bucket.get(bucket, 0) + 1
+                calls[backend] += sum(
+                    -(-count // s3_batch_size) for count in keys_per_bucket.values())
+            elif component_type == HELM_CHART:
+                # At least one request finds the Nexus components of the charts.
+                calls[backend] += len(keys) + 1
+            elif component_type in (IMS_IMAGE, IMS_RECIPE):
+                # The record is read to find its S3 objects before it is
+                # deleted. The manifest of an image is read from S3 to find
+                # its artifacts, and the objects are removed in one batch.
+                calls[backend] += 2 * len(keys)
+                calls[COMPONENT_BACKENDS[S3_ARTIFACT]] += (2 if component_type == IMS_IMAGE else 1) * len(keys)
+            else:
+                calls[backend] += len(keys)
+        return calls
+
+    def to_dict(self, s3_batch_size):
+        """Get a JSON-serializable representation of the plan.
+        Args:
+            s3_batch_size (int): The maximum number of S3 objects removed by
+                a single request.
+        Returns:
+            dict: The product versions, the components to remove with the
+                product versions owning them, the skipped components and the
+                estimated number of requests.
+        """
+        return {
+            'product_versions': [
+                {'name': name, 'version': version} for name, version in self.product_versions
+            ],
+            'remove': {
+                component_type: [{'key': list(key), 'owners': owners} for key, owners in keys.items()]
+                for component_type, keys in self._removals.items()
+            },
+            'skip': self.skipped,
+            'estimated_calls': self.estimated_calls(s3_batch_size),
+        }
+
+    def to_json(self, s3_batch_size):
+        """Serialize the plan as JSON.
+        Args:
+            s3_batch_size (int): The maximum number of S3 objects removed by
+                a single request.
+        Returns:
+            str: The plan as an indented JSON document.
+        """
+        return json.dumps(self.to_dict(s3_batch_size), indent=2)
+
+
+def compile_plan(products, ownership_index):
+    """Compile the plan for deleting product versions in a single pass over their components.
+    A component is kept if a product version which is not being deleted also
+    uses it. A component listed by more than one of the product versions
+    being deleted is planned once.
+    Args:
+        products (list): The InstalledProductVersion objects being deleted.
+        ownership_index (ComponentOwnershipIndex): The index of the owners of
+            every component in the product catalog.
+    Returns:
+        DeletionPlan: The plan.
+    """
+    plan = DeletionPlan((product.name, product.version) for product in products)
+    for component_type, attribute, component_key in COMPONENT_ATTRIBUTES:
+        skipped = set()
+        for product in products:
+            for component in getattr(product, attribute):
+                key = component_key(component)
+                if key in skipped:
+                    continue
+                other_owners = []
+                if component_type in SHAREABLE_COMPONENT_TYPES:
+                    other_owners = ownership_index.remaining_owners(component_type, key, products)
+                if other_owners:
+                    skipped.add(key)
+                    d_logger.info(f'Not removing {describe_component(component_type, key)} '
+                                  f'used by the following other product versions: '
+                                  f'{", ".join(str(p) for p in other_owners)}')
+                    plan.add_skip(component_type, key, SKIP_SHARED, other_owners)
+                else:
+                    plan.add_removal(component_type, key, str(product))
+    return plan
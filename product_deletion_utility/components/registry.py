@@ -0,0 +1,263 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Access to the Docker registry v2 API.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from urllib.parse import urljoin
+
+import requests
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.nexus import nexus_auth
+from product_deletion_utility.components.ownership import DOCKER_BACKEND
+from product_deletion_utility.components.retry import call_with_retry, host_of
+from product_deletion_utility.components.session import pooled_session
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+# The manifest media types accepted when resolving a tag, so that the
+# registry returns the digest of the manifest as it was pushed.
+MANIFEST_MEDIA_TYPES = ', '.join([
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.oci.image.index.v1+json',
+])
+
+
+def registry_api_url(docker_url):
+    """Get the base URL of the Docker registry v2 API.
+    Args:
+        docker_url (str): The base URL of the registry, with or without the
+            /v2 suffix.
+    Returns:
+        str: The base URL of the v2 API without a trailing slash.
+    """
+    docker_url = docker_url.rstrip('/')
+    if not docker_url.endswith('/v2'):
+        docker_url = f'{docker_url}/v2'
+    return docker_url
+
+
+def is_digest(reference):
+    """Check whether a manifest reference is a digest rather than a tag.
+    Args:
+        reference (str): A tag, or a digest such as sha256:<hex>.
+    Returns:
+        bool: True if the reference is a digest. Tags cannot contain a colon.
+    """
+    return ':' in reference
+
+
+class RegistryClient():
+    """A client for the manifests API of the Docker registry.
+    A session which is not already authenticated uses the credentials in the
+    NEXUS_USERNAME and NEXUS_PASSWORD environment variables, as for nexusctl.
+    """
+
+    def __init__(self, docker_url, session=None, max_connections=10):
+        """Create the client.
+        Args:
+            docker_url (str): The base URL of the Docker registry.
+            session (requests.Session): The session to use. A new session,
+                whose requests are recorded in METRICS, is created if not given.
+            max_connections (int): The size of the connection pool of a new session.
+        """
+        self.docker_url = registry_api_url(docker_url)
+        self.session = session or pooled_session(DOCKER_BACKEND, max_connections)
+        if not self.session.auth:
+            self.session.auth = nexus_auth()
+
+    def resolve_digest(self, name, tag):
+        """Get the digest of the manifest a tag points to.
+        Args:
+            name (str): The name of the image.
+            tag (str): The tag of the image.
+        Returns:
+            str or None: The digest, or None if the tag does not exist.
+        Raises:
+            ProductInstallException: If the tag could not be resolved.
+        """
+        url = f'{self.docker_url}/{name}/manifests/{tag}'
+        try:
+            response = call_with_retry(
+                lambda: self.session.head(url, headers={'Accept': MANIFEST_MEDIA_TYPES}),
+                host_of(url), DOCKER_BACKEND, 'HEAD', check_response=True)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+        except requests.RequestException as err:
+            raise ProductInstallException(f'Failed to resolve image {name}:{tag}: {err}')
+        digest = response.headers.get('Docker-Content-Digest')
+        if not digest:
+            raise ProductInstallException(
+                f'Failed to resolve image {name}:{tag}: the registry did not return a digest')
+        return digest
+
+    def list_tags(self, name):
+        """List the tags of an image, following the pages of the listing.
+        Args:
+            name (str): The name of the image.
+        Returns:
+            generator: The tags. The next page is only requested once the
+                previous page has been consumed. Nothing is listed if the
+                image does not exist.
+        Raises:
+            ProductInstallException: If the tags could not be listed.
+        """
+        url = f'{self.docker_url}/{name}/tags/list'
+        while url:
+            try:
+                response = call_with_retry(lambda: self.session.get(url), host_of(url),
+                                           DOCKER_BACKEND, 'GET', check_response=True)
+                if response.status_code == 404:
+                    return
+                response.raise_for_status()
+                tags = response.json().get('tags') or []
+            except (requests.RequestException, ValueError) as err:
+                raise ProductInstallException(f'Failed to list the tags of image {name}: {err}')
+            yield from tags
+            # The Link header of the next page is relative to the registry.
+            next_url = response.links.get('next', {}).get('url')
+            url = urljoin(url, next_url) if next_url else None
+
+    def delete_manifest(self, name, digest):
+        """Delete a manifest, and with it every tag pointing to it.
+        Args:
+            name (str): The name of the image.
+            digest (str): The digest of the manifest.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If an error occurred deleting the manifest.
+        """
+        url = f'{self.docker_url}/{name}/manifests/{digest}'
+        try:
+            response = call_with_retry(lambda: self.session.delete(url), host_of(url),
+                                       DOCKER_BACKEND, 'DELETE', check_response=True)
+            if response.status_code == 404:
+                d_logger.warning(f'{name}@{digest} has already been removed')
+                return
+            response.raise_for_status()
+        except requests.RequestException as err:
+            raise ProductInstallException(f'Failed to remove image {name}@{digest}: {err}')
+        d_logger.info(f'Successfully removed the docker image {name}@{digest}')
+
+
+def resolve_digests(registry_client, images, max_workers):
+    """Resolve image tags to manifest digests concurrently.
+    Args:
+        registry_client (RegistryClient): The registry client.
+        images (iterable): The (name, tag) tuples to resolve.
+        max_workers (int): The maximum number of concurrent requests.
+    Returns:
+        tuple: A dict from each (name, tag) tuple resolved to its digest, or
+            to None if the tag does not exist, and a list of (image,
+            ProductInstallException) tuples for the tags which could not be
+            resolved.
+    """
+    images = list(images)
+    if not images:
+        return {}, []
+
+    def resolve(image):
+        try:
+            return registry_client.resolve_digest(*image), None
+        except ProductInstallException as err:
+            return None, err
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(images)))) as executor:
+        results = list(executor.map(resolve, images))
+    digests = {}
+    failures = []
+    for image, (digest, err) in zip(images, results):
+        if err:
+            failures.append((image, err))
+        else:
+            digests[image] = digest
+    return digests, failures
+
+
+def plan_manifest_deletions(registry_client, images, protected_images, max_workers):
+    """Find the manifests to delete so that each digest is deleted once.
+    Every tag is resolved in one concurrent pass. Tags of the same image which
+    point to the same digest are removed by a single manifest deletion. A
+    digest is never deleted if a tag owned by another product version points
+    to it, since deleting the manifest would remove that tag too.
+    Args:
+        registry_client (RegistryClient): The registry client.
+        images (list): The (name, tag) tuples to remove.
+        protected_images (dict): A map from each (name, tag) tuple which must
+            be kept to the product versions using it.
+        max_workers (int): The maximum number of concurrent requests.
+    Returns:
+        tuple: A list of (name, digest) tuples to delete, and a list of
+            (image, ProductInstallException) tuples for the images which
+            could not be resolved.
+    """
+    names = {name for name, _ in images}
+    protected_images = {image: owners for image, owners in protected_images.items()
+                        if image[0] in names}
+    digests, failures = resolve_digests(
+        registry_client, list(images) + list(protected_images), max_workers)
+
+    # If a kept tag could not be resolved, the digests it protects are unknown.
+    unresolved_names = {image[0] for image, _ in failures if image in protected_images}
+    failures = [(image, err) for image, err in failures if image not in protected_images]
+    protected_digests = {}
+    for image, owners in protected_images.items():
+        if digests.get(image):
+            protected_digests.setdefault((image[0], digests[image]), []).append((image, owners))
+
+    tags_by_manifest = OrderedDict()
+    for image in images:
+        name, tag = image
+        if image not in digests:
+            continue
+        if digests[image] is None:
+            d_logger.warning(f'{name}:{tag} has already been removed')
+        elif name in unresolved_names:
+            failures.append((image, ProductInstallException(
+                f'Unable to check whether other product versions use the manifest of {name}:{tag}')))
+        else:
+            tags_by_manifest.setdefault((name, digests[image]), []).append(tag)
+
+    manifests = []
+    for (name, digest), tags in tags_by_manifest.items():
+        image_tags = ', '.join(f'{name}:{tag}' for tag in tags)
+        if (name, digest) in protected_digests:
+            users = ', '.join(
+                f'{other_name}:{other_tag} ({", ".join(str(p) for p in owners)})'
+                for (other_name, other_tag), owners in protected_digests[(name, digest)]
+            )
+            d_logger.info(f'Not removing Docker image {image_tags} with digest {digest} '
+                          f'which is also tagged by the following other product versions: {users}')
+            continue
+        d_logger.debug(f'Docker image {image_tags} will be removed with manifest {name}@{digest}')
+        manifests.append((name, digest))
+    return manifests, failures
@@ -0,0 +1,435 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Retries with backoff, and adaptive per-host rate limiting, for backend requests.
+"""
+
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import datetime
+import logging
+import random
+import socket
+import threading
+import time
+from urllib.error import URLError
+from urllib.parse import urlparse
+
+from product_deletion_utility.components.constants import DEFAULT_MAX_RETRIES, DEFAULT_RATE_LIMIT
+from product_deletion_utility.components.metrics import METRICS
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+# Statuses returned by an overloaded or restarting server.
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+# The most requests in flight to one host before any throttling is observed.
+MAX_HOST_CONCURRENCY = 64
+# How often, in seconds, a coroutine waiting for a limiter checks for a free slot.
+ASYNC_SLOT_POLL_INTERVAL = 0.01
+
+
+def parse_retry_after(value, now=None):
+    """Parse the value of a Retry-After header.
+    Args:
+        value (str): Either a number of seconds or an HTTP date.
+        now (datetime.datetime): The current time. Defaults to now.
+    Returns:
+        float or None: The number of seconds to wait, or None if the value
+            is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def _is_transient_exception(err):
+    """Check whether an exception is a timeout or connection failure."""
+    # Imported here so that configuring retries at startup does not load requests.
+    import requests
+    return isinstance(err, (requests.ConnectionError, requests.Timeout, socket.timeout,
+                            ConnectionError, TimeoutError)) or \
+        (isinstance(err, URLError) and not hasattr(err, 'code'))
+
+
+def classify_error(err):
+    """Decide whether a request which raised an exception should be retried.
+    Args:
+        err (Exception): The exception, e.g. a NexusCtlHttpError, an
+            urllib HTTPError or a requests exception.
+    Returns:
+        tuple: Whether to retry, and the delay requested by the server in
+            seconds or None.
+    """
+    if _is_transient_exception(err):
+        return True, None
+    code = getattr(err, 'code', None)
+    if code in RETRYABLE_STATUSES:
+        headers = getattr(err, 'headers', None) or {}
+        return True, parse_retry_after(headers.get('Retry-After'))
+    return False, None
+
+
+def classify_status(status, headers):
+    """Decide whether a request should be retried because of its response status.
+    Args:
+        status (int): The HTTP status of the response.
+        headers (Mapping): The headers of the response.
+    Returns:
+        tuple: Whether to retry, and the delay requested by the server in
+            seconds or None.
+    """
+    if status in RETRYABLE_STATUSES:
+        return True, parse_retry_after(headers.get('Retry-After'))
+    return False, None
+
+
+def classify_response(response):
+    """Decide whether a request should be retried because of its response.
+    Args:
+        response (requests.Response): The response.
+    Returns:
+        tuple: Whether to retry, and the delay requested by the server in
+            seconds or None.
+    """
+    return classify_status(response.status_code, response.headers)
+
+
+class RetryPolicy():
+    """How many times, and after how long, a failed request is retried."""
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, base_delay=0.5, max_delay=30.0,
+                 max_retry_after=120.0):
+        """Create the policy.
+        Args:
+            max_retries (int): The number of retries after the first attempt.
+            base_delay (float): The cap of the first backoff, in seconds.
+            max_delay (float): The largest backoff, in seconds.
+            max_retry_after (float): The longest Retry-After which is honored.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, retry, retry_after=None):
+        """Get the time to wait before a retry.
+        Exponential backoff with full jitter, so that clients which failed
+        together do not retry together. A Retry-After from the server is a
+        lower bound.
+        Args:
+            retry (int): The number of the retry, starting at 0.
+            retry_after (float): The delay requested by the server, if any.
+        Returns:
+            float: The delay in seconds.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+
+class AdaptiveLimiter():
+    """Limit the rate and concurrency of the requests made to one host.
+    Requests take a token from a bucket refilled at a fixed rate. The number
+    of requests in flight is adjusted with additive increase, multiplicative
+    decrease: every success raises the limit by about one per round trip,
+    and every throttled request halves it.
+    """
+
+    def __init__(self, rate, max_concurrency, min_concurrency=1):
+        """Create the limiter.
+        Args:
+            rate (float): The number of requests per second. 0 disables the
+                rate limit.
+            max_concurrency (int): The highest limit on requests in flight.
+            min_concurrency (int): The lowest limit on requests in flight.
+        """
+        self.rate = rate
+        self.burst = max(1.0, float(rate))
+        self.tokens = self.burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Wait until a request may be made, and hold its slot until it finishes."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        try:
+            self._take_token()
+            yield
+        finally:
+            self._release()
+
+    def async_slot(self):
+        """Wait in a coroutine until a request may be made, and hold its slot until it finishes.
+        The slots and tokens are shared with the threads using slot().
+        Returns:
+            AsyncSlot: An asynchronous context manager.
+        """
+        return AsyncSlot(self)
+
+    def _try_acquire(self):
+        """Take a slot if one is free, without waiting.
+        Returns:
+            bool: True if a slot was taken.
+        """
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def _release(self):
+        """Give back a slot."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _token_wait(self):
+        """Take a token from the bucket if there is one.
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds
+                until the next token.
+        """
+        if not self.rate:
+            return 0
+        with self._condition:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def _take_token(self):
+        """Wait for a token from the bucket."""
+        wait = self._token_wait()
+        while wait:
+            time.sleep(wait)
+            wait = self._token_wait()
+
+    def record_success(self):
+        """Raise the concurrency limit after a successful request."""
+        with self._condition:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def record_throttled(self):
+        """Halve the concurrency limit after a throttled or timed out request."""
+        with self._condition:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+
+
+class AsyncSlot():
+    """The slot of a coroutine in an AdaptiveLimiter, held while a request is made."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def __aenter__(self):
+        # Imported here so that configuring retries at startup does not load asyncio.
+        import asyncio
+        # The limiter is shared with threads, so it is polled rather than
+        # blocking the event loop on its condition.
+        while not self.limiter._try_acquire():
+            await asyncio.sleep(ASYNC_SLOT_POLL_INTERVAL)
+        try:
+            wait = self.limiter._token_wait()
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self.limiter._token_wait()
+        except BaseException:
+            self.limiter._release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        self.limiter._release()
+        return False
+
+
+class HostLimiters():
+    """The AdaptiveLimiter of each host, created on first use."""
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT, max_concurrency=MAX_HOST_CONCURRENCY):
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        """Get the limiter of a host.
+        Args:
+            host (str): The host, optionally with a port.
+        Returns:
+            AdaptiveLimiter: The limiter shared by every request to the host.
+        """
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = AdaptiveLimiter(self.rate, self.max_concurrency)
+            return self._limiters[host]
+
+
+# The retry policy and limiters of this process, shared by every backend client.
+RETRY_POLICY = RetryPolicy()
+LIMITERS = HostLimiters()
+
+
+def configure_retries(max_retries=DEFAULT_MAX_RETRIES, rate_limit=DEFAULT_RATE_LIMIT):
+    """Set the retry policy and the per-host rate limit used by every backend client.
+    Args:
+        max_retries (int): The number of retries after the first attempt.
+        rate_limit (float): The number of requests per second to each host.
+            0 disables the rate limit.
+    Returns:
+        None
+    """
+    RETRY_POLICY.max_retries = max_retries
+    LIMITERS.rate = rate_limit
+
+
+def host_of(url):
+    """Get the host of a URL, used to choose its limiter."""
+    return urlparse(url).netloc or url
+
+
+def call_with_retry(call, host, backend, operation, check_response=False, policy=None,
+                    limiters=None):
+    """Make a request, retrying transient failures.
+    A request is retried when it times out, cannot connect, or fails with
+    one of RETRYABLE_STATUSES. Each attempt waits for the limiter of the host.
+    Args:
+        call (callable): Makes the request. It takes no arguments.
+        host (str): The host the request is made to.
+        backend (str): The backend, used to record retries in METRICS.
+        operation (str): The HTTP method or operation, used in messages and metrics.
+        check_response (bool): If True, call returns a requests.Response which
+            is retried if its status is retryable. Otherwise call raises on failure.
+        policy (RetryPolicy): The retry policy. Defaults to RETRY_POLICY.
+        limiters (HostLimiters): The limiters. Defaults to LIMITERS.
+    Returns:
+        The value returned by the last call.
+    Raises:
+        Exception: The exception raised by the last call.
+    """
+    policy = policy or RETRY_POLICY
+    limiter = (limiters or LIMITERS).get(host)
+    retry = 0
+    while True:
+        with limiter.slot():
+            try:
+                result = call()
+            except Exception as err:
+                retryable, retry_after = classify_error(err)
+                if not retryable:
+                    raise
+                limiter.record_throttled()
+                if retry >= policy.max_retries:
+                    raise
+                reason = repr(err)
+            else:
+                retryable, retry_after = classify_response(result) if check_response else (False, None)
+                if not retryable:
+                    limiter.record_success()
+                    return result
+                limiter.record_throttled()
+                if retry >= policy.max_retries:
+                    return result
+                reason = f'HTTP {result.status_code}'
+        delay = policy.delay(retry, retry_after)
+        METRICS.record_retry(backend, operation)
+        d_logger.debug(f'Retrying {operation} request to {host} in {delay:.1f}s after {reason}')
+        time.sleep(delay)
+        retry += 1
+
+
+async def async_call_with_retry(call, host, backend, operation, transient_errors=(), policy=None,
+                                limiters=None):
+    """Make a request from a coroutine, retrying transient failures.
+    The asyncio counterpart of call_with_retry, sharing its retry policy and
+    the limiter of each host.
+    Args:
+        call (callable): Makes the request. It takes no arguments and
+            returns an awaitable of a response with status and headers
+            attributes, e.g. an aiohttp.ClientResponse.
+        host (str): The host the request is made to.
+        backend (str): The backend, used to record retries in METRICS.
+        operation (str): The HTTP method or operation, used in messages and metrics.
+        transient_errors (tuple): Exception types, besides those recognized
+            by classify_error, which mean the request may be retried, e.g.
+            aiohttp.ClientConnectionError.
+        policy (RetryPolicy): The retry policy. Defaults to RETRY_POLICY.
+        limiters (HostLimiters): The limiters. Defaults to LIMITERS.
+    Returns:
+        The last response, which has a status which is not retryable unless
+            the retries were used up.
+    Raises:
+        Exception: The exception raised by the last call.
+    """
+    import asyncio
+    policy = policy or RETRY_POLICY
+    limiter = (limiters or LIMITERS).get(host)
+    retry = 0
+    while True:
+        async with limiter.async_slot():
+            try:
+                response = await call()
+            except Exception as err:
+                retryable, retry_after = (True, None) if isinstance(err, transient_errors) else classify_error(err)
+                if not retryable:
+                    raise
+                limiter.record_throttled()
+                if retry >= policy.max_retries:
+                    raise
+                reason = repr(err)
+            else:
+                retryable, retry_after = classify_status(response.status, response.headers)
+                if not retryable:
+                    limiter.record_success()
+                    return response
+                limiter.record_throttled()
+                if retry >= policy.max_retries:
+                    return response
+                reason = f'HTTP {response.status}'
+        delay = policy.delay(retry, retry_after)
+        METRICS.record_retry(backend, operation)
+        d_logger.debug(f'Retrying {operation} request to {host} in {delay:.1f}s after {reason}')
+        await asyncio.sleep(delay)
+        retry += 1
@@ -0,0 +1,422 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Backends for deleting objects from S3.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+from botocore.exceptions import BotoCoreError, ClientError
+import requests
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.json_stream import iter_array_items
+from product_deletion_utility.components.metrics import METRICS
+from product_deletion_utility.components.ownership import S3_BACKEND
+from product_deletion_utility.components.session import BearerTokenAuth, OidcToken, read_token_file
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+# The maximum number of keys accepted by a single S3 DeleteObjects request.
+S3_DELETE_BATCH_SIZE = 1000
+S3_NOT_FOUND_CODES = ('NoSuchKey', 'NoSuchBucket')
+IMS_IMAGES_BUCKET = 'boot-images'
+IMS_RECIPES_BUCKET = 'ims'
+# The number of seconds STS credentials without an expiry time are used for.
+# botocore renews credentials 15 minutes before they expire, so this must be longer.
+STS_CREDENTIALS_LIFETIME = 3600
+IMS_ID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def get_oidc_token(credentials_file=None):
+    """Get the access token used by the cray CLI to authenticate with the API gateway.
+    Args:
+        credentials_file (str): The path of the JSON token file. Defaults to
+            the file named by the CRAY_CREDENTIALS environment variable.
+    Returns:
+        str: The access token.
+    Raises:
+        ProductInstallException: If the token could not be read.
+    """
+    return read_token_file(credentials_file)['access_token']
+
+
+def sts_credentials(session, api_gateway_url):
+    """Get temporary S3 credentials from the Cray STS service.
+    This is how the cray CLI obtains S3 credentials for `cray artifacts`.
+    Args:
+        session (requests.Session): A session authenticated with the API gateway token.
+        api_gateway_url (str): The base URL of the API gateway.
+    Returns:
+        dict: The credentials, with EndpointURL, AccessKeyId, SecretAccessKey,
+            SessionToken and, if STS returned it, Expiration keys.
+    Raises:
+        ProductInstallException: If S3 credentials could not be obtained.
+    """
+    try:
+        response = session.put(f'{api_gateway_url.rstrip("/")}/apis/sts/token')
+        response.raise_for_status()
+        return response.json()['Credentials']
+    except (requests.RequestException, ValueError, KeyError) as err:
+        raise ProductInstallException(f'Unable to get S3 credentials from STS: {err}')
+
+
+class StsCredentialProvider(CredentialProvider):
+    """A botocore credential provider which renews STS credentials before they expire."""
+
+    METHOD = 'cray-sts'
+
+    def __init__(self, fetch_credentials, credentials=None):
+        """Create the provider.
+        Args:
+            fetch_credentials (callable): Returns new credentials, as returned
+                by sts_credentials().
+            credentials (dict): The credentials to use until they expire, if
+                already fetched.
+        """
+        super().__init__()
+        self.fetch_credentials = fetch_credentials
+        self.credentials = credentials
+
+    def _metadata(self, credentials=None):
+        credentials = credentials or self.fetch_credentials()
+        # Credentials without an expiry are renewed after STS_CREDENTIALS_LIFETIME.
+        expiry_time = credentials.get('Expiration') or datetime.fromtimestamp(
+            time.time() + STS_CREDENTIALS_LIFETIME, timezone.utc).isoformat()
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': expiry_time,
+        }
+
+    def load(self):
+        return RefreshableCredentials.create_from_metadata(
+            self._metadata(self.credentials), self._metadata, self.METHOD)
+
+
+def batch_keys(bucket_keys, batch_size):
+    """Group S3 objects into per-bucket batches.
+    Args:
+        bucket_keys (list): (bucket, key) tuples.
+        batch_size (int): The maximum number of keys in a batch.
+    Returns:
+        list: (bucket, [keys]) tuples, in the order the buckets were first seen.
+    """
+    keys_by_bucket = {}
+    for bucket, key in bucket_keys:
+        keys_by_bucket.setdefault(bucket, []).append(key)
+    return [
+        (bucket, keys[start:start + batch_size])
+        for bucket, keys in keys_by_bucket.items()
+        for start in range(0, len(keys), batch_size)
+    ]
+
+
+def describe_batch(batch):
+    """Describe a batch of S3 objects for log messages.
+    Args:
+        batch (tuple): A (bucket, [keys]) tuple.
+    Returns:
+        str: A short description of the batch.
+    """
+    bucket, keys = batch
+    if len(keys) == 1:
+        return f'{bucket}:{keys[0]}'
+    return f'{len(keys)} artifacts from S3 bucket {bucket}'
+
+
+class S3KeyIndex():
+    """The keys of an S3 bucket indexed by the IMS IDs embedded in them.
+    The bucket listing is consumed once and only the keys which contain one
+    of the wanted IDs are kept, so resolving the keys of an IMS image or
+    recipe is a dictionary lookup.
+    """
+
+    def __init__(self, keys, ims_ids):
+        """Build the index.
+        Args:
+            keys (iterable): The keys in the bucket.
+            ims_ids (iterable): The IMS IDs to resolve keys for.
+        """
+        self._keys_by_id = defaultdict(list)
+        wanted_ids = set(ims_ids)
+        # IDs which are not UUIDs cannot be found by IMS_ID_RE, so fall back to
+        # checking whether they are a substring of each key.
+        other_ids = [ims_id for ims_id in wanted_ids if not IMS_ID_RE.fullmatch(ims_id)]
+        for key in keys:
+            for ims_id in set(IMS_ID_RE.findall(key)):
+                if ims_id in wanted_ids:
+                    self._keys_by_id[ims_id].append(key)
+            for ims_id in other_ids:
+                if ims_id in key:
+                    self._keys_by_id[ims_id].append(key)
+
+    def keys_for(self, ims_id):
+        """Get the keys which contain an IMS ID.
+        Args:
+            ims_id (str): The ID of the IMS image or recipe.
+        Returns:
+            list: The keys containing the ID.
+        """
+        return list(self._keys_by_id.get(ims_id, []))
+
+
+class CrayCliS3Backend():
+    """Delete S3 objects by running `cray artifacts delete` once per object."""
+
+    batch_size = 1
+
+    def list_keys(self, bucket):
+        """List the keys of every object in an S3 bucket.
+        The output of `cray artifacts list` is parsed as it is read, so only
+        one artifact is held in memory at a time however large the bucket is.
+        Args:
+            bucket (str): The name of the S3 bucket.
+        Returns:
+            generator: The keys in the bucket.
+        Raises:
+            ProductInstallException: If the bucket could not be listed.
+        """
+        with tempfile.TemporaryFile(mode='w+') as stderr:
+            process = subprocess.Popen(
+                ["cray", "artifacts", "list", bucket, "--format", "json"],
+                stdout=subprocess.PIPE, stderr=stderr, universal_newlines=True)
+            try:
+                try:
+                    for artifact in iter_array_items(process.stdout, 'artifacts'):
+                        yield artifact['Key']
+                except (ValueError, KeyError, TypeError) as err:
+                    # A failed listing usually leaves no output, so its exit
+                    # status is reported in preference to the parse error.
+                    parse_error = err
+                else:
+                    parse_error = None
+            finally:
+                # Stop the listing if the caller stopped before the end of its
+                # output, otherwise let it exit by itself.
+                killed = process.poll() is None and process.stdout.read(1) != ''
+                if killed:
+                    process.kill()
+                process.stdout.close()
+                returncode = process.wait()
+            if returncode != 0 and not killed:
+                stderr.seek(0)
+                raise ProductInstallException(
+                    f'Failed to list artifacts in S3 bucket {bucket} with error: {stderr.read()}')
+            if parse_error:
+                raise ProductInstallException(
+                    f'Failed to parse artifacts listed in S3 bucket {bucket}: {parse_error}')
+
+    def read_object(self, bucket, key):
+        """Read an S3 object with `cray artifacts get`.
+        Args:
+            bucket (str): The name of the S3 bucket.
+            key (str): The key of the object.
+        Returns:
+            bytes or None: The content of the object, or None if it does not exist.
+        Raises:
+            ProductInstallException: If the object could not be read.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'object')
+            try:
+                subprocess.check_output(["cray", "artifacts", "get", bucket, key, path],
+                                        stderr=subprocess.STDOUT, universal_newlines=True)
+                with open(path, 'rb') as f:
+                    return f.read()
+            except subprocess.CalledProcessError as err:
+                if 'not found' in err.output:
+                    METRICS.record_not_found(S3_BACKEND, 'GetObject')
+                    return None
+                raise ProductInstallException(
+                    f'Failed to read S3 artifact {bucket}:{key} with error: {err.output}')
+            except OSError as err:
+                raise ProductInstallException(f'Failed to read S3 artifact {bucket}:{key}: {err}')
+
+    def delete_objects(self, bucket, keys):
+        """Delete objects from an S3 bucket.
+        Args:
+            bucket (str): The name of the S3 bucket.
+            keys (list): The keys of the objects to delete.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If an error occurred removing an object.
+        """
+        for key in keys:
+            s3_artifact_short_name = f'{bucket}:{key}'
+            try:
+                subprocess.check_output(
+                    ["cray", "artifacts", "delete", bucket, key], stderr=subprocess.STDOUT, universal_newlines=True)
+                d_logger.info(
+                    f'Successfully removed the artifact {s3_artifact_short_name}')
+            except subprocess.CalledProcessError as err:
+                if 'not found' in err.output:
+                    METRICS.record_not_found(S3_BACKEND, 'DeleteObject')
+                    d_logger.warning(
+                        f'Artifact {key} not available in S3 bucket - {bucket}')
+                    d_logger.debug(
+                        f'Output of cray artifacts delete is {err.output}')
+                else:
+                    raise ProductInstallException(
+                        f'Failed to remove S3 artifacts {s3_artifact_short_name} with error: {err}'
+                    )
+
+
+class ClientS3Backend():
+    """Delete S3 objects in-process with the multi-object DeleteObjects API.
+    A single S3 client, and therefore a single pool of HTTP connections, is
+    used for every request.
+    """
+
+    batch_size = S3_DELETE_BATCH_SIZE
+
+    def __init__(self, s3_client):
+        """Create the backend.
+        Args:
+            s3_client (botocore.client.S3): The S3 client to use.
+        """
+        self.s3_client = s3_client
+
+    @classmethod
+    def from_sts(cls, api_gateway_url, max_pool_connections, credentials_file=None, session=None):
+        """Create a backend with temporary credentials from the Cray STS service.
+        The credentials are renewed from STS before they expire, so one
+        backend may be used for longer than the lifetime of the credentials.
+        Args:
+            api_gateway_url (str): The base URL of the API gateway.
+            max_pool_connections (int): The size of the S3 connection pool.
+            credentials_file (str): The API gateway token file, used if no
+                session is given. Defaults to the file named by the
+                CRAY_CREDENTIALS environment variable.
+            session (requests.Session): A session authenticated with the
+                API gateway token, used to request credentials.
+        Returns:
+            ClientS3Backend: The backend.
+        Raises:
+            ProductInstallException: If S3 credentials could not be obtained.
+        """
+        if session is None:
+            session = requests.Session()
+            session.auth = BearerTokenAuth(OidcToken(api_gateway_url, credentials_file))
+
+        def fetch_credentials():
+            return sts_credentials(session, api_gateway_url)
+
+        credentials = fetch_credentials()
+        botocore_session = botocore.session.get_session()
+        botocore_session.get_component('credential_provider').insert_before(
+            'env', StsCredentialProvider(fetch_credentials, credentials))
+        s3_client = boto3.session.Session(botocore_session=botocore_session).client(
+            's3',
+            endpoint_url=credentials['EndpointURL'],
+            config=Config(max_pool_connections=max_pool_connections)
+        )
+        return cls(s3_client)
+
+    def list_keys(self, bucket):
+        """List the keys of every object in an S3 bucket.
+        Args:
+            bucket (str): The name of the S3 bucket.
+        Returns:
+            generator: The keys in the bucket, one page of results at a time.
+        Raises:
+            ProductInstallException: If the bucket could not be listed.
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        try:
+            for page in paginator.paginate(Bucket=bucket):
+                for s3_object in page.get('Contents', []):
+                    yield s3_object['Key']
+        except (BotoCoreError, ClientError) as err:
+            raise ProductInstallException(
+                f'Failed to list artifacts in S3 bucket {bucket} with error: {err}')
+
+    def read_object(self, bucket, key):
+        """Read an S3 object.
+        Args:
+            bucket (str): The name of the S3 bucket.
+            key (str): The key of the object.
+        Returns:
+            bytes or None: The content of the object, or None if it does not exist.
+        Raises:
+            ProductInstallException: If the object could not be read.
+        """
+        try:
+            return self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+        except ClientError as err:
+            if err.response.get('Error', {}).get('Code') in S3_NOT_FOUND_CODES:
+                METRICS.record_not_found(S3_BACKEND, 'GetObject')
+                return None
+            raise ProductInstallException(f'Failed to read S3 artifact {bucket}:{key} with error: {err}')
+        except BotoCoreError as err:
+            raise ProductInstallException(f'Failed to read S3 artifact {bucket}:{key} with error: {err}')
+
+    def delete_objects(self, bucket, keys):
+        """Delete objects from an S3 bucket.
+        Args:
+            bucket (str): The name of the S3 bucket.
+            keys (list): The keys of the objects to delete.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If an error occurred removing an object.
+        """
+        failed = []
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            d_logger.debug(f'Removing the following artifacts from S3 bucket {bucket} - {batch}')
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except (BotoCoreError, ClientError) as err:
+                raise ProductInstallException(
+                    f'Failed to remove S3 artifacts from bucket {bucket} with error: {err}')
+
+            for error in response.get('Errors', []):
+                if error.get('Code') in S3_NOT_FOUND_CODES:
+                    METRICS.record_not_found(S3_BACKEND, 'DeleteObjects')
+                    d_logger.warning(
+                        f'Artifact {error["Key"]} not available in S3 bucket - {bucket}')
+                else:
+                    failed.append(f'{error["Key"]} ({error.get("Code")}: {error.get("Message")})')
+
+        if failed:
+            raise ProductInstallException(
+                f'Failed to remove S3 artifacts from bucket {bucket}: {", ".join(failed)}')
+        d_logger.info(f'Successfully removed {len(keys)} artifacts from S3 bucket {bucket}')
@@ -0,0 +1,130 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Concurrent execution of the removal phases of a product deletion and of the
+individual deletions within a phase.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.metrics import METRICS
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+
+class PhaseScheduler():
+    """Run removal phases which use independent backends concurrently.
+    Every phase is run to completion even if another phase fails, and the
+    errors of all failed phases are reported together once every phase has
+    finished.
+    Attributes:
+        max_workers: The maximum number of phases run at the same time.
+        metrics: The Metrics the wall time of each phase is recorded in.
+    """
+
+    def __init__(self, max_workers, metrics=None):
+        if max_workers < 1:
+            raise ProductInstallException(
+                f'Phase concurrency must be at least 1, got {max_workers}')
+        self.max_workers = max_workers
+        self.metrics = metrics or METRICS
+
+    def _run_phase(self, phase_name, phase):
+        """Run a single phase and capture its error.
+        Args:
+            phase_name (str): The name of the phase used in log messages.
+            phase (callable): The phase to run. It takes no arguments.
+        Returns:
+            Exception or None: The error raised by the phase, if any.
+        """
+        d_logger.debug(f'Starting removal of {phase_name}')
+        start = time.monotonic()
+        try:
+            with self.metrics.phase(phase_name):
+                phase()
+        except ProductInstallException as err:
+            return err
+        except Exception as err:
+            d_logger.debug(f'Unexpected error removing {phase_name}', exc_info=True)
+            return err
+        d_logger.debug(f'Finished removal of {phase_name} in {time.monotonic() - start:.1f}s')
+        return None
+
+    def run(self, phases):
+        """Run the given phases and wait for all of them to finish.
+        Args:
+            phases (list): (phase name, callable) tuples. Each callable takes
+                no arguments and raises ProductInstallException on failure.
+        Returns:
+            None
+        Raises:
+            ProductInstallException: If one or more phases failed. The message
+                contains the error of every failed phase.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                (phase_name, executor.submit(self._run_phase, phase_name, phase))
+                for phase_name, phase in phases
+            ]
+            errors = [
+                (phase_name, future.result()) for phase_name, future in futures
+                if future.result() is not None
+            ]
+
+        if errors:
+            raise ProductInstallException(
+                'One or more errors occurred while removing product components:\n' +
+                '\n'.join(f'  {phase_name}: {err}' for phase_name, err in errors)
+            )
+
+
+def map_concurrently(function, items, max_workers):
+    """Call a function for every item using a bounded pool of threads.
+    A failure for one item does not prevent the function being called for
+    the remaining items.
+    Args:
+        function (callable): The function to call with each item as its only
+            argument. It raises ProductInstallException on failure.
+        items (list): The items to call the function with.
+        max_workers (int): The maximum number of concurrent calls.
+    Returns:
+        list: (item, ProductInstallException) tuples for the items which
+            failed, in the same order as the given items.
+    """
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            function(item)
+        except ProductInstallException as err:
+            return err
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        results = list(executor.map(call, items))
+    return [(item, err) for item, err in zip(items, results) if err is not None]
@@ -0,0 +1,348 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+A long-running deletion service which queues delete and dry-run jobs and
+reports their status over a small HTTP API.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import os
+from socketserver import ThreadingMixIn, UnixStreamServer
+import threading
+import time
+import uuid
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.metrics import METRICS
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+JOB_DELETE = 'delete'
+JOB_DRY_RUN = 'dry-run'
+JOB_ACTIONS = (JOB_DELETE, JOB_DRY_RUN)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# The number of finished jobs whose status and results are kept.
+MAX_FINISHED_JOBS = 1000
+
+
+class Job():
+    """A delete or dry-run job for one or more product versions."""
+
+    def __init__(self, action, product_versions, resume=False):
+        """Create a queued job.
+        Args:
+            action (str): JOB_DELETE or JOB_DRY_RUN.
+            product_versions (list): The (name, version) tuples of the product versions.
+            resume (bool): Skip the components which the journal of a
+                previous deletion of the product versions records as removed.
+        """
+        self.id = uuid.uuid4().hex
+        self.action = action
+        self.product_versions = product_versions
+        self.resume = resume
+        self.status = JOB_QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    @property
+    def active(self):
+        """bool: True if the job has not finished."""
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def to_dict(self):
+        """Get the status of the job as a JSON-serializable dictionary.
+        Returns:
+            dict: The status, timestamps, and result or error of the job.
+        """
+        return {
+            'id': self.id,
+            'action': self.action,
+            'products': [f'{name}:{version}' for name, version in self.product_versions],
+            'resume': self.resume,
+            'status': self.status,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+def parse_job_request(body):
+    """Parse the body of a request to submit a job.
+    Args:
+        body (bytes): A JSON object with the "action" of the job, "delete"
+            or "dry-run", its "products" as a list of PRODUCT:VERSION strings,
+            and whether to "resume" a previous deletion of them.
+    Returns:
+        tuple: The action, a list of unique (name, version) tuples, and
+            whether to resume.
+    Raises:
+        ValueError: If the request is not valid.
+    """
+    try:
+        request = json.loads(body.decode())
+    except (UnicodeDecodeError, ValueError) as err:
+        raise ValueError(f'The request is not valid JSON: {err}')
+    if not isinstance(request, dict):
+        raise ValueError('The request must be a JSON object')
+    action = request.get('action', JOB_DELETE)
+    if action not in JOB_ACTIONS:
+        raise ValueError(f'The action must be one of {", ".join(JOB_ACTIONS)}')
+    products = request.get('products')
+    if not isinstance(products, list) or not products:
+        raise ValueError('"products" must be a non-empty list of PRODUCT:VERSION strings')
+    product_versions = []
+    for product in products:
+        name, _, version = str(product).strip().partition(':')
+        if not name or not version:
+            raise ValueError(f'Expected PRODUCT:VERSION, got "{product}"')
+        product_versions.append((name, version))
+    resume = request.get('resume', False)
+    if not isinstance(resume, bool):
+        raise ValueError('"resume" must be true or false')
+    return action, list(dict.fromkeys(product_versions)), resume
+
+
+class JobQueue():
+    """Run jobs in the order they are submitted, a bounded number at a time."""
+
+    def __init__(self, run_job, parallelism, max_finished_jobs=MAX_FINISHED_JOBS):
+        """Create the queue.
+        Args:
+            run_job (callable): Runs a Job and returns its JSON-serializable
+                result. A ProductInstallException fails the job.
+            parallelism (int): The maximum number of jobs run at the same time.
+            max_finished_jobs (int): The number of finished jobs kept for
+                their status to be queried.
+        """
+        self.run_job = run_job
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=parallelism)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, action, product_versions, resume=False):
+        """Queue a job.
+        Args:
+            action (str): JOB_DELETE or JOB_DRY_RUN.
+            product_versions (list): The (name, version) tuples of the product versions.
+            resume (bool): Resume a previous deletion of the product versions.
+        Returns:
+            Job: The queued job.
+        Raises:
+            ProductInstallException: If a product version is already being
+                deleted by a job which has not finished.
+        """
+        job = Job(action, product_versions, resume)
+        with self._lock:
+            if action == JOB_DELETE:
+                for other in self._jobs.values():
+                    conflicts = set(product_versions).intersection(other.product_versions)
+                    if other.active and other.action == JOB_DELETE and conflicts:
+                        raise ProductInstallException(
+                            f'Job {other.id} is already deleting '
+                            f'{", ".join(f"{name}:{version}" for name, version in sorted(conflicts))}')
+            self._jobs[job.id] = job
+            self._discard_finished_jobs()
+        self._executor.submit(self._run, job)
+        d_logger.info(f'Queued {action} job {job.id} for {", ".join(job.to_dict()["products"])}')
+        return job
+
+    def _discard_finished_jobs(self):
+        """Forget the oldest finished jobs beyond the number kept. Called with the lock held.
+        Returns:
+            None
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        """Run a job, recording its status and result.
+        Args:
+            job (Job): The job.
+        Returns:
+            None
+        """
+        job.started = time.time()
+        job.status = JOB_RUNNING
+        d_logger.info(f'Started {job.action} job {job.id}')
+        try:
+            job.result = self.run_job(job)
+            job.status = JOB_SUCCEEDED
+        except ProductInstallException as err:
+            job.error = str(err)
+            job.status = JOB_FAILED
+        except Exception as err:
+            d_logger.exception(f'Unexpected error in job {job.id}')
+            job.error = f'Unexpected error: {err}'
+            job.status = JOB_FAILED
+        finally:
+            job.finished = time.time()
+        d_logger.info(f'Job {job.id} {job.status} in {job.finished - job.started:.3f}s')
+
+    def get(self, job_id):
+        """Get a job.
+        Args:
+            job_id (str): The ID of the job.
+        Returns:
+            Job: The job, or None if there is no such job.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Get every job which is kept, oldest first.
+        Returns:
+            list: The Job objects.
+        """
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs.
+        Args:
+            wait (bool): Wait for the queued and running jobs to finish.
+        Returns:
+            None
+        """
+        self._executor.shutdown(wait=wait)
+
+
+class DeletionRequestHandler(BaseHTTPRequestHandler):
+    """Handle requests to the deletion service API.
+    POST /jobs            submit a job, see parse_job_request()
+    GET /jobs             the status of every job kept
+    GET /jobs/<id>        the status and result of a job
+    GET /healthz          the status of the service
+    GET /metrics          the metrics of every job in the Prometheus text format
+    """
+
+    server_version = 'product-deletion-utility'
+
+    def _send(self, status, body, content_type='application/json'):
+        """Send a response.
+        Args:
+            status (int): The HTTP status code.
+            body (object): The body. Anything other than a str is sent as JSON.
+            content_type (str): The content type of a str body.
+        Returns:
+            None
+        """
+        if not isinstance(body, str):
+            body = json.dumps(body, indent=2)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        """Get the status of jobs or of the service."""
+        job_queue = self.server.job_queue
+        path = self.path.rstrip('/')
+        if path == '/jobs':
+            self._send(200, [job.to_dict() for job in job_queue.jobs()])
+        elif path.startswith('/jobs/'):
+            job = job_queue.get(path[len('/jobs/'):])
+            if job is None:
+                self._send(404, {'error': 'No such job'})
+            else:
+                self._send(200, job.to_dict())
+        elif path == '/healthz':
+            self._send(200, self.server.status())
+        elif path == '/metrics':
+            self._send(200, METRICS.to_prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        """Submit a job."""
+        if self.path.rstrip('/') != '/jobs':
+            self._send(404, {'error': 'Not found'})
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            action, product_versions, resume = parse_job_request(body)
+        except ValueError as err:
+            self._send(400, {'error': str(err)})
+            return
+        try:
+            job = self.server.job_queue.submit(action, product_versions, resume)
+        except ProductInstallException as err:
+            self._send(409, {'error': str(err)})
+            return
+        self._send(202, job.to_dict())
+
+    def log_message(self, format, *args):
+        """Log requests to the logger of the utility instead of stderr."""
+        d_logger.debug(f'{self.command} {self.path}: {format % args}')
+
+
+class _TCPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(job_queue, status, address=None, unix_socket=None):
+    """Create the HTTP server of the deletion service.
+    Args:
+        job_queue (JobQueue): The queue jobs are submitted to.
+        status (callable): Returns the JSON-serializable status of the service.
+        address (tuple): The (host, port) to listen on.
+        unix_socket (str): The path of a Unix socket to listen on instead.
+            Only the owner of the process may connect to it.
+    Returns:
+        socketserver.BaseServer: The server. Call serve_forever() to handle requests.
+    """
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        old_umask = os.umask(0o177)
+        try:
+            server = _UnixServer(unix_socket, DeletionRequestHandler)
+        finally:
+            os.umask(old_umask)
+    else:
+        server = _TCPServer(address, DeletionRequestHandler)
+    server.job_queue = job_queue
+    server.status = status
+    return server
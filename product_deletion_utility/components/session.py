@@ -0,0 +1,261 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Credentials and authenticated HTTP sessions shared by the clients of every backend.
+"""
+
+from base64 import urlsafe_b64decode
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+
+from product_deletion_utility.components.constants import DEFAULT_API_GATEWAY_URL
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.metrics import instrument_session
+from product_deletion_utility.components.nexus import nexus_auth
+
+d_logger = logging.getLogger('product-deletion-utility')
+
+# The Keycloak endpoint and client the cray CLI refreshes its token with.
+KEYCLOAK_TOKEN_PATH = '/keycloak/realms/shasta/protocol/openid-connect/token'
+KEYCLOAK_CLIENT_ID = 'shasta'
+# The number of seconds before it expires that the API gateway token is refreshed.
+TOKEN_REFRESH_MARGIN = 60
+# The size of a connection pool when the number of concurrent requests is not known.
+DEFAULT_POOL_SIZE = 10
+
+
+def read_token_file(credentials_file=None):
+    """Read the token file of the cray CLI.
+    Args:
+        credentials_file (str): The path of the JSON token file. Defaults to
+            the file named by the CRAY_CREDENTIALS environment variable.
+    Returns:
+        dict: The token, with at least an access_token key.
+    Raises:
+        ProductInstallException: If the token could not be read.
+    """
+    credentials_file = credentials_file or os.environ.get('CRAY_CREDENTIALS')
+    if not credentials_file:
+        raise ProductInstallException(
+            'Unable to authenticate with the API gateway: CRAY_CREDENTIALS is not set')
+    try:
+        with open(credentials_file) as f:
+            token = json.load(f)
+    except (OSError, ValueError) as err:
+        raise ProductInstallException(
+            f'Unable to read API gateway token from {credentials_file}: {err}')
+    if not isinstance(token, dict) or 'access_token' not in token:
+        raise ProductInstallException(
+            f'Unable to read API gateway token from {credentials_file}: no access_token')
+    return token
+
+
+def token_expiry(token):
+    """Get the time a token expires.
+    Args:
+        token (dict): The token, as stored by the cray CLI or returned by Keycloak.
+    Returns:
+        float or None: The expiry time in seconds since the epoch, from the
+            expires_at key or else the exp claim of the access token, or None
+            if neither is present.
+    """
+    if token.get('expires_at'):
+        return float(token['expires_at'])
+    try:
+        payload = token['access_token'].split('.')[1]
+        claims = json.loads(urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def pooled_session(backend, max_connections=DEFAULT_POOL_SIZE, auth=None):
+    """Create a requests session with a connection pool whose requests are recorded in METRICS.
+    Args:
+        backend (str): The backend the session talks to.
+        max_connections (int): The size of the connection pool.
+        auth: The requests authentication of the session, if any.
+    Returns:
+        requests.Session: The session.
+    """
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_maxsize=max_connections))
+    session.mount('http://', HTTPAdapter(pool_maxsize=max_connections))
+    session.auth = auth
+    return instrument_session(session, backend)
+
+
+class OidcToken():
+    """The API gateway token of the cray CLI, refreshed before it expires.
+    The token file is read the first time the token is used. When the token
+    is about to expire, the file is read again in case the cray CLI has
+    refreshed it, and otherwise a new token is requested from Keycloak with
+    the refresh token. This lets a long running deletion service outlive the
+    token it was started with.
+    """
+
+    def __init__(self, api_gateway_url=DEFAULT_API_GATEWAY_URL, credentials_file=None,
+                 refresh_margin=TOKEN_REFRESH_MARGIN, session=None):
+        """Create the token.
+        Args:
+            api_gateway_url (str): The base URL of the API gateway, which
+                routes to Keycloak.
+            credentials_file (str): The path of the JSON token file. Defaults to
+                the file named by the CRAY_CREDENTIALS environment variable.
+            refresh_margin (float): The number of seconds before it expires
+                that the token is refreshed.
+            session (requests.Session): The session used to refresh the token.
+        """
+        self.token_url = f'{api_gateway_url.rstrip("/")}{KEYCLOAK_TOKEN_PATH}'
+        self.credentials_file = credentials_file
+        self.refresh_margin = refresh_margin
+        self.session = session or requests.Session()
+        self._token = None
+        self._lock = threading.Lock()
+
+    def _expires_soon(self, token):
+        expires_at = token_expiry(token)
+        return expires_at is not None and expires_at - time.time() <= self.refresh_margin
+
+    def access_token(self):
+        """Get the access token, refreshing it if it is about to expire.
+        Returns:
+            str: The access token.
+        Raises:
+            ProductInstallException: If the token could not be read, or has
+                expired and could not be refreshed.
+        """
+        with self._lock:
+            if self._token is None:
+                self._token = read_token_file(self.credentials_file)
+            if self._expires_soon(self._token):
+                self._token = self._refresh()
+            return self._token['access_token']
+
+    def _refresh(self):
+        """Get a token which is not about to expire.
+        Returns:
+            dict: The token.
+        Raises:
+            ProductInstallException: If the token has expired and could not be refreshed.
+        """
+        token = read_token_file(self.credentials_file)
+        if not self._expires_soon(token):
+            return token
+        if token.get('refresh_token'):
+            try:
+                response = self.session.post(self.token_url, data={
+                    'grant_type': 'refresh_token',
+                    'client_id': KEYCLOAK_CLIENT_ID,
+                    'refresh_token': token['refresh_token'],
+                })
+                response.raise_for_status()
+                refreshed = response.json()
+                if refreshed.get('expires_in'):
+                    refreshed['expires_at'] = time.time() + float(refreshed['expires_in'])
+                d_logger.debug('Refreshed the API gateway token')
+                return dict(refreshed, refresh_token=refreshed.get('refresh_token') or token['refresh_token'])
+            except (requests.RequestException, ValueError, TypeError) as err:
+                d_logger.warning(f'Unable to refresh the API gateway token: {err}')
+        if token_expiry(token) > time.time():
+            return token
+        raise ProductInstallException('The API gateway token has expired and could not be refreshed')
+
+
+class BearerTokenAuth(AuthBase):
+    """Authenticate each request with the current API gateway token."""
+
+    def __init__(self, token):
+        """Create the authentication.
+        Args:
+            token (OidcToken): The token.
+        """
+        self.token = token
+
+    def __call__(self, request):
+        request.headers['Authorization'] = f'Bearer {self.token.access_token()}'
+        return request
+
+
+class SessionBroker():
+    """The credentials of every backend, and the sessions authenticated with them.
+    One broker is created per run, or per deletion service, so the Nexus
+    credentials are read and the API gateway token is loaded once, however
+    many clients and requests use them.
+    """
+
+    def __init__(self, api_gateway_url=DEFAULT_API_GATEWAY_URL, load_nexus_credentials=None,
+                 credentials_file=None):
+        """Create the broker.
+        Args:
+            api_gateway_url (str): The base URL of the API gateway.
+            load_nexus_credentials (callable): Returns the Nexus (username,
+                password), or None if they are not available. It is called
+                the first time the credentials are used. Defaults to reading
+                the NEXUS_USERNAME and NEXUS_PASSWORD environment variables.
+            credentials_file (str): The API gateway token file. Defaults to
+                the file named by the CRAY_CREDENTIALS environment variable.
+        """
+        self.api_gateway_url = api_gateway_url
+        self._load_nexus_credentials = load_nexus_credentials or nexus_auth
+        self._nexus_credentials = None
+        self._nexus_credentials_loaded = False
+        self._lock = threading.Lock()
+        self.token = OidcToken(api_gateway_url, credentials_file)
+
+    @property
+    def nexus_credentials(self):
+        """tuple or None: The Nexus (username, password), loaded the first time they are used."""
+        with self._lock:
+            if not self._nexus_credentials_loaded:
+                self._nexus_credentials = self._load_nexus_credentials()
+                self._nexus_credentials_loaded = True
+            return self._nexus_credentials
+
+    def nexus_session(self, backend, max_connections=DEFAULT_POOL_SIZE):
+        """Create a session authenticated with the Nexus credentials, as used by Nexus and the Docker registry.
+        Args:
+            backend (str): The backend the session talks to.
+            max_connections (int): The size of the connection pool.
+        Returns:
+            requests.Session: The session.
+        """
+        return pooled_session(backend, max_connections, self.nexus_credentials)
+
+    def gateway_session(self, backend, max_connections=DEFAULT_POOL_SIZE):
+        """Create a session authenticated with the API gateway token.
+        Args:
+            backend (str): The backend the session talks to.
+            max_connections (int): The size of the connection pool.
+        Returns:
+            requests.Session: The session.
+        """
+        return pooled_session(backend, max_connections, BearerTokenAuth(self.token))
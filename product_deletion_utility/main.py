@@ -25,46 +25,254 @@
 Entry point for the product deletion utility.
 """
 
+from collections import Counter
 import logging
+import signal
+import threading
 
-from product_deletion_utility.components.delete import DeleteProductComponent, ProductInstallException
-from product_deletion_utility.parser.parser import create_parser
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.journal import DeletionJournal, journal_path
+from product_deletion_utility.components.metrics import METRICS, Metrics, write_summary
+from product_deletion_utility.components.retry import configure_retries
+from product_deletion_utility.components.scheduler import PhaseScheduler
+from product_deletion_utility.parser.parser import create_parser, get_product_versions
 from product_deletion_utility.logging import setup_file_logger, setup_console_logger
 
 LOGGER = logging.getLogger('product-deletion-utility')
 
 def delete(args):
-    """Delete a version of a product.
+    """Delete a version of a product, or a batch of product versions.
     Args:
         args (argparse.Namespace): The CLI arguments to the command.
     Returns:
         None
+    Raises:
+        ProductInstallException: if uninstall failed. The errors of all
+            failed removal phases are reported together.
+    """
+    configure_retries(args.max_retries, args.rate_limit)
+    # A dry run removes nothing, so there is nothing to journal.
+    journal = None
+    if not args.dry_run:
+        journal = DeletionJournal(
+            journal_path(args.journal_dir, args.product_versions), resume=args.resume)
+        LOGGER.info(f'Recording removed components in {journal.path}')
+    try:
+        _delete(args, journal)
+    finally:
+        if journal:
+            journal.close()
+        try:
+            write_summary(args.log_file, args.metrics_textfile)
+        except OSError as err:
+            LOGGER.warning(f'Unable to write deletion metrics: {err}')
+
+
+def _delete(args, journal):
+    """Remove the components of the product versions and their catalog entries.
+    Args:
+        args (argparse.Namespace): The CLI arguments to the command.
+        journal (DeletionJournal): The journal recording removed components,
+            or None for a dry run.
+    Returns:
+        None
     Raises:
         ProductInstallException: if uninstall failed.
     """
+    # Imported here because it loads the Kubernetes, Nexus and S3 client
+    # libraries, which --help and argument errors do not need.
+    from product_deletion_utility.components.delete import DeleteProductComponent
+
     delete_product_catalog = DeleteProductComponent(
-        catalogname=args.product_catalog_name,
-        catalognamespace=args.product_catalog_namespace,
         productname=args.product,
         productversion=args.version,
+        product_versions=args.product_versions,
+        journal=journal,
+        **_component_options(args)
+    )
+    if args.dry_run:
+        LOGGER.debug(f'dryrun option is passed')
+        print(delete_product_catalog.plan.to_json(delete_product_catalog.s3_batch_size))
+        return
+
+    # The catalog entry is only removed once every phase has succeeded.
+    _remove_components(delete_product_catalog, args.phase_concurrency)
+    delete_product_catalog.remove_product_entry()
+
+
+def _remove_components(delete_product_catalog, phase_concurrency):
+    """Run the removal phases of a deletion.
+    Args:
+        delete_product_catalog (DeleteProductComponent): The deletion.
+        phase_concurrency (int): The maximum number of phases run at the same time.
+    Returns:
+        None
+    Raises:
+        ProductInstallException: if a phase failed.
+    """
+    # Each phase uses an independent backend, so they may run concurrently.
+    try:
+        PhaseScheduler(phase_concurrency, delete_product_catalog.metrics).run([
+            ('Docker images', delete_product_catalog.remove_product_docker_images),
+            ('S3 artifacts', delete_product_catalog.remove_product_S3_artifacts),
+            ('Helm charts', delete_product_catalog.remove_product_helm_charts),
+            ('loftsman manifests', delete_product_catalog.remove_product_loftsman_manifests),
+            ('IMS images', delete_product_catalog.remove_ims_images),
+            ('IMS recipes', delete_product_catalog.remove_ims_recipes),
+            ('hosted repositories', delete_product_catalog.remove_product_hosted_repos),
+        ])
+    finally:
+        delete_product_catalog.close()
+
+
+def _component_options(args):
+    """Get the arguments of DeleteProductComponent shared by every action.
+    Args:
+        args (argparse.Namespace): The CLI arguments to the command.
+    Returns:
+        dict: The keyword arguments.
+    """
+    return dict(
+        catalogname=args.product_catalog_name,
+        catalognamespace=args.product_catalog_namespace,
         nexus_url=args.nexus_url,
         docker_url=args.docker_url,
         nexus_credentials_secret_name=args.nexus_credentials_secret_name,
         nexus_credentials_secret_namespace=args.nexus_credentials_secret_namespace,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        docker_concurrency=args.docker_concurrency,
+        nexus_concurrency=args.nexus_concurrency,
+        s3_concurrency=args.s3_concurrency,
+        ims_concurrency=args.ims_concurrency,
+        s3_backend=args.s3_backend,
+        api_gateway_url=args.api_gateway_url,
+        chart_lookup=args.nexus_chart_lookup,
+        engine=args.engine,
+        report_repo_sizes=args.nexus_report_repo_sizes,
+        catalog_cache_dir=args.catalog_cache_dir
     )
-    if args.dry_run:
-        LOGGER.debug(f'dryrun option is passed')
 
-    delete_product_catalog.remove_product_docker_images()
-    delete_product_catalog.remove_product_S3_artifacts()
-    delete_product_catalog.remove_product_helm_charts()
-    delete_product_catalog.remove_product_loftsman_manifests()
-    delete_product_catalog.remove_ims_images()
-    delete_product_catalog.remove_ims_recipes()
-    delete_product_catalog.remove_product_hosted_repos()
-    if not args.dry_run:
-        delete_product_catalog.remove_product_entry()
+
+def gc(args):
+    """Find, and optionally remove, the artifacts which no product version in the catalog owns.
+    The report of the orphans found is printed as JSON.
+    Args:
+        args (argparse.Namespace): The CLI arguments to the command.
+    Returns:
+        None
+    Raises:
+        ProductInstallException: if an artifact could not be listed or removed.
+    """
+    configure_retries(args.max_retries, args.rate_limit)
+    # Imported here for the same reason as in _delete.
+    from product_deletion_utility.components.delete import GarbageCollector
+
+    try:
+        collector = GarbageCollector(
+            backends=args.gc_backends, remove=args.delete_orphans, **_component_options(args))
+        try:
+            PhaseScheduler(args.phase_concurrency).run(collector.phases())
+        finally:
+            collector.close()
+            print(collector.report.to_json())
+    finally:
+        try:
+            write_summary(args.log_file, args.metrics_textfile)
+        except OSError as err:
+            LOGGER.warning(f'Unable to write deletion metrics: {err}')
+
+
+def serve(args):
+    """Run the delete and dry-run jobs submitted to the API of the deletion service.
+    The product catalog is kept current by a watch of its ConfigMap, and the
+    clients of the Docker registry, Nexus and S3 are shared by every job, so
+    a job starts without reading the catalog or opening new connections.
+    Runs until interrupted or terminated, then waits for running jobs to finish.
+    Args:
+        args (argparse.Namespace): The CLI arguments to the command.
+    Returns:
+        None
+    Raises:
+        ProductInstallException: if the product catalog could not be read.
+    """
+    configure_retries(args.max_retries, args.rate_limit)
+    # Imported here for the same reason as in _delete.
+    from product_deletion_utility.components.delete import (
+        BackendClients,
+        CatalogWatcher,
+        DeleteProductComponent,
+        get_k8s_api,
+    )
+    from product_deletion_utility.components.service import JOB_DRY_RUN, JobQueue, create_server
+
+    k8s_client = get_k8s_api()
+    clients = BackendClients(
+        k8s_client, args.nexus_url, args.docker_url, args.nexus_credentials_secret_name,
+        args.nexus_credentials_secret_namespace, args.docker_concurrency, args.s3_concurrency,
+        args.s3_backend, args.api_gateway_url, args.ims_concurrency)
+    try:
+        clients.warm()
+    except ProductInstallException as err:
+        LOGGER.warning(f'Unable to create every client before the first job: {err}')
+    watcher = CatalogWatcher(k8s_client, args.product_catalog_name, args.product_catalog_namespace)
+    watcher.start()
+    # catalog_delete is configured through os.environ, and each run rewrites
+    # the catalog, so entries are removed by one job at a time.
+    catalog_lock = threading.Lock()
+
+    def run_job(job):
+        catalog_documents, ownership_index, resource_version = watcher.snapshot()
+        options = dict(_component_options(args), dry_run=job.action == JOB_DRY_RUN)
+        if options['dry_run']:
+            delete_product_catalog = DeleteProductComponent(
+                product_versions=job.product_versions, clients=clients,
+                catalog_documents=catalog_documents,
+                ownership_index=ownership_index, **options)
+            return delete_product_catalog.plan.to_dict(delete_product_catalog.s3_batch_size)
+
+        journal = DeletionJournal(journal_path(args.journal_dir, job.product_versions), resume=job.resume)
+        # Recorded in METRICS too, which /metrics and the textfile report for every job.
+        job_metrics = Metrics(parent=METRICS)
+        try:
+            delete_product_catalog = DeleteProductComponent(
+                product_versions=job.product_versions, journal=journal, clients=clients,
+                catalog_documents=catalog_documents,
+                ownership_index=ownership_index, metrics=job_metrics, **options)
+            _remove_components(delete_product_catalog, args.phase_concurrency)
+            with catalog_lock:
+                try:
+                    delete_product_catalog.remove_product_entry()
+                finally:
+                    watcher.invalidate(resource_version)
+        finally:
+            journal.close()
+            try:
+                write_summary(args.log_file, metrics=job_metrics, job_id=job.id)
+                write_summary(textfile=args.metrics_textfile)
+            except OSError as err:
+                LOGGER.warning(f'Unable to write deletion metrics: {err}')
+        return {'journal': journal.path, 'metrics': job_metrics.to_dict()}
+
+    job_queue = JobQueue(run_job, args.job_concurrency)
+
+    def status():
+        return {
+            'catalog_resource_version': watcher.resource_version,
+            'jobs': dict(Counter(job.status for job in job_queue.jobs())),
+        }
+
+    server = create_server(job_queue, status, args.listen, args.unix_socket)
+    # serve_forever() runs in this thread, so it is stopped from another one.
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    LOGGER.info(f'Serving deletion jobs on {args.unix_socket or "%s:%d" % args.listen}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_queue.shutdown(wait=True)
+        watcher.stop()
 
 
 def main():
@@ -76,12 +284,23 @@ def main():
     """
     parser = create_parser()
     args = parser.parse_args()
+    args.product_versions = get_product_versions(parser, args)
     try:
         if args.action == 'delete' or args.action == 'uninstall':
             setup_console_logger()
             if args.log_file is not None:
                 setup_file_logger(args.log_file)
             delete(args)
+        elif args.action == 'gc':
+            setup_console_logger()
+            if args.log_file is not None:
+                setup_file_logger(args.log_file)
+            gc(args)
+        elif args.action == 'serve':
+            setup_console_logger()
+            if args.log_file is not None:
+                setup_file_logger(args.log_file)
+            serve(args)
     except ProductInstallException as err:
         LOGGER.critical(err)
         raise SystemExit(1)
@@ -34,8 +34,97 @@ from product_deletion_utility.components.constants import (
     DEFAULT_DOCKER_URL,
     PRODUCT_CATALOG_CONFIG_MAP_NAME,
     PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE,
-    DEFAULT_LOG_DIR
+    DEFAULT_LOG_DIR,
+    DEFAULT_CATALOG_CACHE_DIR,
+    DEFAULT_PHASE_CONCURRENCY,
+    DEFAULT_DOCKER_CONCURRENCY,
+    DEFAULT_NEXUS_CONCURRENCY,
+    DEFAULT_S3_CONCURRENCY,
+    DEFAULT_IMS_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_API_GATEWAY_URL,
+    DEFAULT_SERVE_ADDRESS,
+    DEFAULT_JOB_CONCURRENCY,
+    S3_BACKEND_CLIENT,
+    S3_BACKEND_CLI,
+    CHART_LOOKUP_LIST,
+    CHART_LOOKUP_SEARCH,
+    ENGINE_THREADS,
+    ENGINE_ASYNC
 )
+from product_deletion_utility.components.gc import GC_BACKENDS
+
+
+def parse_product_version(value):
+    """Parse a PRODUCT:VERSION argument.
+    Args:
+        value (str): The argument.
+    Returns:
+        tuple: The (name, version) of the product.
+    Raises:
+        argparse.ArgumentTypeError: If the value is not in PRODUCT:VERSION form.
+    """
+    name, _, version = value.strip().partition(':')
+    if not name or not version:
+        raise argparse.ArgumentTypeError(f'expected PRODUCT:VERSION, got "{value}"')
+    return name, version
+
+
+def parse_address(value):
+    """Parse a HOST:PORT argument.
+    Args:
+        value (str): The argument.
+    Returns:
+        tuple: The (host, port) to listen on.
+    Raises:
+        argparse.ArgumentTypeError: If the value is not in HOST:PORT form.
+    """
+    host, _, port = value.strip().rpartition(':')
+    if not port.isdigit():
+        raise argparse.ArgumentTypeError(f'expected HOST:PORT, got "{value}"')
+    return host, int(port)
+
+
+def get_product_versions(parser, args):
+    """Get the product versions to operate on from the parsed arguments.
+    Args:
+        parser (argparse.ArgumentParser): The parser, used to report errors.
+        args (argparse.Namespace): The parsed arguments.
+    Returns:
+        list: (name, version) tuples without duplicates, in the order given.
+            The gc and serve actions do not operate on given product
+            versions, so the list is empty.
+    """
+    if args.action == 'gc':
+        if args.product or args.version or args.products or args.products_file:
+            parser.error('gc searches for artifacts of every product version and does not take a product')
+        return []
+    if args.action == 'serve':
+        if args.product or args.version or args.products or args.products_file:
+            parser.error('serve takes the product versions of each job in its request')
+        return []
+    batch = list(args.products or [])
+    if args.products_file:
+        try:
+            with open(args.products_file) as f:
+                lines = [line.strip() for line in f]
+        except OSError as err:
+            parser.error(f'unable to read --products-file: {err}')
+        try:
+            batch.extend(parse_product_version(line) for line in lines
+                         if line and not line.startswith('#'))
+        except argparse.ArgumentTypeError as err:
+            parser.error(f'invalid line in --products-file: {err}')
+
+    if batch:
+        if args.product or args.version:
+            parser.error('a product and version cannot be given together with '
+                         '--products or --products-file')
+        return list(dict.fromkeys(batch))
+    if not args.product or not args.version:
+        parser.error('a product and version, --products or --products-file is required')
+    return [(args.product, args.version)]
 
 
 def create_parser():
@@ -48,18 +137,35 @@ def create_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         'action',
-        choices=['delete', 'uninstall'],
-        help='Specify the operation to execute on a product.'
+        choices=['delete', 'uninstall', 'gc', 'serve'],
+        help='Specify the operation to execute on a product. gc finds the artifacts '
+             'of products which no product version in the catalog owns. serve runs '
+             'delete and dry-run jobs submitted to an HTTP API.'
     )
 
     parser.add_argument(
         'product',
+        nargs='?',
         help='The name of the product to delete or activate.'
     )
     parser.add_argument(
         'version',
+        nargs='?',
         help='Specify the version of the product to operate on.'
     )
+    parser.add_argument(
+        '--products',
+        nargs='+',
+        metavar='PRODUCT:VERSION',
+        type=parse_product_version,
+        help='Delete several product versions as a single batch instead of a '
+             'single product and version.'
+    )
+    parser.add_argument(
+        '--products-file',
+        help='A file listing product versions to delete as a single batch, one '
+             'PRODUCT:VERSION per line. Blank lines and lines starting with # are ignored.'
+    )
     parser.add_argument(
         '--docker-url',
         help='Override the base URL of the Docker registry.',
@@ -67,7 +173,8 @@ def create_parser():
     )
     parser.add_argument(
         '-d', '--dry-run',
-        help='Lists the components that would be deleted for the provided product:version',
+        help='Prints the plan of the components that would be deleted for the provided '
+             'product:version as JSON, without connecting to the registry, Nexus or S3.',
         default=False,
         type=lambda x: (str(x).lower() == 'true')
     )
@@ -76,6 +183,85 @@ def create_parser():
         help='Log file name for file based logging.',
         default=DEFAULT_LOG_DIR,
     )
+    parser.add_argument(
+        '--metrics-textfile',
+        help='Also write the metrics of the deletion to this file in the Prometheus text '
+             'format, e.g. for the node_exporter textfile collector. A JSON summary is '
+             'always written next to the log file.',
+    )
+    parser.add_argument(
+        '--journal-dir',
+        help='The directory holding the journal of removed components, which '
+             'is used to resume an interrupted deletion.',
+        default=DEFAULT_LOG_DIR,
+    )
+    parser.add_argument(
+        '--resume',
+        help='Resume a previous deletion of the same product versions, skipping '
+             'the components its journal records as already removed.',
+        action='store_true'
+    )
+    parser.add_argument(
+        '--catalog-cache-dir',
+        help='The directory holding a snapshot of the parsed product catalog. The '
+             'snapshot is used instead of parsing the product catalog ConfigMap '
+             'again while its resourceVersion is unchanged.',
+        default=DEFAULT_CATALOG_CACHE_DIR,
+    )
+    parser.add_argument(
+        '--no-catalog-cache',
+        help='Always read and parse the product catalog ConfigMap.',
+        action='store_const',
+        const=None,
+        dest='catalog_cache_dir'
+    )
+    parser.add_argument(
+        '--phase-concurrency',
+        help='The maximum number of removal phases (Docker images, S3 artifacts, '
+             'Helm charts, etc.) to run at the same time.',
+        default=DEFAULT_PHASE_CONCURRENCY,
+        type=int
+    )
+    parser.add_argument(
+        '--engine',
+        help='How components are removed. "threads" uses a pool of threads for each backend, '
+             '"async" uses a single asyncio event loop with a shared pool of HTTP connections.',
+        choices=[ENGINE_THREADS, ENGINE_ASYNC],
+        default=ENGINE_THREADS
+    )
+    parser.add_argument(
+        '--docker-concurrency',
+        help='The maximum number of Docker images to remove at the same time.',
+        default=DEFAULT_DOCKER_CONCURRENCY,
+        type=int
+    )
+    parser.add_argument(
+        '--s3-concurrency',
+        help='The maximum number of S3 artifacts and loftsman manifests to remove at the same time.',
+        default=DEFAULT_S3_CONCURRENCY,
+        type=int
+    )
+    parser.add_argument(
+        '--ims-concurrency',
+        help='The maximum number of IMS images and recipes to remove at the same time.',
+        default=DEFAULT_IMS_CONCURRENCY,
+        type=int
+    )
+    parser.add_argument(
+        '--max-retries',
+        help='The number of times a request to the Docker registry or Nexus is retried '
+             'after a timeout, a connection failure or an HTTP 429, 502, 503 or 504 response.',
+        default=DEFAULT_MAX_RETRIES,
+        type=int
+    )
+    parser.add_argument(
+        '--rate-limit',
+        help='The maximum number of requests per second to each Docker registry or Nexus '
+             'host. 0 disables the limit. The number of requests in flight is also reduced '
+             'while a host is throttling requests.',
+        default=DEFAULT_RATE_LIMIT,
+        type=float
+    )
 
     product_catalog_group = parser.add_argument_group('product-catalog')
     product_catalog_group.add_argument(
@@ -88,6 +274,19 @@ def create_parser():
         help='The namespace of the product catalog Kubernetes ConfigMap',
         default=PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE
     )
+    s3_group = parser.add_argument_group('s3')
+    s3_group.add_argument(
+        '--s3-backend',
+        help='How S3 artifacts are removed. "client" removes them in-process in batches '
+             'of up to 1000 keys, "cli" runs "cray artifacts delete" for each artifact.',
+        choices=[S3_BACKEND_CLIENT, S3_BACKEND_CLI],
+        default=S3_BACKEND_CLIENT
+    )
+    s3_group.add_argument(
+        '--api-gateway-url',
+        help='The base URL of the API gateway used to obtain S3 credentials and to reach IMS.',
+        default=DEFAULT_API_GATEWAY_URL
+    )
     nexus_group = parser.add_argument_group('nexus')
     nexus_group.add_argument(
         '--nexus-url',
@@ -106,5 +305,59 @@ def create_parser():
              'authentication credentials for Nexus.',
         default=NEXUS_CREDENTIALS_SECRET_NAMESPACE
     )
+    nexus_group.add_argument(
+        '--nexus-concurrency',
+        help='The maximum number of Helm charts and hosted repositories to '
+             'remove from Nexus at the same time.',
+        default=DEFAULT_NEXUS_CONCURRENCY,
+        type=int
+    )
+    nexus_group.add_argument(
+        '--nexus-chart-lookup',
+        help='How the Nexus components of Helm charts are found. "list" streams the '
+             'charts repository until every chart is found, "search" queries the '
+             'Nexus search API for each chart.',
+        choices=[CHART_LOOKUP_LIST, CHART_LOOKUP_SEARCH],
+        default=CHART_LOOKUP_LIST
+    )
+    nexus_group.add_argument(
+        '--nexus-report-repo-sizes',
+        help='Estimate the size of each hosted repository before removing it, and '
+             'record it in the log and the metrics summary. This lists every asset '
+             'of the repositories.',
+        action='store_true'
+    )
+    gc_group = parser.add_argument_group('gc')
+    gc_group.add_argument(
+        '--delete-orphans',
+        help='Remove the orphaned artifacts gc finds instead of only reporting them.',
+        action='store_true'
+    )
+    gc_group.add_argument(
+        '--gc-backends',
+        help='The backends gc searches for orphaned artifacts.',
+        nargs='+',
+        choices=GC_BACKENDS,
+        default=list(GC_BACKENDS)
+    )
+    serve_group = parser.add_argument_group('serve')
+    serve_group.add_argument(
+        '--listen',
+        help='The HOST:PORT the API of serve listens on.',
+        metavar='HOST:PORT',
+        type=parse_address,
+        default=DEFAULT_SERVE_ADDRESS
+    )
+    serve_group.add_argument(
+        '--unix-socket',
+        help='Listen on this Unix socket instead of --listen. Only the user '
+             'running serve may connect to it.'
+    )
+    serve_group.add_argument(
+        '--job-concurrency',
+        help='The maximum number of jobs serve runs at the same time.',
+        default=DEFAULT_JOB_CONCURRENCY,
+        type=int
+    )
 
     return parser
@@ -53,7 +53,7 @@ setup(
     url='https://github.com/Cray-HPE/product-deletion-utility',
     author='Hewlett Packard Enterprise Development LP',
     license='MIT',
-    packages=find_packages(exclude=['tests', 'tests.*', 'tools', 'tools.*']),
+    packages=find_packages(exclude=['tests', 'tests.*', 'tools', 'tools.*', 'benchmarks', 'benchmarks.*']),
     python_requires='>=3, <4',
     # Top-level dependencies are parsed from requirements.txt
     install_requires=install_requires,
@@ -0,0 +1,206 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.async_engine module.
+"""
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import unittest
+from unittest.mock import Mock, NonCallableMock, call, patch
+
+from product_deletion_utility.components.async_engine import AsyncDeletionEngine
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ims import IMS_IMAGES, IMS_RECIPES
+from product_deletion_utility.components.ownership import (
+    DOCKER_IMAGE,
+    HELM_CHART,
+    HOSTED_REPO,
+    IMS_IMAGE,
+    IMS_RECIPE,
+    S3_ARTIFACT,
+)
+from product_deletion_utility.components.retry import RETRY_POLICY, HostLimiters
+from product_deletion_utility.components.s3 import CrayCliS3Backend
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    """Serve a minimal Docker registry and Nexus REST API."""
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, headers=None):
+        self.server.requests.append((self.command, self.path))
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_HEAD(self):
+        if self.path == '/v2/cray/present/manifests/1.0':
+            self._respond(200, {'Docker-Content-Digest': 'sha256:abc'})
+        else:
+            self._respond(404)
+
+    def do_DELETE(self):
+        if self.path == '/service/rest/v1/repositories/throttled' and self.server.throttled:
+            self.server.throttled -= 1
+            self._respond(429, {'Retry-After': '0'})
+        elif self.path in ('/v2/cray/present/manifests/sha256:abc',
+                           '/service/rest/v1/components/chart-id',
+                           '/service/rest/v1/repositories/throttled'):
+            self._respond(202)
+        elif self.path == '/service/rest/v1/repositories/broken':
+            self._respond(500)
+        else:
+            self._respond(404)
+
+
+class TestAsyncDeletionEngine(unittest.TestCase):
+    """Tests for AsyncDeletionEngine."""
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeBackendHandler)
+        self.server.requests = []
+        self.server.throttled = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{self.server.server_port}'
+        self.s3_backend = NonCallableMock()
+        self.engine = AsyncDeletionEngine(
+            url, url, self.s3_backend, {'docker': 2, 'nexus': 2, 's3': 2, 'ims': 2})
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.shutdown()
+        self.server.server_close()
+        patch.stopall()
+
+    def test_delete_docker_image(self):
+        """Test that an image tag is resolved to a digest and the manifest deleted."""
+        self.assertEqual([], self.engine.remove(DOCKER_IMAGE, [('cray/present', '1.0')]))
+        self.assertIn(('DELETE', '/v2/cray/present/manifests/sha256:abc'), self.server.requests)
+
+    def test_delete_docker_image_by_digest(self):
+        """Test that a digest is deleted without being resolved again."""
+        self.assertEqual([], self.engine.remove(DOCKER_IMAGE, [('cray/present', 'sha256:abc')]))
+        self.assertEqual([('DELETE', '/v2/cray/present/manifests/sha256:abc')], self.server.requests)
+
+    def test_docker_image_already_removed(self):
+        """Test that a missing image is not a failure."""
+        self.assertEqual([], self.engine.remove(DOCKER_IMAGE, [('cray/absent', '1.0')]))
+        self.assertNotIn('DELETE', [method for method, _ in self.server.requests])
+
+    def test_nexus_deletions(self):
+        """Test that Helm charts and hosted repositories are deleted through Nexus."""
+        self.assertEqual([], self.engine.remove(HELM_CHART, [('cray-a', '1.0.0', 'chart-id')]))
+        self.assertEqual([], self.engine.remove(HOSTED_REPO, ['already-gone']))
+        failures = self.engine.remove(HOSTED_REPO, ['broken', 'already-gone'])
+        self.assertEqual(['broken'], [item for item, _ in failures])
+        self.assertIn('HTTP 500', str(failures[0][1]))
+
+    def test_throttled_request_retried(self):
+        """Test that a throttled request is retried through the limiter of its host."""
+        self.server.throttled = 2
+        limiters = HostLimiters(rate=0)
+        patch('product_deletion_utility.components.retry.LIMITERS', limiters).start()
+        patch.object(RETRY_POLICY, 'base_delay', 0).start()
+        self.assertEqual([], self.engine.remove(HOSTED_REPO, ['throttled']))
+        self.assertEqual(3, self.server.requests.count(('DELETE', '/service/rest/v1/repositories/throttled')))
+        self.assertEqual(16 + 1 / 16, limiters.get(f'127.0.0.1:{self.server.server_port}').limit)
+
+    def test_throttled_until_retries_used_up(self):
+        """Test that a request still throttled after every retry is a failure."""
+        self.server.throttled = 10
+        patch.object(RETRY_POLICY, 'base_delay', 0).start()
+        patch.object(RETRY_POLICY, 'max_retries', 1).start()
+        failures = self.engine.remove(HOSTED_REPO, ['throttled'])
+        self.assertEqual(['throttled'], [item for item, _ in failures])
+        self.assertEqual('Failed to remove throttled: HTTP 429 Too Many Requests', str(failures[0][1]))
+
+    def test_delete_s3_objects(self):
+        """Test that S3 batches are handed to the S3 backend."""
+        self.assertEqual([], self.engine.remove(S3_ARTIFACT, [('config-data', ['a.yaml', 'b.yaml'])]))
+        self.s3_backend.delete_objects.assert_called_once_with('config-data', ['a.yaml', 'b.yaml'])
+
+    def test_s3_backend_created_on_first_use(self):
+        """Test that an S3 backend factory is only called when S3 is first used."""
+        s3_backend_factory = Mock(return_value=self.s3_backend)
+        self.engine.s3_backend = s3_backend_factory
+        self.engine.remove(HOSTED_REPO, ['already-gone'])
+        s3_backend_factory.assert_not_called()
+        self.engine.remove(S3_ARTIFACT, [('config-data', ['a.yaml'])])
+        self.engine.remove(S3_ARTIFACT, [('config-data', ['b.yaml'])])
+        s3_backend_factory.assert_called_once_with()
+        self.assertEqual(2, self.s3_backend.delete_objects.call_count)
+
+    def test_delete_with_cray_cli(self):
+        """Test that S3 deletions use the cray CLI when it is the S3 backend."""
+        commands = []
+
+        async def run_cray(*args):
+            commands.append(args)
+            return 0, ''
+
+        self.engine.s3_backend = CrayCliS3Backend()
+        self.engine.ims_client = NonCallableMock()
+        patch.object(self.engine, '_run_cray', run_cray).start()
+        image = ('image', 'image-id', [('boot-images', 'image-id/rootfs')])
+        self.assertEqual([], self.engine.remove(IMS_IMAGE, [image]))
+        self.assertEqual([('artifacts', 'delete', 'boot-images', 'image-id/rootfs')], commands)
+
+    def test_delete_ims_objects(self):
+        """Test that IMS records are deleted with the IMS client after their S3 objects."""
+        ims_client = NonCallableMock()
+        ims_client.delete_record.side_effect = [True, False]
+        ims_client_factory = Mock(return_value=ims_client)
+        self.engine.ims_client = ims_client_factory
+        self.s3_backend.batch_size = 1000
+        self.assertEqual([], self.engine.remove(IMS_IMAGE, [
+            ('image', 'image-id', [('boot-images', 'image-id/rootfs'), ('boot-images', 'image-id/manifest.json')]),
+        ]))
+        self.assertEqual([], self.engine.remove(IMS_RECIPE, [
+            ('recipe', 'recipe-id', [('ims', 'recipe-id/recipe.tgz')]),
+        ]))
+        self.assertEqual([call('boot-images', ['image-id/rootfs', 'image-id/manifest.json']),
+                          call('ims', ['recipe-id/recipe.tgz'])],
+                         self.s3_backend.delete_objects.call_args_list)
+        self.assertEqual([call(IMS_IMAGES, 'image-id'), call(IMS_RECIPES, 'recipe-id')],
+                         ims_client.delete_record.call_args_list)
+        ims_client_factory.assert_called_once_with()
+
+    def test_ims_object_not_deleted_when_s3_fails(self):
+        """Test that an IMS record is kept if its S3 objects could not be removed."""
+        self.engine.ims_client = NonCallableMock()
+        self.s3_backend.batch_size = 1000
+        self.s3_backend.delete_objects.side_effect = ProductInstallException('access denied')
+        image = ('image', 'image-id', [('boot-images', 'image-id/rootfs')])
+        failures = self.engine.remove(IMS_IMAGE, [image])
+        self.assertIn('access denied', str(failures[0][1]))
+        self.engine.ims_client.delete_record.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.catalog module.
+"""
+
+import unittest
+
+from product_deletion_utility.components.catalog import CatalogDocuments, component_tokens, merge_versions
+from product_deletion_utility.components.exceptions import ProductInstallException
+
+
+class MockProduct():
+    """A product version with the component attributes of InstalledProductVersion."""
+    def __init__(self, name, version, data):
+        self.name = name
+        self.version = version
+        components = data.get('component_versions', {})
+        self.docker_images = [(image['name'], image['version']) for image in components.get('docker', [])]
+        self.s3_artifacts = [(artifact['bucket'], artifact['key']) for artifact in components.get('s3', [])]
+        self.helm_charts = []
+        self.recipes = []
+        self.images = []
+        self.hosted_repositories = []
+
+
+COS_DOCUMENT = """
+2.5.1:
+  component_versions:
+    docker:
+    - name: cray/cos-base
+      version: 1.0.0
+    s3:
+    - bucket: boot-images
+      key: cos/2.5.1/kernel
+2.5.2:
+  component_versions:
+    docker:
+    - name: cray/cos-base
+      version: 1.0.1
+"""
+
+SAT_DOCUMENT = """
+2.6.1:
+  component_versions:
+    docker:
+    - name: cray/cos-base
+      version: 1.0.0
+"""
+
+UAN_DOCUMENT = """
+2.7.0:
+  component_versions:
+    docker:
+    - name: cray/uan
+      version: 2.7.0
+"""
+
+
+class TestCatalogDocuments(unittest.TestCase):
+    """Tests for CatalogDocuments."""
+
+    def setUp(self):
+        # The uan entry is not valid YAML, so parsing it would fail.
+        self.catalog = CatalogDocuments(
+            {'cos': COS_DOCUMENT, 'sat': SAT_DOCUMENT, 'uan': UAN_DOCUMENT + '  - ]'}, MockProduct)
+
+    def test_product_versions(self):
+        """Test that only the entry of the requested product is parsed."""
+        versions = self.catalog.product_versions('cos')
+        self.assertEqual(['2.5.1', '2.5.2'], [product.version for product in versions])
+        self.assertIs(versions, self.catalog.product_versions('cos'))
+        self.assertEqual([], self.catalog.product_versions('slingshot'))
+
+    def test_products_mentioning(self):
+        """Test that products whose entry does not mention a component are not parsed."""
+        cos = self.catalog.product_versions('cos')[0]
+        tokens = component_tokens([cos])
+        self.assertEqual({'cray/cos-base', 'cos/2.5.1/kernel'}, tokens)
+        self.assertEqual(
+            [('cos', '2.5.1'), ('cos', '2.5.2'), ('sat', '2.6.1')],
+            [(product.name, product.version) for product in self.catalog.products_mentioning(tokens)]
+        )
+
+    def test_escaped_name(self):
+        """Test that a product writing a shared image name with escapes is parsed and found."""
+        escaped = SAT_DOCUMENT.replace('name: cray/cos-base', 'name: "cray/cos\\x2Dbase"')
+        unrelated = UAN_DOCUMENT.replace('name: cray/uan', 'name: "cray/u\\x61n"')
+        catalog = CatalogDocuments({'cos': COS_DOCUMENT, 'sat': escaped, 'uan': unrelated}, MockProduct)
+        self.assertEqual([('cray/cos-base', '1.0.0')], catalog.product_versions('sat')[0].docker_images)
+        self.assertEqual(
+            ['cos', 'cos', 'sat'],
+            [product.name for product in catalog.products_mentioning({'cray/cos-base', 'cos/2.5.1/kernel'})]
+        )
+
+    def test_folded_key(self):
+        """Test that an S3 key folded over several lines is found when the key contains whitespace."""
+        owner = COS_DOCUMENT.replace('key: cos/2.5.1/kernel', 'key: cos/2.5.1/boot kernel')
+        folded = (SAT_DOCUMENT +
+                  '    s3:\n    - bucket: boot-images\n      key: >-\n        cos/2.5.1/boot\n        kernel\n')
+        catalog = CatalogDocuments({'cos': owner, 'sat': folded, 'uan': UAN_DOCUMENT}, MockProduct)
+        self.assertEqual(
+            ['cos', 'cos', 'sat'],
+            [product.name for product in catalog.products_mentioning({'cos/2.5.1/boot kernel'})]
+        )
+
+    def test_invalid_document(self):
+        """Test that an entry which is not valid YAML is reported when it is parsed."""
+        with self.assertRaises(ProductInstallException):
+            self.catalog.products
+
+    def test_changed(self):
+        """Test that parsing a product marks the documents as changed."""
+        self.catalog.changed = False
+        self.catalog.product_versions('sat')
+        self.assertTrue(self.catalog.changed)
+        self.catalog.changed = False
+        self.catalog.product_versions('sat')
+        self.assertFalse(self.catalog.changed)
+
+    def test_updated(self):
+        """Test that only the products which changed are parsed again."""
+        cos = self.catalog.product_versions('cos')
+        sat = self.catalog.product_versions('sat')
+        catalog, changed = self.catalog.updated(
+            {'cos': COS_DOCUMENT, 'sat': SAT_DOCUMENT.replace('1.0.0', '1.0.2'), 'slingshot': UAN_DOCUMENT})
+        self.assertEqual({'sat', 'uan', 'slingshot'}, changed)
+        self.assertIs(cos, catalog.product_versions('cos'))
+        self.assertIsNot(sat, catalog.product_versions('sat'))
+        self.assertEqual([], catalog.product_versions('uan'))
+
+
+class TestSplitCatalog(unittest.TestCase):
+    """Tests for a catalog split into product-specific ConfigMaps."""
+
+    def setUp(self):
+        # The component versions of cos are in its product-specific ConfigMap.
+        self.catalog = CatalogDocuments(
+            {'cos': '2.5.1: {}\n2.5.2: {}\n', 'sat': SAT_DOCUMENT},
+            MockProduct,
+            {'cos': COS_DOCUMENT + '2.4.0: {}\n'}
+        )
+
+    def test_merge_versions(self):
+        """Test that only the versions in the catalog ConfigMap are merged."""
+        self.assertEqual({'1': {'a': 1, 'b': 2}, '2': {'b': 3}},
+                         merge_versions({'1': {'a': 1}, '2': None}, {'1': {'b': 2}, '2': {'b': 3}, '3': {}}))
+
+    def test_product_versions(self):
+        """Test that the data of the product-specific ConfigMap is merged."""
+        versions = self.catalog.product_versions('cos')
+        self.assertEqual(['2.5.1', '2.5.2'], [product.version for product in versions])
+        self.assertEqual([('cray/cos-base', '1.0.0')], versions[0].docker_images)
+        self.assertEqual(['cos', 'cos', 'sat'], [product.name for product in self.catalog.products_mentioning(
+            ['cray/cos-base'])])
+
+    def test_updated(self):
+        """Test that a change to a product-specific ConfigMap changes only its product."""
+        self.catalog.products
+        catalog, changed = self.catalog.updated(
+            {'cos': '2.5.1: {}\n2.5.2: {}\n', 'sat': SAT_DOCUMENT}, {'cos': COS_DOCUMENT})
+        self.assertEqual({'cos'}, changed)
+        self.assertIs(self.catalog.product_versions('sat'), catalog.product_versions('sat'))
+
+
+if __name__ == '__main__':
+    unittest.main()
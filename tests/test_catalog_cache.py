@@ -0,0 +1,99 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.catalog_cache module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from product_deletion_utility.components.catalog import CatalogDocuments
+from product_deletion_utility.components.catalog_cache import CatalogSnapshotCache
+
+
+class Product():
+    """A picklable stand-in for InstalledProductVersion."""
+    def __init__(self, name, version, data=None):
+        self.name = name
+        self.version = version
+        self.data = data
+
+
+class TestCatalogSnapshotCache(unittest.TestCase):
+    """Tests for CatalogSnapshotCache."""
+
+    def setUp(self):
+        """Create a cache in a directory which does not exist yet."""
+        self.parent_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.parent_dir, 'catalog-cache')
+        self.cache = CatalogSnapshotCache(self.cache_dir, 'cray-product-catalog', 'services')
+
+    def tearDown(self):
+        """Remove the cache directory."""
+        shutil.rmtree(self.parent_dir)
+
+    def test_round_trip(self):
+        """Test that a snapshot is loaded at the resourceVersion it was stored at."""
+        catalog = CatalogDocuments({'cos': '2.5.1: {}\n', 'sat': '2.6.1: {}\n'}, Product)
+        catalog.product_versions('cos')
+        self.cache.store('1234', catalog)
+        products = self.cache.load('1234').products
+        self.assertEqual([('cos', '2.5.1'), ('sat', '2.6.1')], [(p.name, p.version) for p in products])
+        self.assertEqual(0o600, os.stat(self.cache.path).st_mode & 0o777)
+        self.assertEqual(0o700, os.stat(self.cache_dir).st_mode & 0o777)
+
+    def test_changed_resource_version(self):
+        """Test that a snapshot is not used once the ConfigMap has changed."""
+        self.cache.store('1234', [Product('cos', '2.5.1')])
+        self.assertIsNone(self.cache.load('1235'))
+
+    def test_missing(self):
+        """Test that there is no snapshot before one is stored."""
+        self.assertIsNone(self.cache.load('1234'))
+
+    def test_corrupt(self):
+        """Test that a truncated snapshot is ignored."""
+        self.cache.store('1234', [Product('cos', '2.5.1')])
+        with open(self.cache.path, 'r+b') as f:
+            f.truncate(10)
+        self.assertIsNone(self.cache.load('1234'))
+
+    def test_writable_by_others(self):
+        """Test that a snapshot other users could have modified is not unpickled."""
+        self.cache.store('1234', [Product('cos', '2.5.1')])
+        os.chmod(self.cache.path, 0o666)
+        self.assertIsNone(self.cache.load('1234'))
+
+    def test_store_failure(self):
+        """Test that failing to store a snapshot is not an error."""
+        with open(self.cache_dir, 'w'):
+            pass
+        self.cache.store('1234', [Product('cos', '2.5.1')])
+        self.assertIsNone(self.cache.load('1234'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,290 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.delete module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from cray_product_catalog.query import InstalledProductVersion
+
+from product_deletion_utility.components.catalog import CatalogDocuments
+from product_deletion_utility.components.delete import CatalogWatcher, DeleteProductComponent, GarbageCollector
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.journal import DeletionJournal
+from product_deletion_utility.components.ownership import HELM_CHART, HOSTED_REPO, S3_ARTIFACT
+
+COS_DOCUMENT = """
+2.5.1:
+  component_versions:
+    helm:
+    - name: cos-config-service
+      version: 1.0.0
+    repositories:
+    - name: cos-2.5-sle-15sp2
+      type: hosted
+    - name: cos-2.5.1-sle-15sp2
+      type: hosted
+    - name: shasta-firmware
+      type: hosted
+    s3:
+    - bucket: boot-images
+      key: cos/shared/kernel
+    - bucket: boot-images
+      key: cos/2.5.1/initrd
+2.5.2:
+  component_versions:
+    helm:
+    - name: cos-config-service
+      version: 1.1.0
+    repositories:
+    - name: cos-2.5-sle-15sp2
+      type: hosted
+    - name: cos-2.5.2-sle-15sp2
+      type: hosted
+    s3:
+    - bucket: boot-images
+      key: cos/shared/kernel
+    - bucket: boot-images
+      key: cos/2.5.2/initrd
+"""
+
+SAT_DOCUMENT = """
+2.4.0:
+  component_versions:
+    repositories:
+    - name: shasta-firmware
+      type: hosted
+"""
+
+CATALOG_DATA = {'cos': COS_DOCUMENT, 'sat': SAT_DOCUMENT}
+
+# The labels of the product-specific ConfigMaps of a split catalog.
+SPLIT_LABELS = {'type': 'cray-product-catalog'}
+
+
+def configmap(name, data, resource_version, labels=None):
+    """Create a ConfigMap as returned by the Kubernetes API."""
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name, labels=labels, resource_version=resource_version), data=data)
+
+
+class TestDeleteProductComponent(unittest.TestCase):
+    """Tests for DeleteProductComponent with mocked backends."""
+
+    def setUp(self):
+        """Mock the clients of the backends."""
+        self.clients = Mock(nexus_url='https://packages.local', docker_url='https://registry.local',
+                            s3_batch_size=1000)
+        self.clients.nexus_rest_client.list_repositories.return_value = {
+            'cos-2.5-sle-15sp2', 'cos-2.5.1-sle-15sp2', 'cos-2.5.2-sle-15sp2', 'shasta-firmware'
+        }
+        self.uninstall_component = self.clients.uninstall_component
+
+    def deletion(self, product_versions, **kwargs):
+        """Create a DeleteProductComponent for product versions in the mocked catalog."""
+        return DeleteProductComponent(
+            product_versions=product_versions, clients=self.clients,
+            catalog_documents=CatalogDocuments(CATALOG_DATA, InstalledProductVersion), **kwargs
+        )
+
+    def test_shared_within_batch_removed_once(self):
+        """Test that a component of several product versions in a batch is removed once."""
+        deletion = self.deletion([('cos', '2.5.1'), ('cos', '2.5.2')])
+        deletion.remove_product_hosted_repos()
+        deletion.remove_product_S3_artifacts()
+
+        removed_repos = [args[0] for args, _ in self.uninstall_component.uninstall_hosted_repos.call_args_list]
+        self.assertEqual(['cos-2.5-sle-15sp2', 'cos-2.5.1-sle-15sp2', 'cos-2.5.2-sle-15sp2'],
+                         sorted(removed_repos))
+        self.uninstall_component.uninstall_S3_artifacts.assert_called_once()
+        bucket, keys = self.uninstall_component.uninstall_S3_artifacts.call_args[0]
+        self.assertEqual('boot-images', bucket)
+        self.assertEqual(['cos/2.5.1/initrd', 'cos/2.5.2/initrd', 'cos/shared/kernel'], sorted(keys))
+
+    def test_shared_outside_batch_kept(self):
+        """Test that a component of a product version outside the batch is kept."""
+        deletion = self.deletion([('cos', '2.5.1')])
+        deletion.remove_product_hosted_repos()
+
+        self.uninstall_component.uninstall_hosted_repos.assert_called_once_with(
+            'cos-2.5.1-sle-15sp2', self.clients.nexus_api)
+
+    def test_resume_skips_journaled_items(self):
+        """Test that a resumed deletion only removes the items a previous run did not."""
+        journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, journal_dir)
+        path = os.path.join(journal_dir, 'cos.jsonl')
+
+        def fail_repo(repo_name, nexus_api):
+            if repo_name == 'cos-2.5.1-sle-15sp2':
+                raise ProductInstallException(f'Failed to remove {repo_name}')
+        self.uninstall_component.uninstall_hosted_repos.side_effect = fail_repo
+        journal = DeletionJournal(path)
+        with self.assertRaises(ProductInstallException):
+            self.deletion([('cos', '2.5.1'), ('cos', '2.5.2')], journal=journal).remove_product_hosted_repos()
+        journal.close()
+        self.assertEqual(3, self.uninstall_component.uninstall_hosted_repos.call_count)
+
+        self.uninstall_component.uninstall_hosted_repos.reset_mock(side_effect=True)
+        journal = DeletionJournal(path, resume=True)
+        self.deletion([('cos', '2.5.1'), ('cos', '2.5.2')], journal=journal).remove_product_hosted_repos()
+        journal.close()
+        self.uninstall_component.uninstall_hosted_repos.assert_called_once_with(
+            'cos-2.5.1-sle-15sp2', self.clients.nexus_api)
+
+
+class TestGarbageCollector(unittest.TestCase):
+    """Tests for GarbageCollector with mocked backends."""
+
+    def setUp(self):
+        """Mock the clients of the backends."""
+        self.clients = Mock(nexus_url='https://packages.local', docker_url='https://registry.local',
+                            s3_batch_size=1000)
+
+    def collector(self):
+        """Create a GarbageCollector which only reports orphans in the mocked catalog."""
+        return GarbageCollector(clients=self.clients,
+                                catalog_documents=CatalogDocuments(CATALOG_DATA, InstalledProductVersion))
+
+    def test_s3_scoped_to_owned_directories(self):
+        """Test that only the objects in the directories of owned objects are reported."""
+        self.clients.uninstall_component.s3_backend.list_keys.return_value = [
+            'cos/2.5.0/kernel',
+            'cos/2.5.1/initrd',
+            'cos/2.5.1/extra/initrd',
+            'cos/2.5.1/rootfs',
+            'cos/shared/kernel',
+            'cos.yaml',
+        ]
+        collector = self.collector()
+        collector.collect_s3_artifacts()
+
+        self.clients.uninstall_component.s3_backend.list_keys.assert_called_once_with('boot-images')
+        self.assertEqual([['boot-images', 'cos/2.5.1/rootfs']],
+                         collector.report.to_dict()['orphans'][S3_ARTIFACT])
+        self.clients.uninstall_component.uninstall_S3_artifacts.assert_not_called()
+
+    def test_helm_charts_scoped_to_owned_names(self):
+        """Test that only the versions of charts owned by a product version are reported."""
+        self.clients.nexus_api.components.list.return_value = SimpleNamespace(
+            components=[
+                SimpleNamespace(name='cos-config-service', version='1.0.0', id='a'),
+                SimpleNamespace(name='cos-config-service', version='0.9.0', id='b'),
+                SimpleNamespace(name='site-chart', version='1.0.0', id='c'),
+            ],
+            continuation_token=None
+        )
+        collector = self.collector()
+        collector.collect_helm_charts()
+
+        self.assertEqual([['cos-config-service', '0.9.0']],
+                         collector.report.to_dict()['orphans'][HELM_CHART])
+        self.clients.uninstall_component.uninstall_helm_charts.assert_not_called()
+
+
+class TestCatalogWatcher(unittest.TestCase):
+    """Tests for CatalogWatcher with a mocked Kubernetes API."""
+
+    def setUp(self):
+        """Read a split catalog whose cos entry is kept in a product-specific ConfigMap."""
+        self.configmaps = [
+            configmap('cray-product-catalog', {'cos': '2.5.1: {}\n2.5.2: {}\n', 'sat': SAT_DOCUMENT}, '10'),
+            configmap('cray-product-catalog-cos', {'cos': COS_DOCUMENT}, '11', SPLIT_LABELS),
+            configmap('cray-product-catalog-backup', {'cos': '2.5.0: {}\n'}, '12'),
+        ]
+        self.k8s_client = Mock()
+        self.k8s_client.list_namespaced_config_map.side_effect = self.list_configmaps
+        self.watcher = CatalogWatcher(self.k8s_client)
+        self.watcher._reload()
+
+    def list_configmaps(self, namespace, field_selector=None, label_selector=None):
+        """List the ConfigMaps matching a name or label selector."""
+        if field_selector:
+            items = [item for item in self.configmaps if f'metadata.name={item.metadata.name}' == field_selector]
+        else:
+            key, _, value = label_selector.partition('=')
+            items = [item for item in self.configmaps if (item.metadata.labels or {}).get(key) == value]
+        return SimpleNamespace(items=items, metadata=SimpleNamespace(resource_version='12'))
+
+    def watch_events(self, index, *events):
+        """Apply watch events of the ConfigMaps selected by one of the watches."""
+        with patch('product_deletion_utility.components.delete.Watch') as mock_watch:
+            mock_watch.return_value.stream.return_value = iter(events)
+            self.watcher._watch_once(index)
+        return mock_watch.return_value.stream.call_args
+
+    def repo_owners(self, ownership_index, repo_name):
+        """Get the names and versions of the owners of a hosted repository."""
+        return sorted(str(product) for product in ownership_index.owners(HOSTED_REPO, (repo_name, 'hosted')))
+
+    def test_split_catalog(self):
+        """Test that only the catalog and its labelled product ConfigMaps are read."""
+        documents, ownership_index, resource_version = self.watcher.snapshot()
+        self.assertEqual(['2.5.1', '2.5.2'], [product.version for product in documents.product_versions('cos')])
+        self.assertEqual(['cos-2.5.1', 'sat-2.4.0'], self.repo_owners(ownership_index, 'shasta-firmware'))
+        self.assertEqual('12', resource_version)
+        self.assertEqual(
+            [{'field_selector': 'metadata.name=cray-product-catalog'},
+             {'label_selector': 'type=cray-product-catalog'}],
+            [kwargs for _, kwargs in self.k8s_client.list_namespaced_config_map.call_args_list]
+        )
+        self.assertFalse(self.watcher._is_catalog_configmap(self.configmaps[2]))
+
+    def test_modified_reindexes_changed_product(self):
+        """Test that a modified product ConfigMap parses and re-indexes only its product."""
+        old_documents, old_index, _ = self.watcher.snapshot()
+        modified = configmap('cray-product-catalog-cos', {'cos': COS_DOCUMENT.replace(
+            '    - name: shasta-firmware\n      type: hosted\n', '')}, '13', SPLIT_LABELS)
+        watch_call = self.watch_events(1, {'type': 'MODIFIED', 'object': modified})
+        self.assertEqual('type=cray-product-catalog', watch_call[1]['label_selector'])
+
+        documents, ownership_index, resource_version = self.watcher.snapshot()
+        self.assertEqual('13', resource_version)
+        # The unchanged product is not parsed again.
+        self.assertIs(old_documents.product_versions('sat')[0], documents.product_versions('sat')[0])
+        self.assertIsNot(old_documents.product_versions('cos')[0], documents.product_versions('cos')[0])
+        self.assertEqual(['sat-2.4.0'], self.repo_owners(ownership_index, 'shasta-firmware'))
+        self.assertEqual(['cos-2.5.2'], self.repo_owners(ownership_index, 'cos-2.5.2-sle-15sp2'))
+        # The index of the earlier snapshot is not changed.
+        self.assertEqual(['cos-2.5.1', 'sat-2.4.0'], self.repo_owners(old_index, 'shasta-firmware'))
+
+    def test_deleted_reindexes_changed_product(self):
+        """Test that a deleted product ConfigMap removes the components of only its product."""
+        deleted = configmap('cray-product-catalog-cos', {'cos': COS_DOCUMENT}, '13', SPLIT_LABELS)
+        self.watch_events(1, {'type': 'DELETED', 'object': deleted})
+
+        documents, ownership_index, _ = self.watcher.snapshot()
+        self.assertEqual(['2.5.1', '2.5.2'], [product.version for product in documents.product_versions('cos')])
+        self.assertEqual(['sat-2.4.0'], self.repo_owners(ownership_index, 'shasta-firmware'))
+        self.assertEqual([], self.repo_owners(ownership_index, 'cos-2.5-sle-15sp2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
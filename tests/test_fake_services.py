@@ -0,0 +1,201 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the benchmarks.fake_services and benchmarks.synthetic modules.
+
+The stand-ins are exercised with the clients the deletion utility uses, so
+the benchmark measures the same requests as a deletion against real services.
+"""
+
+from datetime import datetime, timezone
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import requests
+import yaml
+
+from benchmarks.fake_services import (
+    FakeApiGateway,
+    FakeNexus,
+    FakeRegistry,
+    FakeS3,
+    FaultProfile,
+    percentile,
+)
+from benchmarks.synthetic import synthetic_catalog
+from product_deletion_utility.components.nexus import NEXUS_CHARTS_REPOSITORY, NexusRestClient
+from product_deletion_utility.components.registry import RegistryClient
+from product_deletion_utility.components.s3 import ClientS3Backend
+
+
+class TestFakeRegistry(unittest.TestCase):
+    """Tests for FakeRegistry with RegistryClient."""
+
+    def setUp(self):
+        self.registry = FakeRegistry(page_size=2).start()
+        self.client = RegistryClient(self.registry.url)
+
+    def tearDown(self):
+        self.registry.stop()
+
+    def test_resolve_and_delete(self):
+        """Test that deleting a manifest removes every tag pointing to it."""
+        self.registry.add_image('cray/app', '1.0')
+        self.registry.add_image('cray/app', 'latest', self.registry.images['cray/app']['1.0'])
+        self.registry.add_image('cray/app', '2.0')
+        digest = self.client.resolve_digest('cray/app', '1.0')
+        self.client.delete_manifest('cray/app', digest)
+        self.assertEqual(['2.0'], list(self.client.list_tags('cray/app')))
+        self.assertIsNone(self.client.resolve_digest('cray/app', 'latest'))
+        self.assertEqual(1, self.registry.calls[('DELETE', 'delete-manifest')])
+
+    def test_list_tags_pages(self):
+        """Test that tags are listed a page at a time."""
+        for tag in ('1', '2', '3', '4', '5'):
+            self.registry.add_image('cray/app', tag)
+        self.assertEqual(['1', '2', '3', '4', '5'], list(self.client.list_tags('cray/app')))
+        self.assertEqual(3, self.registry.calls[('GET', 'tags')])
+
+
+class TestFakeNexus(unittest.TestCase):
+    """Tests for FakeNexus with NexusRestClient."""
+
+    def setUp(self):
+        self.nexus = FakeNexus(page_size=2).start()
+        self.client = NexusRestClient(self.nexus.url)
+        self.nexus.add_repository(NEXUS_CHARTS_REPOSITORY, 'hosted', 'helm')
+
+    def tearDown(self):
+        self.nexus.stop()
+
+    def test_search_and_size(self):
+        """Test searching for charts and summing the sizes of a repository over several pages."""
+        chart_id = self.nexus.add_component(NEXUS_CHARTS_REPOSITORY, 'cray-app', '1.0', size=10)
+        for version in ('2.0', '3.0', '4.0'):
+            self.nexus.add_component(NEXUS_CHARTS_REPOSITORY, 'cray-app', version, size=10)
+        self.assertEqual({('cray-app', '1.0'): [chart_id]},
+                         self.client.search_chart_components([('cray-app', '1.0'), ('cray-app', '5.0')]))
+        self.assertEqual(40, self.client.repository_size(NEXUS_CHARTS_REPOSITORY))
+        self.assertEqual(2, self.nexus.calls[('GET', 'assets')])
+
+    def test_delete_repository(self):
+        """Test that a removed repository is no longer listed."""
+        self.nexus.add_repository('cos-1.0-sle-15sp4')
+        self.assertEqual(204, requests.delete(
+            f'{self.nexus.url}/service/rest/v1/repositories/cos-1.0-sle-15sp4').status_code)
+        self.assertEqual({NEXUS_CHARTS_REPOSITORY}, self.client.list_repositories())
+
+
+class TestFakeS3(unittest.TestCase):
+    """Tests for FakeS3 and the STS token route of FakeApiGateway with ClientS3Backend."""
+
+    def setUp(self):
+        self.s3 = FakeS3(page_size=2).start()
+        self.gateway = FakeApiGateway(self.s3.url).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.credentials_file = os.path.join(self.directory.name, 'credentials.json')
+        with open(self.credentials_file, 'w') as f:
+            json.dump({'access_token': 'token'}, f)
+
+    def tearDown(self):
+        self.s3.stop()
+        self.gateway.stop()
+        self.directory.cleanup()
+
+    def test_list_and_delete(self):
+        """Test listing and deleting objects with credentials from STS."""
+        for key in ('a', 'b', 'c', 'd', 'e'):
+            self.s3.add_object('boot-images', key)
+        backend = ClientS3Backend.from_sts(self.gateway.url, 2, self.credentials_file)
+        self.assertEqual(['a', 'b', 'c', 'd', 'e'], list(backend.list_keys('boot-images')))
+        backend.delete_objects('boot-images', ['a', 'c', 'missing'])
+        self.assertEqual({'b', 'd', 'e'}, set(self.s3.buckets['boot-images']))
+        self.assertEqual(3, self.s3.calls[('GET', 'list-objects')])
+        self.assertEqual(1, self.gateway.calls[('PUT', 'sts-token')])
+
+    def test_credentials_renewed(self):
+        """Test that STS credentials about to expire are renewed before a request."""
+        self.s3.add_object('boot-images', 'a')
+        self.gateway.sts_expiration = datetime.fromtimestamp(time.time() + 60, timezone.utc).isoformat()
+        backend = ClientS3Backend.from_sts(self.gateway.url, 2, self.credentials_file)
+        self.assertEqual(1, self.gateway.calls[('PUT', 'sts-token')])
+        self.gateway.sts_expiration = '2099-01-01T00:00:00Z'
+        self.assertEqual(['a'], list(backend.list_keys('boot-images')))
+        self.assertEqual(['a'], list(backend.list_keys('boot-images')))
+        self.assertEqual(2, self.gateway.calls[('PUT', 'sts-token')])
+
+
+class TestFaultProfile(unittest.TestCase):
+    """Tests for FaultProfile."""
+
+    def test_throttled(self):
+        """Test that throttled requests are answered with 429 and a Retry-After header."""
+        gateway = FakeApiGateway('http://s3', FaultProfile(throttle_rate=1.0, retry_after=3)).start()
+        try:
+            response = requests.get(f'{gateway.url}/apis/ims/v3/images')
+        finally:
+            gateway.stop()
+        self.assertEqual(429, response.status_code)
+        self.assertEqual('3', response.headers['Retry-After'])
+        self.assertEqual({('GET', 'list-images', 429): 1}, dict(gateway.statuses))
+
+    def test_repeatable(self):
+        """Test that the same seed fails the same requests."""
+        profiles = [FaultProfile(error_rate=0.3, throttle_rate=0.3, seed=1) for _ in range(2)]
+        draws = [[profile.draw() for _ in range(20)] for profile in profiles]
+        self.assertEqual(draws[0], draws[1])
+        self.assertEqual({None, 429, 503}, {failure for _, failure in draws[0]})
+
+    def test_percentile(self):
+        """Test the nearest rank percentiles."""
+        samples = list(range(1, 101))
+        self.assertEqual(50, percentile(samples, 0.5))
+        self.assertEqual(99, percentile(samples, 0.99))
+        self.assertEqual(0.0, percentile([], 0.5))
+
+
+class TestSyntheticCatalog(unittest.TestCase):
+    """Tests for synthetic_catalog."""
+
+    def test_share_ratio(self):
+        """Test that a share of the components of each version comes from the common pool."""
+        catalog = synthetic_catalog(products=3, components=10, share_ratio=0.5, versions=2)
+        self.assertEqual(['product-0000', 'product-0001', 'product-0002'], sorted(catalog))
+        versions = yaml.safe_load(catalog['product-0001'])
+        self.assertEqual(['1.0.0', '2.0.0'], sorted(versions))
+        docker = versions['2.0.0']['component_versions']['docker']
+        self.assertEqual(6, len(docker))
+        self.assertEqual(3, sum(image['name'].startswith('cray/platform-') for image in docker))
+
+    def test_repeatable(self):
+        """Test that the same seed creates the same catalog."""
+        self.assertEqual(synthetic_catalog(2, 10, seed=4), synthetic_catalog(2, 10, seed=4))
+        self.assertNotEqual(synthetic_catalog(2, 10, seed=4), synthetic_catalog(2, 10, seed=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.gc module.
+"""
+
+import json
+import unittest
+
+from product_deletion_utility.components.gc import (
+    OrphanReport,
+    catalog_components,
+    find_orphans,
+    is_product_repository,
+    s3_key_directory,
+    s3_scopes,
+)
+from product_deletion_utility.components.ownership import (
+    DOCKER_IMAGE,
+    HOSTED_REPO,
+    LOFTSMAN_MANIFEST,
+    S3_ARTIFACT,
+)
+
+
+class MockProduct():
+    """A product version with the component attributes of InstalledProductVersion."""
+    def __init__(self, name, version, docker_images=(), loftsman_manifests=()):
+        self.name = name
+        self.version = version
+        self.docker_images = list(docker_images)
+        self.loftsman_manifests = list(loftsman_manifests)
+
+
+class TestGarbageCollection(unittest.TestCase):
+    """Tests for the garbage collection helpers."""
+
+    def test_catalog_components(self):
+        """Test that components of every product version are collected by type."""
+        products = [
+            MockProduct('cos', '2.5.1', docker_images=[('cray/cos', '2.5.1')],
+                        loftsman_manifests=['config-data/argo/loftsman/cos/2.5.1/manifests/cos.yaml']),
+            MockProduct('sma', '1.8.3', docker_images=[('cray/cos', '2.5.1'), ('cray/sma', '1.8.3')]),
+        ]
+        self.assertEqual({('cray/cos', '2.5.1'), ('cray/sma', '1.8.3')},
+                         catalog_components(products, DOCKER_IMAGE))
+        self.assertEqual({('config-data', 'argo/loftsman/cos/2.5.1/manifests/cos.yaml')},
+                         catalog_components(products, LOFTSMAN_MANIFEST))
+
+    def test_find_orphans(self):
+        """Test that a streamed inventory is consumed once and only orphans are kept."""
+        inventory = iter([('cray/cos', '2.5.0'), ('cray/cos', '2.5.1')])
+        self.assertEqual([('cray/cos', '2.5.0')], find_orphans(inventory, {('cray/cos', '2.5.1')}))
+
+    def test_s3_scopes(self):
+        """Test that only the directories of owned keys are searched."""
+        self.assertEqual(
+            {'boot-images': frozenset({'cos/2.5.1/', 'cos/2.5.0/'}),
+             'config-data': frozenset({'argo/loftsman/cos/2.5.1/'})},
+            s3_scopes([('boot-images', 'cos/2.5.1/initrd'), ('boot-images', 'cos/2.5.0/initrd'),
+                       ('boot-images', 'kernel'), ('config-data', 'argo/loftsman/cos/2.5.1/cos.yaml')])
+        )
+
+    def test_s3_key_directory(self):
+        """Test that an unrelated key sharing the top-level prefix of an owned key is out of scope."""
+        scopes = s3_scopes([('config-data', 'argo/loftsman/cos/2.5.1/cos.yaml'), ('boot-images', 'kernel')])
+        self.assertIn(s3_key_directory('argo/loftsman/cos/2.5.1/orphan.yaml'), scopes['config-data'])
+        for key in ('argo/workflows/site.yaml', 'argo/loftsman/cos/2.5.1/nested/site.yaml', 'argo.yaml'):
+            self.assertNotIn(s3_key_directory(key), scopes['config-data'])
+        self.assertNotIn('boot-images', scopes)
+        self.assertIsNone(s3_key_directory('kernel-old'))
+
+    def test_is_product_repository(self):
+        """Test that only hosted repositories named after a product are candidates."""
+        self.assertTrue(is_product_repository({'name': 'cos-2.5.0-sle-15sp4', 'type': 'hosted'}, ['cos']))
+        self.assertFalse(is_product_repository({'name': 'cos-sle-15sp4', 'type': 'group'}, ['cos']))
+        self.assertFalse(is_product_repository({'name': 'cosmos-1.0', 'type': 'hosted'}, ['cos']))
+        self.assertFalse(is_product_repository({'name': 'charts', 'type': 'hosted'}, ['cos']))
+
+    def test_report(self):
+        """Test the JSON report of orphans."""
+        report = OrphanReport()
+        report.add(DOCKER_IMAGE, [('cray/cos', '2.5.0')])
+        report.add(HOSTED_REPO, ['cos-2.5.0-sle-15sp4'])
+        report.add(S3_ARTIFACT, [])
+        self.assertEqual({
+            'removed': False,
+            'counts': {DOCKER_IMAGE: 1, HOSTED_REPO: 1, S3_ARTIFACT: 0},
+            'orphans': {DOCKER_IMAGE: [['cray/cos', '2.5.0']], HOSTED_REPO: ['cos-2.5.0-sle-15sp4'],
+                        S3_ARTIFACT: []},
+        }, json.loads(report.to_json()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.ims module.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+
+from benchmarks.fake_services import FakeApiGateway
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ims import (
+    IMS_IMAGES,
+    IMS_RECIPES,
+    ImsClient,
+    ims_api_url,
+    parse_s3_link,
+)
+
+
+class TestHelpers(unittest.TestCase):
+    """Tests for ims_api_url() and parse_s3_link()."""
+
+    def test_ims_api_url(self):
+        """Test that the IMS path is appended to the API gateway URL once."""
+        self.assertEqual('https://api-gw/apis/ims/v3', ims_api_url('https://api-gw/'))
+        self.assertEqual('https://api-gw/apis/ims/v3', ims_api_url('https://api-gw/apis/ims/v3'))
+
+    def test_parse_s3_link(self):
+        """Test that only S3 links with a bucket and key are parsed."""
+        self.assertEqual(('boot-images', 'id/manifest.json'),
+                         parse_s3_link({'type': 's3', 'path': 's3://boot-images/id/manifest.json'}))
+        self.assertIsNone(parse_s3_link({'type': 'http', 'path': 'https://example.com/a'}))
+        self.assertIsNone(parse_s3_link({'type': 's3', 'path': 's3://boot-images'}))
+        self.assertIsNone(parse_s3_link(None))
+
+
+class TestImsClient(unittest.TestCase):
+    """Tests for ImsClient."""
+
+    def setUp(self):
+        self.gateway = FakeApiGateway('http://s3').start()
+        self.directory = tempfile.TemporaryDirectory()
+        credentials_file = os.path.join(self.directory.name, 'credentials.json')
+        with open(credentials_file, 'w') as f:
+            json.dump({'access_token': 'token'}, f)
+        self.client = ImsClient(self.gateway.url, credentials_file=credentials_file)
+        self.objects = {}
+
+    def tearDown(self):
+        self.gateway.stop()
+        self.directory.cleanup()
+
+    def read_object(self, bucket, key):
+        return self.objects.get((bucket, key))
+
+    def test_delete_record(self):
+        """Test that deleting a record which does not exist is not an error."""
+        self.gateway.add_ims_record(IMS_RECIPES, 'recipe-id', 'recipe')
+        self.assertTrue(self.client.delete_record(IMS_RECIPES, 'recipe-id'))
+        self.assertFalse(self.client.delete_record(IMS_RECIPES, 'recipe-id'))
+        self.assertEqual({}, self.gateway.ims[IMS_RECIPES])
+
+    def test_unauthenticated(self):
+        """Test that a rejected request is an error."""
+        client = ImsClient(self.gateway.url, session=requests.Session())
+        with self.assertRaisesRegex(ProductInstallException, '401'):
+            client.get_record(IMS_IMAGES, 'image-id')
+
+    def test_recipe_artifacts(self):
+        """Test that the archive of a recipe is found from its link."""
+        self.gateway.add_ims_record(IMS_RECIPES, 'recipe-id', 'recipe', ('ims', 'recipes/recipe-id/recipe.tar.gz'))
+        self.assertEqual([('ims', 'recipes/recipe-id/recipe.tar.gz')],
+                         self.client.linked_artifacts(IMS_RECIPES, 'recipe-id', self.read_object))
+
+    def test_image_artifacts(self):
+        """Test that the artifacts of an image are found from its manifest, which is removed last."""
+        self.gateway.add_ims_record(IMS_IMAGES, 'image-id', 'image', ('boot-images', 'image-id/manifest.json'))
+        self.objects[('boot-images', 'image-id/manifest.json')] = json.dumps({'artifacts': [
+            {'link': {'type': 's3', 'path': 's3://boot-images/image-id/rootfs'}},
+            {'link': {'type': 's3', 'path': 's3://boot-images/image-id/kernel'}},
+            {'link': None},
+        ]}).encode()
+        self.assertEqual([('boot-images', 'image-id/rootfs'), ('boot-images', 'image-id/kernel'),
+                          ('boot-images', 'image-id/manifest.json')],
+                         self.client.linked_artifacts(IMS_IMAGES, 'image-id', self.read_object))
+
+    def test_unlinked_artifacts(self):
+        """Test that no artifacts are found without a link or a manifest, and None without a record."""
+        self.gateway.add_ims_record(IMS_IMAGES, 'unlinked-id', 'unlinked')
+        self.gateway.add_ims_record(IMS_IMAGES, 'image-id', 'image', ('boot-images', 'image-id/manifest.json'))
+        self.assertEqual([], self.client.linked_artifacts(IMS_IMAGES, 'unlinked-id', self.read_object))
+        self.assertEqual([], self.client.linked_artifacts(IMS_IMAGES, 'image-id', self.read_object))
+        self.assertIsNone(self.client.linked_artifacts(IMS_IMAGES, 'missing-id', self.read_object))
+
+    def test_invalid_manifest(self):
+        """Test that a manifest which is not JSON is an error."""
+        self.gateway.add_ims_record(IMS_IMAGES, 'image-id', 'image', ('boot-images', 'image-id/manifest.json'))
+        self.objects[('boot-images', 'image-id/manifest.json')] = b'not json'
+        with self.assertRaisesRegex(ProductInstallException, 'manifest of IMS image image-id'):
+            self.client.linked_artifacts(IMS_IMAGES, 'image-id', self.read_object)
+
+
+if __name__ == '__main__':
+    unittest.main()
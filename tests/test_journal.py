@@ -0,0 +1,158 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.journal module.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.journal import (
+    FAILED,
+    PENDING,
+    SUCCEEDED,
+    DeletionJournal,
+    journal_path,
+)
+from product_deletion_utility.components.ownership import DOCKER_IMAGE, IMS_IMAGE, S3_ARTIFACT
+
+
+class TestDeletionJournal(unittest.TestCase):
+    """Tests for DeletionJournal."""
+
+    def setUp(self):
+        """Create a directory for the journal."""
+        self.journal_dir = tempfile.mkdtemp()
+        self.path = journal_path(self.journal_dir, [('cos', '2.5.1'), ('sat', '2.6/1')])
+
+    def tearDown(self):
+        """Remove the journal directory."""
+        shutil.rmtree(self.journal_dir)
+
+    def read_entries(self):
+        """Read the entries written to the journal."""
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_journal_path(self):
+        """Test that the journal file name is derived from the product versions."""
+        self.assertEqual(
+            os.path.join(self.journal_dir, 'deletion-journal-cos-2.5.1_sat-2.6_1.jsonl'),
+            self.path
+        )
+
+    def test_record_results(self):
+        """Test that items are recorded as pending, then succeeded or failed."""
+        journal = DeletionJournal(self.path)
+        images = [('cray/a', '1.0'), ('cray/b', '1.0')]
+        remaining = journal.outstanding(DOCKER_IMAGE, images)
+        error = ProductInstallException('registry unavailable')
+        journal.record_results(DOCKER_IMAGE, remaining, [(remaining[1], error)])
+        journal.close()
+
+        states = [(entry['key'], entry['state']) for entry in self.read_entries()]
+        self.assertEqual([
+            (['cray/a', '1.0'], PENDING),
+            (['cray/b', '1.0'], PENDING),
+            (['cray/a', '1.0'], SUCCEEDED),
+            (['cray/b', '1.0'], FAILED),
+        ], states)
+        self.assertEqual('registry unavailable', self.read_entries()[-1]['error'])
+
+    def test_resume_skips_succeeded_items(self):
+        """Test that a resumed journal only returns the items which were not removed."""
+        journal = DeletionJournal(self.path)
+        images = journal.outstanding(DOCKER_IMAGE, [('cray/a', '1.0'), ('cray/b', '1.0')])
+        journal.record_results(DOCKER_IMAGE, images, [(images[1], ProductInstallException('x'))])
+        journal.close()
+
+        resumed = DeletionJournal(self.path, resume=True)
+        self.assertEqual(
+            [('cray/b', '1.0')],
+            resumed.outstanding(DOCKER_IMAGE, [('cray/a', '1.0'), ('cray/b', '1.0')])
+        )
+        resumed.close()
+
+    def test_resume_trims_s3_batches(self):
+        """Test that resuming only removes the S3 objects which are still outstanding."""
+        journal = DeletionJournal(self.path)
+        journal.record(S3_ARTIFACT, ['boot-images', 'a'], SUCCEEDED)
+        journal.record(S3_ARTIFACT, ['boot-images', 'c'], SUCCEEDED)
+        journal.close()
+
+        resumed = DeletionJournal(self.path, resume=True)
+        self.assertEqual(
+            [('boot-images', ['b'])],
+            resumed.outstanding(S3_ARTIFACT, [('boot-images', ['a', 'b']), ('boot-images', ['c'])])
+        )
+        resumed.close()
+
+    def test_resume_ims_items_by_id(self):
+        """Test that IMS images are identified by name and ID, not by their S3 keys."""
+        journal = DeletionJournal(self.path)
+        images = journal.outstanding(IMS_IMAGE, [('image', 'id-1', ['id-1/manifest.json'])])
+        journal.record_results(IMS_IMAGE, images, [])
+        journal.close()
+
+        resumed = DeletionJournal(self.path, resume=True)
+        self.assertEqual([], resumed.outstanding(IMS_IMAGE, [('image', 'id-1', [])]))
+        resumed.close()
+
+    def test_new_journal_replaces_previous(self):
+        """Test that a run which is not resumed starts a new journal."""
+        journal = DeletionJournal(self.path)
+        journal.record(DOCKER_IMAGE, ['cray/a', '1.0'], SUCCEEDED)
+        journal.close()
+
+        journal = DeletionJournal(self.path)
+        self.assertEqual([('cray/a', '1.0')], journal.outstanding(DOCKER_IMAGE, [('cray/a', '1.0')]))
+        journal.close()
+
+    def test_resume_ignores_truncated_line(self):
+        """Test that a line truncated by an interrupted run is ignored."""
+        journal = DeletionJournal(self.path)
+        journal.record(DOCKER_IMAGE, ['cray/a', '1.0'], SUCCEEDED)
+        journal.close()
+        with open(self.path, 'a') as f:
+            f.write('{"type": "docker_ima')
+
+        with self.assertLogs('product-deletion-utility', 'WARNING'):
+            resumed = DeletionJournal(self.path, resume=True)
+        self.assertTrue(resumed.succeeded(DOCKER_IMAGE, ['cray/a', '1.0']))
+        resumed.close()
+
+    def test_resume_without_journal(self):
+        """Test that resuming without a previous journal removes everything."""
+        with self.assertLogs('product-deletion-utility', 'WARNING'):
+            journal = DeletionJournal(self.path, resume=True)
+        self.assertEqual([('cray/a', '1.0')], journal.outstanding(DOCKER_IMAGE, [('cray/a', '1.0')]))
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
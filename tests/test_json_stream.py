@@ -0,0 +1,78 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.json_stream module.
+"""
+
+import io
+import json
+import unittest
+
+from product_deletion_utility.components.json_stream import iter_array_items
+
+
+class TestIterArrayItems(unittest.TestCase):
+    """Tests for iter_array_items()."""
+
+    def assert_items(self, document, key, expected):
+        """Assert the items parsed from a document for every chunk size."""
+        for chunk_size in (1, 2, 3, 7, 64, 65536):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    expected, list(iter_array_items(io.StringIO(document), key, chunk_size)))
+
+    def test_items(self):
+        """Test that every item of the array is returned across chunk boundaries."""
+        artifacts = [{'Key': f'{i}/rootfs', 'Size': i * 1000} for i in range(20)]
+        self.assert_items(json.dumps({'artifacts': artifacts}, indent=2), 'artifacts', artifacts)
+
+    def test_other_members(self):
+        """Test that members before and after the array are skipped."""
+        document = json.dumps({
+            'count': 12345, 'meta': {'artifacts': ['nested']},
+            'artifacts': [1, 23.5, 'a', None, [2]], 'next': 'x'
+        })
+        self.assert_items(document, 'artifacts', [1, 23.5, 'a', None, [2]])
+
+    def test_missing_and_empty(self):
+        """Test that a missing or empty array has no items."""
+        self.assert_items('{}', 'artifacts', [])
+        self.assert_items('{"other": [1]}', 'artifacts', [])
+        self.assert_items(' { "artifacts" : [ ] } ', 'artifacts', [])
+
+    def test_not_an_array(self):
+        """Test that a member which is not an array is skipped."""
+        self.assert_items('{"artifacts": null}', 'artifacts', [])
+
+    def test_invalid(self):
+        """Test that truncated or invalid documents raise ValueError."""
+        for document in ('', '[]', '{"artifacts": [{"Key": "a"}, {"Key"',
+                         '{"artifacts": [1 2]}', '{"artifacts": [1]'):
+            with self.subTest(document=document):
+                with self.assertRaises(ValueError):
+                    list(iter_array_items(io.StringIO(document), 'artifacts', 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
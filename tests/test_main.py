@@ -1,7 +1,7 @@
 #
 # MIT License
 #
-# (C) Copyright 2021-2023 Hewlett Packard Enterprise Development LP
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
 #
 # Permission is hereby granted, free of charge, to any person obtaining a
 # copy of this software and associated documentation files (the "Software"),
@@ -26,115 +26,151 @@ Unit tests for the product_deletion_utility.main module.
 """
 
 from argparse import Namespace
+import tempfile
 import unittest
-from unittest.mock import patch
-
+from unittest.mock import Mock, patch
 
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.journal import DeletionJournal
+from product_deletion_utility.components.metrics import Metrics
 from product_deletion_utility.main import (
+    _remove_components,
+    delete,
     main,
-    delete
-)
-from shasta_install_utility_common.products import ProductInstallException
-from shasta_install_utility_common.constants import (
-    DEFAULT_DOCKER_URL,
-    DEFAULT_NEXUS_URL,
-    PRODUCT_CATALOG_CONFIG_MAP_NAME,
-    PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE,
-    NEXUS_CREDENTIALS_SECRET_NAME,
-    NEXUS_CREDENTIALS_SECRET_NAMESPACE
 )
 
 
-class TestUninstall(unittest.TestCase):
-    """Tests for activate() and uninstall()."""
-    def setUp(self):
-        self.mock_product_catalog_cls = patch('product_deletion_utility.main.ProductCatalog').start()
-        self.mock_product_catalog = self.mock_product_catalog_cls.return_value
+class TestDelete(unittest.TestCase):
+    """Tests for delete()."""
 
-        self.mock_product = self.mock_product_catalog.get_product.return_value
-        self.mock_product.product = 'old-product'
-        self.mock_product.version = 'x.y.z'
-        self.mock_product.clone_url = 'https://vcs.local/cray/product-deletion-config-management.git'
+    def setUp(self):
+        self.mock_delete = patch('product_deletion_utility.main._delete').start()
+        self.mock_write_summary = patch('product_deletion_utility.main.write_summary').start()
+        self.mock_configure_retries = patch('product_deletion_utility.main.configure_retries').start()
+        self.journal_dir = tempfile.TemporaryDirectory()
+        self.args = Namespace(
+            product='cos',
+            version='2.0.3',
+            product_versions=[('cos', '2.0.3')],
+            dry_run=False,
+            resume=False,
+            journal_dir=self.journal_dir.name,
+            max_retries=4,
+            rate_limit=100,
+            log_file='/var/log/delete.log',
+            metrics_textfile=None,
+        )
 
     def tearDown(self):
         """Stop patches."""
         patch.stopall()
+        self.journal_dir.cleanup()
 
-    def test_uninstall_success(self):
-        """Test the successful case for uninstall()."""
-        delete(Namespace(
-            product=self.mock_product.product,
-            version=self.mock_product.version,
-            docker_url='mock_docker_url',
-            nexus_url='mock_nexus_url',
-            product_catalog_name='mock_name',
-            product_catalog_namespace='mock_namespace',
-            nexus_credentials_secret_name='mock_nexus_secret',
-            nexus_credentials_secret_namespace='mock_nexus_secret_namespace'
-        ))
-        self.mock_product_catalog_cls.assert_called_once_with(
-            name='mock_name',
-            namespace='mock_namespace',
-            docker_url='mock_docker_url',
-            nexus_url='mock_nexus_url',
-            nexus_credentials_secret_name='mock_nexus_secret',
-            nexus_credentials_secret_namespace='mock_nexus_secret_namespace'
-        )
-        self.mock_product_catalog.remove_product_docker_images.assert_called_once_with(self.mock_product.product, self.mock_product.version)
-        self.mock_product_catalog.uninstall_product_hosted_repos.assert_called_once_with(self.mock_product.product, self.mock_product.version)
-        self.mock_product_catalog.remove_product_entry.assert_called_once_with(self.mock_product.product, self.mock_product.version)
+    def test_delete_success(self):
+        """Test that a deletion is journaled and its metrics summary written."""
+        delete(self.args)
+        self.mock_configure_retries.assert_called_once_with(4, 100)
+        args, journal = self.mock_delete.call_args[0]
+        self.assertIs(self.args, args)
+        self.assertIsInstance(journal, DeletionJournal)
+        self.assertTrue(journal.path.startswith(self.journal_dir.name))
+        self.mock_write_summary.assert_called_once_with('/var/log/delete.log', None)
+
+    def test_delete_dry_run(self):
+        """Test that a dry run is not journaled."""
+        self.args.dry_run = True
+        delete(self.args)
+        self.mock_delete.assert_called_once_with(self.args, None)
+
+    def test_delete_failure(self):
+        """Test that the metrics summary is written when a deletion fails."""
+        self.mock_delete.side_effect = ProductInstallException('failed')
+        with self.assertRaisesRegex(ProductInstallException, 'failed'):
+            delete(self.args)
+        self.mock_write_summary.assert_called_once()
+
+    def test_delete_summary_not_written(self):
+        """Test that failing to write the metrics summary does not fail the deletion."""
+        self.mock_write_summary.side_effect = OSError('read-only file system')
+        with self.assertLogs('product-deletion-utility', 'WARNING') as logs:
+            delete(self.args)
+        self.assertIn('read-only file system', logs.output[0])
+
+
+class TestRemoveComponents(unittest.TestCase):
+    """Tests for _remove_components()."""
+
+    def test_every_phase_run(self):
+        """Test that every removal phase is run and timed in the deletion's metrics, and the deletion closed."""
+        component = Mock(metrics=Metrics())
+        _remove_components(component, 2)
+        for phase in ('remove_product_docker_images', 'remove_product_S3_artifacts',
+                      'remove_product_helm_charts', 'remove_product_loftsman_manifests',
+                      'remove_ims_images', 'remove_ims_recipes', 'remove_product_hosted_repos'):
+            getattr(component, phase).assert_called_once_with()
+        component.close.assert_called_once_with()
+        self.assertEqual(7, len(component.metrics.phases))
+
+    def test_phase_failure(self):
+        """Test that a failed phase is reported after the other phases have run."""
+        component = Mock(metrics=Metrics())
+        component.remove_ims_images.side_effect = ProductInstallException('IMS unavailable')
+        with self.assertRaisesRegex(ProductInstallException, 'IMS unavailable'):
+            _remove_components(component, 1)
+        component.remove_product_hosted_repos.assert_called_once_with()
+        component.close.assert_called_once_with()
 
 
 class TestMain(unittest.TestCase):
+    """Tests for main()."""
+
     def setUp(self):
         """Set up mocks."""
-        self.mock_uninstall = patch('product_deletion_utility.main.delete').start()
+        self.mock_delete = patch('product_deletion_utility.main.delete').start()
+        self.mock_gc = patch('product_deletion_utility.main.gc').start()
+        self.mock_serve = patch('product_deletion_utility.main.serve').start()
+        patch('product_deletion_utility.main.setup_console_logger').start()
+        patch('product_deletion_utility.main.setup_file_logger').start()
 
     def tearDown(self):
         """Stop patches."""
         patch.stopall()
 
-    def test_uninstall_action(self):
-        """Test a basic uninstall."""
-        action = 'uninstall'
-        product = 'old-product'
-        version = '2.0.3'
-        patch('sys.argv', ['product-deletion-utility', action, product, version]).start()
+    def run_main(self, *argv):
+        patch('sys.argv', ['product-deletion-utility'] + list(argv)).start()
         main()
-        self.mock_uninstall.assert_called_once_with(
-            Namespace(
-                action=action,
-                product=product,
-                version=version,
-                docker_url=DEFAULT_DOCKER_URL,
-                nexus_url=DEFAULT_NEXUS_URL,
-                product_catalog_name=PRODUCT_CATALOG_CONFIG_MAP_NAME,
-                product_catalog_namespace=PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE,
-                nexus_credentials_secret_name=NEXUS_CREDENTIALS_SECRET_NAME,
-                nexus_credentials_secret_namespace=NEXUS_CREDENTIALS_SECRET_NAMESPACE,
-            )
-        )
 
     def test_delete_action(self):
-        """Test a basic uninstall."""
-        action = 'delete'
-        product = 'old-product'
-        version = '2.0.3'
-        patch('sys.argv', ['product-deletion-utility', action, product, version]).start()
-        main()
-        self.mock_uninstall.assert_called_once_with(
-            Namespace(
-                action=action,
-                product=product,
-                version=version,
-                docker_url=DEFAULT_DOCKER_URL,
-                nexus_url=DEFAULT_NEXUS_URL,
-                product_catalog_name=PRODUCT_CATALOG_CONFIG_MAP_NAME,
-                product_catalog_namespace=PRODUCT_CATALOG_CONFIG_MAP_NAMESPACE,
-                nexus_credentials_secret_name=NEXUS_CREDENTIALS_SECRET_NAME,
-                nexus_credentials_secret_namespace=NEXUS_CREDENTIALS_SECRET_NAMESPACE
-            )
-        )
+        """Test a basic delete."""
+        self.run_main('delete', 'old-product', '2.0.3')
+        args = self.mock_delete.call_args[0][0]
+        self.assertEqual(('delete', 'old-product', '2.0.3'), (args.action, args.product, args.version))
+        self.assertEqual([('old-product', '2.0.3')], args.product_versions)
+
+    def test_uninstall_action(self):
+        """Test that uninstall is an alias of delete."""
+        self.run_main('uninstall', 'old-product', '2.0.3')
+        self.mock_delete.assert_called_once()
+
+    def test_gc_action(self):
+        """Test that gc searches every product version."""
+        self.run_main('gc')
+        self.assertEqual([], self.mock_gc.call_args[0][0].product_versions)
+        self.mock_delete.assert_not_called()
+
+    def test_serve_action(self):
+        """Test that serve starts the deletion service."""
+        self.run_main('serve')
+        self.mock_serve.assert_called_once()
+
+    def test_failure(self):
+        """Test that a ProductInstallException exits with status 1."""
+        self.mock_delete.side_effect = ProductInstallException('failed')
+        with self.assertRaises(SystemExit) as context:
+            with self.assertLogs('product-deletion-utility', 'CRITICAL'):
+                self.run_main('delete', 'old-product', '2.0.3')
+        self.assertEqual(1, context.exception.code)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,181 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.metrics module.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from product_deletion_utility.components.metrics import (
+    Histogram,
+    Metrics,
+    instrument_session,
+    metrics_path,
+    write_summary,
+)
+
+
+class TestHistogram(unittest.TestCase):
+    """Tests for Histogram."""
+
+    def test_observe(self):
+        """Test that bucket counts are cumulative."""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 5.0):
+            histogram.observe(seconds)
+        self.assertEqual([1, 2], histogram.counts)
+        self.assertEqual(3, histogram.count)
+        self.assertAlmostEqual(5.55, histogram.sum)
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for Metrics."""
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_phase(self):
+        """Test that phases are timed and their status recorded."""
+        with self.metrics.phase('Docker images'):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.phase('S3 artifacts'):
+                raise ValueError('failed')
+        self.assertEqual('succeeded', self.metrics.phases['Docker images']['status'])
+        self.assertEqual('failed', self.metrics.phases['S3 artifacts']['status'])
+
+    def test_removal(self):
+        """Test that removals are counted and failures recorded."""
+        with self.metrics.removal('docker_image'):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.removal('docker_image'):
+                raise ValueError('failed')
+        removals = self.metrics.to_dict()['removals']['docker_image']
+        self.assertEqual((2, 1, 2), (removals['count'], removals['failed'], removals['latency']['count']))
+
+    def test_record_request(self):
+        """Test that requests are counted by outcome."""
+        self.metrics.record_request('docker', 'HEAD', 0.01, 200, 10)
+        self.metrics.record_request('docker', 'HEAD', 0.01, 404)
+        self.metrics.record_request('docker', 'HEAD', 0.01, 500)
+        self.metrics.record_request('docker', 'HEAD', 0.01)
+        self.metrics.record_retry('docker', 'HEAD')
+        self.metrics.record_not_found('s3', 'DeleteObjects')
+        requests = self.metrics.to_dict()['requests']
+        head = requests['docker']['HEAD']
+        self.assertEqual((4, 2, 1, 1, 10),
+                         (head['count'], head['errors'], head['not_found'], head['retries'], head['bytes']))
+        self.assertEqual(1, requests['s3']['DeleteObjects']['not_found'])
+
+    def test_record_reclaimed(self):
+        """Test that the estimated storage reclaimed is reported."""
+        self.metrics.record_reclaimed('nexus', 'cos-2.5.0', 1024)
+        self.assertEqual({'nexus': {'cos-2.5.0': 1024}}, self.metrics.to_dict()['reclaimed_bytes'])
+        self.assertIn('product_deletion_reclaimed_bytes{backend="nexus",component="cos-2.5.0"} 1024',
+                      self.metrics.to_prometheus())
+
+    def test_to_prometheus(self):
+        """Test the Prometheus text format."""
+        with self.metrics.phase('IMS "images"'):
+            pass
+        self.metrics.record_request('nexus', 'DELETE', 0.2, 204)
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE product_deletion_request_duration_seconds histogram', text)
+        self.assertIn('product_deletion_request_duration_seconds_bucket'
+                      '{backend="nexus",method="DELETE",le="0.25"} 1', text)
+        self.assertIn('product_deletion_request_duration_seconds_count'
+                      '{backend="nexus",method="DELETE"} 1', text)
+        self.assertIn('phase="IMS \\"images\\""', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_parent(self):
+        """Test that the metrics of a job are also recorded in those of the process."""
+        job_metrics = Metrics(parent=self.metrics)
+        with job_metrics.phase('Docker images'):
+            with job_metrics.removal('docker_image'):
+                pass
+        job_metrics.record_request('docker', 'DELETE', 0.01, 202)
+        job_metrics.record_retry('docker', 'DELETE')
+        job_metrics.record_not_found('s3', 'DeleteObjects')
+        job_metrics.record_reclaimed('nexus', 'cos-2.5.0', 1024)
+        Metrics(parent=self.metrics).record_request('docker', 'DELETE', 0.01, 202)
+        expected = job_metrics.to_dict()
+        self.assertEqual(1, expected['requests']['docker']['DELETE']['count'])
+        actual = self.metrics.to_dict()
+        self.assertEqual(2, actual['requests']['docker']['DELETE']['count'])
+        for key in ('phases', 'removals', 'reclaimed_bytes'):
+            self.assertEqual(expected[key], actual[key])
+
+    def test_instrument_session(self):
+        """Test that responses of an instrumented session are recorded."""
+        session = Mock(hooks={'response': []})
+        instrument_session(session, 'docker', self.metrics)
+        response = Mock(status_code=404, headers={'Content-Length': '12'},
+                        elapsed=datetime.timedelta(milliseconds=20))
+        response.request.method = 'HEAD'
+        for hook in session.hooks['response']:
+            hook(response)
+        head = self.metrics.to_dict()['requests']['docker']['HEAD']
+        self.assertEqual((1, 1, 12), (head['count'], head['not_found'], head['bytes']))
+
+
+class TestWriteSummary(unittest.TestCase):
+    """Tests for writing the metrics."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_metrics_path(self):
+        """Test that the summary is written next to the log file, or in the log directory."""
+        self.assertEqual(os.path.join(self.directory, 'deletion-metrics.json'),
+                         metrics_path(self.directory))
+        self.assertEqual('/var/log/deletion-metrics.json', metrics_path('/var/log/deletion.log'))
+        self.assertEqual('/var/log/deletion-abc123-metrics.json', metrics_path('/var/log/deletion.log', 'abc123'))
+
+    def test_write_summary(self):
+        """Test that the JSON summary and Prometheus textfile are written."""
+        metrics = Metrics()
+        with metrics.phase('Docker images'):
+            pass
+        textfile = os.path.join(self.directory, 'deletion.prom')
+        write_summary(os.path.join(self.directory, 'deletion.log'), textfile, metrics)
+        with open(os.path.join(self.directory, 'deletion-metrics.json')) as f:
+            self.assertIn('Docker images', json.load(f)['phases'])
+        with open(textfile) as f:
+            self.assertIn('product_deletion_phase_duration_seconds', f.read())
+        self.assertEqual(['deletion-metrics.json', 'deletion.prom'], sorted(os.listdir(self.directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
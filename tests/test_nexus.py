@@ -0,0 +1,172 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.nexus module.
+"""
+
+import os
+import unittest
+from unittest.mock import Mock, patch
+
+import requests
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.nexus import (
+    NexusRestClient,
+    index_chart_components,
+    iter_components,
+)
+
+
+def mock_component(name, version, component_id):
+    """Create a mock nexusctl component."""
+    component = Mock(version=version, id=component_id)
+    component.name = name
+    return component
+
+
+class TestIterComponents(unittest.TestCase):
+    """Tests for iter_components()."""
+
+    def test_pages_followed(self):
+        """Test that continuation tokens are followed until the last page."""
+        first = Mock(components=[mock_component('a', '1', 'id-a')], continuation_token='next')
+        last = Mock(components=[mock_component('b', '1', 'id-b')], continuation_token=None)
+        nexus_api = Mock()
+        nexus_api.components.list.side_effect = [first, last]
+        self.assertEqual(['id-a', 'id-b'], [c.id for c in iter_components(nexus_api, 'charts')])
+        nexus_api.components.list.assert_called_with('charts', continuation_token='next')
+
+    def test_pages_fetched_lazily(self):
+        """Test that the next page is not requested until it is needed."""
+        first = Mock(components=[mock_component('a', '1', 'id-a')], continuation_token='next')
+        nexus_api = Mock()
+        nexus_api.components.list.return_value = first
+        next(iter_components(nexus_api, 'charts'))
+        nexus_api.components.list.assert_called_once_with('charts')
+
+
+class TestIndexChartComponents(unittest.TestCase):
+    """Tests for index_chart_components()."""
+
+    def test_index(self):
+        """Test that requested charts are mapped to their component IDs."""
+        components = [
+            mock_component('cray-a', '1.0.0', 'id-1'),
+            mock_component('cray-b', '1.0.0', 'id-2'),
+            mock_component('cray-a', '2.0.0', 'id-3'),
+        ]
+        self.assertEqual(
+            {('cray-a', '2.0.0'): ['id-3'], ('cray-b', '1.0.0'): ['id-2']},
+            index_chart_components(components, [('cray-a', '2.0.0'), ('cray-b', '1.0.0')])
+        )
+
+    def test_stops_early(self):
+        """Test that components are not consumed once every chart is found."""
+        consumed = []
+
+        def components():
+            for component in [mock_component('cray-a', '1.0.0', 'id-1'),
+                              mock_component('cray-b', '1.0.0', 'id-2')]:
+                consumed.append(component.id)
+                yield component
+
+        index_chart_components(components(), [('cray-a', '1.0.0')])
+        self.assertEqual(['id-1'], consumed)
+
+    def test_missing_chart(self):
+        """Test that a chart not in Nexus is absent from the index."""
+        self.assertEqual({}, index_chart_components([], [('cray-a', '1.0.0')]))
+
+
+class TestNexusRestClient(unittest.TestCase):
+    """Tests for NexusRestClient."""
+
+    def setUp(self):
+        patch.dict(os.environ, {'NEXUS_USERNAME': 'admin', 'NEXUS_PASSWORD': 'secret'}).start()
+        self.session = Mock(auth=None)
+        self.client = NexusRestClient('https://packages.local/service/rest/', self.session)
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_credentials(self):
+        """Test that the Nexus credentials are used for the session."""
+        self.assertEqual(('admin', 'secret'), self.session.auth)
+
+    def test_authenticated_session(self):
+        """Test that a session which is already authenticated keeps its credentials."""
+        session = Mock(auth=('broker', 'password'))
+        NexusRestClient('https://packages.local/service/rest/', session)
+        self.assertEqual(('broker', 'password'), session.auth)
+
+    def test_search_chart_components(self):
+        """Test that search results across pages are filtered to exact matches."""
+        self.session.get.return_value.json.side_effect = [
+            {'items': [{'id': 'id-1', 'name': 'cray-a', 'version': '1.0.0'}], 'continuationToken': 'next'},
+            {'items': [{'id': 'id-2', 'name': 'cray-a', 'version': '1.0.0-rc'}], 'continuationToken': None},
+        ]
+        self.assertEqual({('cray-a', '1.0.0'): ['id-1']},
+                         self.client.search_chart_components([('cray-a', '1.0.0')]))
+        self.session.get.assert_called_with(
+            'https://packages.local/service/rest/v1/search',
+            params={'repository': 'charts', 'name': 'cray-a', 'version': '1.0.0',
+                    'continuationToken': 'next'}
+        )
+
+    def test_list_repositories(self):
+        """Test that the repository names are listed with one request."""
+        self.session.get.return_value.json.return_value = [
+            {'name': 'cos-2.5.0', 'format': 'raw'}, {'name': 'charts', 'format': 'helm'}
+        ]
+        self.assertEqual({'cos-2.5.0', 'charts'}, self.client.list_repositories())
+        self.session.get.assert_called_once_with('https://packages.local/service/rest/v1/repositories')
+
+    def test_repository_size(self):
+        """Test that the sizes of the assets across pages are summed."""
+        self.session.get.return_value.json.side_effect = [
+            {'items': [{'fileSize': 100}, {'fileSize': 20}], 'continuationToken': 'next'},
+            {'items': [{'path': 'no/size'}], 'continuationToken': None},
+        ]
+        self.assertEqual(120, self.client.repository_size('cos-2.5.0'))
+        self.session.get.assert_called_with(
+            'https://packages.local/service/rest/v1/assets',
+            params={'repository': 'cos-2.5.0', 'continuationToken': 'next'}
+        )
+
+    def test_list_repositories_failure(self):
+        """Test that a failed listing is raised as a ProductInstallException."""
+        self.session.get.return_value.raise_for_status.side_effect = requests.HTTPError('403')
+        with self.assertRaises(ProductInstallException):
+            self.client.list_repositories()
+
+    def test_search_failure(self):
+        """Test that a failed search is raised as a ProductInstallException."""
+        self.session.get.return_value.raise_for_status.side_effect = requests.HTTPError('500')
+        with self.assertRaises(ProductInstallException):
+            self.client.search_chart_components([('cray-a', '1.0.0')])
+
+
+if __name__ == '__main__':
+    unittest.main()
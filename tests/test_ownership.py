@@ -0,0 +1,137 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.ownership module.
+"""
+
+import unittest
+
+from product_deletion_utility.components.ownership import (
+    ComponentOwnershipIndex,
+    DOCKER_IMAGE,
+    HELM_CHART,
+    HOSTED_REPO,
+    IMS_IMAGE,
+    S3_ARTIFACT,
+)
+
+
+class MockProduct:
+    """A minimal stand-in for an InstalledProductVersion."""
+    def __init__(self, name, version, docker_images=(), s3_artifacts=(), helm_charts=(),
+                 recipes=(), images=(), hosted_repositories=()):
+        self.name = name
+        self.version = version
+        self.docker_images = list(docker_images)
+        self.s3_artifacts = list(s3_artifacts)
+        self.helm_charts = list(helm_charts)
+        self.recipes = list(recipes)
+        self.images = list(images)
+        self.hosted_repositories = list(hosted_repositories)
+
+    def __str__(self):
+        return f'{self.name}-{self.version}'
+
+
+class TestComponentOwnershipIndex(unittest.TestCase):
+    """Tests for ComponentOwnershipIndex."""
+    def setUp(self):
+        self.old = MockProduct(
+            'cos', '1.0.0',
+            docker_images=[('cray/shared', '1.0'), ('cray/old', '1.0')],
+            s3_artifacts=[('boot-images', 'cos/1.0/kernel')],
+            hosted_repositories=[{'name': 'cos-1.0.0-sle-15sp4', 'type': 'hosted'}],
+            images=[{'name': 'cos-image', 'id': 'abc'}],
+        )
+        self.new = MockProduct(
+            'cos', '2.0.0',
+            docker_images=[('cray/shared', '1.0')],
+            helm_charts=[('cray-cos', '2.0.0')],
+        )
+        self.other = MockProduct('sma', '1.0.0', docker_images=[('cray/shared', '1.0')])
+        self.index = ComponentOwnershipIndex([self.old, self.new, self.other])
+
+    def test_owners(self):
+        """Test that every owner of a component is returned."""
+        self.assertEqual({self.old, self.new, self.other},
+                         self.index.owners(DOCKER_IMAGE, ('cray/shared', '1.0')))
+        self.assertEqual({self.old}, self.index.owners(IMS_IMAGE, ('cos-image', 'abc')))
+
+    def test_owners_unknown_component(self):
+        """Test that a component owned by no product has no owners."""
+        self.assertEqual(set(), self.index.owners(HELM_CHART, ('cray-cos', '1.0.0')))
+
+    def test_component_types_are_distinct(self):
+        """Test that equal keys of different component types are not conflated."""
+        self.assertEqual(set(), self.index.owners(HELM_CHART, ('cray/shared', '1.0')))
+
+    def test_other_owners(self):
+        """Test that the given product version is excluded and the rest are sorted."""
+        self.assertEqual([self.new, self.other],
+                         self.index.other_owners(DOCKER_IMAGE, ('cray/shared', '1.0'), self.old))
+        self.assertEqual([], self.index.other_owners(DOCKER_IMAGE, ('cray/old', '1.0'), self.old))
+        self.assertEqual([], self.index.other_owners(
+            S3_ARTIFACT, ('boot-images', 'cos/1.0/kernel'), self.old))
+        self.assertEqual([], self.index.other_owners(
+            HOSTED_REPO, ('cos-1.0.0-sle-15sp4', 'hosted'), self.old))
+
+    def test_other_owners_compares_name_and_version(self):
+        """Test that a different object for the same product version is excluded."""
+        same_version = MockProduct('cos', '1.0.0')
+        self.assertEqual([self.new, self.other],
+                         self.index.other_owners(DOCKER_IMAGE, ('cray/shared', '1.0'), same_version))
+
+    def test_remaining_owners(self):
+        """Test that every product version in a batch is excluded."""
+        self.assertEqual([self.other], self.index.remaining_owners(
+            DOCKER_IMAGE, ('cray/shared', '1.0'), [self.old, self.new]))
+        self.assertEqual([], self.index.remaining_owners(
+            DOCKER_IMAGE, ('cray/shared', '1.0'), [self.old, self.new, self.other]))
+
+    def test_remove_product(self):
+        """Test that a removed product version no longer owns its components."""
+        self.index.remove_product(self.old)
+        self.assertEqual({self.new, self.other}, self.index.owners(DOCKER_IMAGE, ('cray/shared', '1.0')))
+        self.assertEqual([('cray/shared', '1.0')], self.index.components(DOCKER_IMAGE))
+        self.assertEqual([], self.index.components(IMS_IMAGE))
+
+    def test_replace_products(self):
+        """Test that the versions of a changed product are replaced."""
+        changed = MockProduct('sma', '1.0.0', docker_images=[('cray/sma', '1.0')])
+        self.index.replace_products([self.other], [changed])
+        self.assertEqual({self.old, self.new}, self.index.owners(DOCKER_IMAGE, ('cray/shared', '1.0')))
+        self.assertEqual({changed}, self.index.owners(DOCKER_IMAGE, ('cray/sma', '1.0')))
+
+    def test_copy(self):
+        """Test that changing a copy of the index does not change the original."""
+        copy = self.index.copy()
+        copy.remove_product(self.old)
+        self.assertEqual({self.new, self.other}, copy.owners(DOCKER_IMAGE, ('cray/shared', '1.0')))
+        self.assertEqual({self.old, self.new, self.other},
+                         self.index.owners(DOCKER_IMAGE, ('cray/shared', '1.0')))
+        self.assertEqual({self.old}, self.index.owners(IMS_IMAGE, ('cos-image', 'abc')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.parser.parser module.
+"""
+
+import os
+import tempfile
+import unittest
+
+from product_deletion_utility.parser.parser import create_parser, get_product_versions
+
+
+class TestGetProductVersions(unittest.TestCase):
+    """Tests for get_product_versions()."""
+
+    def setUp(self):
+        self.parser = create_parser()
+
+    def product_versions(self, argv):
+        return get_product_versions(self.parser, self.parser.parse_args(argv))
+
+    def test_single_product(self):
+        """Test the product and version positional arguments."""
+        self.assertEqual([('cos', '2.5.101')], self.product_versions(['delete', 'cos', '2.5.101']))
+
+    def test_products(self):
+        """Test a batch given with --products, with duplicates removed."""
+        self.assertEqual(
+            [('cos', '2.5.101'), ('sma', '1.8.3')],
+            self.product_versions(['delete', '--products', 'cos:2.5.101', 'sma:1.8.3', 'cos:2.5.101'])
+        )
+
+    def test_products_file(self):
+        """Test a batch read from --products-file together with --products."""
+        with tempfile.NamedTemporaryFile('w', delete=False) as products_file:
+            products_file.write('# release 23.7\ncos:2.5.101\n\nsma:1.8.3\n')
+        self.addCleanup(os.remove, products_file.name)
+        self.assertEqual(
+            [('uan', '2.6.0'), ('cos', '2.5.101'), ('sma', '1.8.3')],
+            self.product_versions(['delete', '--products', 'uan:2.6.0',
+                                   '--products-file', products_file.name])
+        )
+
+    def test_invalid_product_version(self):
+        """Test that a batch entry without a version is rejected."""
+        with self.assertRaises(SystemExit):
+            self.product_versions(['delete', '--products', 'cos'])
+
+    def test_product_and_batch(self):
+        """Test that a product and a batch cannot be given together."""
+        with self.assertRaises(SystemExit):
+            self.product_versions(['delete', 'cos', '2.5.101', '--products', 'sma:1.8.3'])
+
+    def test_gc(self):
+        """Test that gc does not take a product version."""
+        self.assertEqual([], self.product_versions(['gc']))
+        with self.assertRaises(SystemExit):
+            self.product_versions(['gc', 'cos', '2.5.101'])
+
+    def test_serve(self):
+        """Test that serve does not take a product version."""
+        self.assertEqual([], self.product_versions(['serve']))
+        with self.assertRaises(SystemExit):
+            self.product_versions(['serve', '--products', 'cos:2.5.101'])
+
+    def test_no_product(self):
+        """Test that a product version is required."""
+        with self.assertRaises(SystemExit):
+            self.product_versions(['delete', 'cos'])
+
+
+class TestCreateParser(unittest.TestCase):
+    """Tests for create_parser()."""
+
+    def test_catalog_cache(self):
+        """Test that the catalog cache is used unless it is disabled."""
+        parser = create_parser()
+        self.assertTrue(parser.parse_args(['delete', 'cos', '2.5.101']).catalog_cache_dir)
+        self.assertIsNone(parser.parse_args(['delete', 'cos', '2.5.101', '--no-catalog-cache']).catalog_cache_dir)
+
+    def test_gc_backends(self):
+        """Test that gc searches every backend unless scoped."""
+        parser = create_parser()
+        self.assertEqual(['docker', 'nexus', 's3'], parser.parse_args(['gc']).gc_backends)
+        args = parser.parse_args(['gc', '--gc-backends', 's3', '--delete-orphans'])
+        self.assertEqual((['s3'], True), (args.gc_backends, args.delete_orphans))
+
+    def test_serve_address(self):
+        """Test that serve listens on HOST:PORT or a Unix socket."""
+        parser = create_parser()
+        self.assertEqual(('127.0.0.1', 8480), parser.parse_args(['serve']).listen)
+        args = parser.parse_args(['serve', '--listen', ':9000', '--job-concurrency', '4'])
+        self.assertEqual((('', 9000), 4), (args.listen, args.job_concurrency))
+        self.assertEqual('/run/pdu.sock', parser.parse_args(['serve', '--unix-socket', '/run/pdu.sock']).unix_socket)
+        with self.assertRaises(SystemExit):
+            parser.parse_args(['serve', '--listen', 'localhost'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.plan module.
+"""
+
+import json
+import unittest
+
+from product_deletion_utility.components.ownership import (
+    ComponentOwnershipIndex,
+    DOCKER_IMAGE,
+    HELM_CHART,
+    HOSTED_REPO,
+    IMS_IMAGE,
+    LOFTSMAN_MANIFEST,
+    S3_ARTIFACT,
+)
+from product_deletion_utility.components.plan import SKIP_SHARED, compile_plan
+
+
+class MockProduct:
+    """A minimal stand-in for an InstalledProductVersion."""
+    def __init__(self, name, version, docker_images=(), s3_artifacts=(), helm_charts=(),
+                 loftsman_manifests=(), recipes=(), images=(), hosted_repositories=()):
+        self.name = name
+        self.version = version
+        self.docker_images = list(docker_images)
+        self.s3_artifacts = list(s3_artifacts)
+        self.helm_charts = list(helm_charts)
+        self.loftsman_manifests = list(loftsman_manifests)
+        self.recipes = list(recipes)
+        self.images = list(images)
+        self.hosted_repositories = list(hosted_repositories)
+
+    def __str__(self):
+        return f'{self.name}-{self.version}'
+
+
+class TestCompilePlan(unittest.TestCase):
+    """Tests for compile_plan and DeletionPlan."""
+    def setUp(self):
+        self.old = MockProduct(
+            'cos', '1.0.0',
+            docker_images=[('cray/shared', '1.0'), ('cray/old', '1.0'), ('cray/batch', '1.0')],
+            s3_artifacts=[('boot-images', f'cos/1.0/{i}') for i in range(3)],
+            helm_charts=[('cray-cos', '1.0.0')],
+            loftsman_manifests=['config-data/manifests/cos-1.0.0.yaml'],
+            images=[{'name': 'cos-image', 'id': 'abc'}],
+            hosted_repositories=[{'name': 'cos-1.0.0-sle-15sp4', 'type': 'hosted'}],
+        )
+        self.new = MockProduct('cos', '2.0.0', docker_images=[('cray/batch', '1.0')])
+        self.other = MockProduct('sma', '1.0.0', docker_images=[('cray/shared', '1.0')])
+        index = ComponentOwnershipIndex([self.old, self.new, self.other])
+        self.plan = compile_plan([self.old, self.new], index)
+
+    def test_shared_components_are_skipped(self):
+        """Test that a component used outside the batch is kept with its owners."""
+        self.assertNotIn(('cray/shared', '1.0'), self.plan.removals(DOCKER_IMAGE))
+        self.assertEqual([{
+            'type': DOCKER_IMAGE,
+            'key': ['cray/shared', '1.0'],
+            'reason': SKIP_SHARED,
+            'owners': ['sma-1.0.0'],
+        }], self.plan.skipped)
+
+    def test_components_shared_within_batch_are_planned_once(self):
+        """Test that a component owned only by the batch is removed once."""
+        self.assertEqual([('cray/old', '1.0'), ('cray/batch', '1.0')],
+                         self.plan.removals(DOCKER_IMAGE))
+        remove = self.plan.to_dict(1000)['remove'][DOCKER_IMAGE]
+        self.assertEqual(['cos-1.0.0', 'cos-2.0.0'], remove[1]['owners'])
+
+    def test_component_keys(self):
+        """Test the identifiers planned for each type of component."""
+        self.assertEqual([('config-data', 'manifests/cos-1.0.0.yaml')],
+                         self.plan.removals(LOFTSMAN_MANIFEST))
+        self.assertEqual([('cos-image', 'abc')], self.plan.removals(IMS_IMAGE))
+        self.assertEqual([('cos-1.0.0-sle-15sp4', 'hosted')], self.plan.removals(HOSTED_REPO))
+        self.assertEqual([('cray-cos', '1.0.0')], self.plan.removals(HELM_CHART))
+
+    def test_estimated_calls(self):
+        """Test that the estimate depends on the S3 batch size."""
+        self.assertEqual({'docker': 4, 'ims': 2, 'nexus': 3, 's3': 4},
+                         self.plan.estimated_calls(1000))
+        self.assertEqual(6, self.plan.estimated_calls(1)['s3'])
+
+    def test_to_json(self):
+        """Test that the plan serializes to JSON."""
+        plan = json.loads(self.plan.to_json(1000))
+        self.assertEqual([{'name': 'cos', 'version': '1.0.0'}, {'name': 'cos', 'version': '2.0.0'}],
+                         plan['product_versions'])
+        self.assertEqual(3, len(plan['remove'][S3_ARTIFACT]))
+
+
+if __name__ == '__main__':
+    unittest.main()
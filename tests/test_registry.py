@@ -0,0 +1,174 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.registry module.
+"""
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
+import unittest
+
+from product_deletion_utility.components.registry import (
+    RegistryClient,
+    is_digest,
+    plan_manifest_deletions,
+    registry_api_url,
+)
+
+# The digest each tag points to in the fake registry.
+TAG_DIGESTS = {
+    'cray/app': {'1.0': 'sha256:aaa', 'latest': 'sha256:aaa', '2.0': 'sha256:bbb', 'other': 'sha256:bbb'},
+    'cray/tool': {'1.0': 'sha256:ccc'},
+}
+
+
+class FakeRegistryHandler(BaseHTTPRequestHandler):
+    """Serve the manifests API of a minimal Docker registry."""
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, headers=None, body=b''):
+        self.server.requests.append((self.command, self.path))
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """List tags two at a time, linking to the next page like the registry."""
+        url = urlparse(self.path)
+        name = url.path[len('/v2/'):-len('/tags/list')]
+        if name not in TAG_DIGESTS:
+            self._respond(404)
+            return
+        tags = sorted(TAG_DIGESTS[name])
+        last = parse_qs(url.query).get('last', [''])[0]
+        page = [tag for tag in tags if tag > last][:2]
+        headers = {}
+        if page and page[-1] != tags[-1]:
+            headers['Link'] = f'</v2/{name}/tags/list?n=2&last={page[-1]}>; rel="next"'
+        self._respond(200, headers, json.dumps({'name': name, 'tags': page}).encode())
+
+    def _manifest(self):
+        name, _, reference = self.path[len('/v2/'):].partition('/manifests/')
+        return name, reference
+
+    def do_HEAD(self):
+        name, tag = self._manifest()
+        if name == 'cray/broken' or tag == 'flaky':
+            self._respond(500)
+        elif tag in TAG_DIGESTS.get(name, {}):
+            self._respond(200, {'Docker-Content-Digest': TAG_DIGESTS[name][tag]})
+        else:
+            self._respond(404)
+
+    def do_DELETE(self):
+        name, digest = self._manifest()
+        self._respond(202 if digest in TAG_DIGESTS.get(name, {}).values() else 404)
+
+
+class TestRegistry(unittest.TestCase):
+    """Tests for RegistryClient and plan_manifest_deletions."""
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeRegistryHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = RegistryClient(f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_registry_api_url(self):
+        """Test that the v2 API suffix is added once."""
+        self.assertEqual('https://registry.local/v2', registry_api_url('https://registry.local/'))
+        self.assertEqual('https://registry.local/v2', registry_api_url('https://registry.local/v2'))
+
+    def test_is_digest(self):
+        """Test that digests are told apart from tags."""
+        self.assertTrue(is_digest('sha256:aaa'))
+        self.assertFalse(is_digest('1.0'))
+
+    def test_shared_digest_deleted_once(self):
+        """Test that tags pointing to the same digest produce a single deletion."""
+        manifests, failures = plan_manifest_deletions(
+            self.client, [('cray/app', '1.0'), ('cray/app', 'latest'), ('cray/tool', '1.0')], {}, 4)
+        self.assertEqual([('cray/app', 'sha256:aaa'), ('cray/tool', 'sha256:ccc')], manifests)
+        self.assertEqual([], failures)
+
+    def test_digest_tagged_by_other_product_is_kept(self):
+        """Test that a digest also tagged by another product version is not deleted."""
+        with self.assertLogs('product-deletion-utility', 'INFO') as logs:
+            manifests, failures = plan_manifest_deletions(
+                self.client, [('cray/app', '1.0'), ('cray/app', '2.0')],
+                {('cray/app', 'other'): ['sma-1.0.0'], ('cray/unrelated', '1.0'): ['sma-1.0.0']}, 4)
+        self.assertEqual([('cray/app', 'sha256:aaa')], manifests)
+        self.assertEqual([], failures)
+        self.assertIn('cray/app:other (sma-1.0.0)', '\n'.join(logs.output))
+        # Images in other repositories cannot share a manifest, so are not resolved.
+        self.assertNotIn(('HEAD', '/v2/cray/unrelated/manifests/1.0'), self.server.requests)
+
+    def test_missing_tag_is_skipped(self):
+        """Test that a tag which no longer exists is reported as already removed."""
+        with self.assertLogs('product-deletion-utility', 'WARNING'):
+            manifests, failures = plan_manifest_deletions(self.client, [('cray/app', '9.9')], {}, 4)
+        self.assertEqual(([], []), (manifests, failures))
+
+    def test_unresolved_tags_fail(self):
+        """Test that images are not deleted when a tag cannot be resolved."""
+        manifests, failures = plan_manifest_deletions(
+            self.client, [('cray/broken', '1.0')], {('cray/broken', '2.0'): ['sma-1.0.0']}, 4)
+        self.assertEqual([], manifests)
+        self.assertEqual([('cray/broken', '1.0')], [image for image, _ in failures])
+
+    def test_unresolved_removed_tag_fails_alone(self):
+        """Test that a tag being removed which cannot be resolved does not fail the other tags of its image."""
+        manifests, failures = plan_manifest_deletions(
+            self.client, [('cray/app', 'flaky'), ('cray/app', '1.0')], {('cray/app', 'other'): ['sma-1.0.0']}, 4)
+        self.assertEqual([('cray/app', 'sha256:aaa')], manifests)
+        self.assertEqual([('cray/app', 'flaky')], [image for image, _ in failures])
+
+    def test_list_tags(self):
+        """Test that the pages of the tags listing are followed."""
+        self.assertEqual(['1.0', '2.0', 'latest', 'other'], list(self.client.list_tags('cray/app')))
+        self.assertEqual(2, len(self.server.requests))
+        self.assertEqual([], list(self.client.list_tags('cray/gone')))
+
+    def test_delete_manifest(self):
+        """Test that a manifest is deleted by digest, and a missing one is not an error."""
+        self.client.delete_manifest('cray/app', 'sha256:aaa')
+        with self.assertLogs('product-deletion-utility', 'WARNING'):
+            self.client.delete_manifest('cray/app', 'sha256:gone')
+        self.assertEqual([('DELETE', '/v2/cray/app/manifests/sha256:aaa'),
+                          ('DELETE', '/v2/cray/app/manifests/sha256:gone')], self.server.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.retry module.
+"""
+
+import datetime
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import requests
+
+from product_deletion_utility.components.retry import (
+    AdaptiveLimiter,
+    HostLimiters,
+    RetryPolicy,
+    call_with_retry,
+    classify_error,
+    host_of,
+    parse_retry_after,
+)
+
+
+class HttpError(Exception):
+    """An HTTP error in the style of NexusCtlHttpError and urllib's HTTPError."""
+    def __init__(self, code, headers=None):
+        super().__init__(f'HTTP {code}')
+        self.code = code
+        self.headers = headers or {}
+
+
+def response(status_code, headers=None):
+    """Create a mock requests.Response."""
+    return Mock(status_code=status_code, headers=headers or {})
+
+
+class TestRetryHelpers(unittest.TestCase):
+    """Tests for parsing and classifying failures."""
+
+    def test_parse_retry_after(self):
+        """Test that Retry-After is parsed as seconds or as an HTTP date."""
+        now = datetime.datetime(2023, 10, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(3.0, parse_retry_after('3'))
+        self.assertEqual(30.0, parse_retry_after('Sun, 01 Oct 2023 12:00:30 GMT', now))
+        self.assertEqual(0.0, parse_retry_after('Sun, 01 Oct 2023 11:00:00 GMT', now))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_classify_error(self):
+        """Test which errors are retried."""
+        self.assertEqual((True, 2.0), classify_error(HttpError(429, {'Retry-After': '2'})))
+        self.assertEqual((True, None), classify_error(requests.Timeout()))
+        self.assertEqual((True, None), classify_error(requests.ConnectionError()))
+        self.assertEqual((False, None), classify_error(HttpError(500)))
+        self.assertEqual((False, None), classify_error(ValueError()))
+
+    def test_policy_delay(self):
+        """Test that backoff is jittered, capped and honors Retry-After."""
+        policy = RetryPolicy(base_delay=1, max_delay=4, max_retry_after=10)
+        for retry in range(6):
+            self.assertTrue(0 <= policy.delay(retry) <= min(4, 2 ** retry))
+        self.assertGreaterEqual(policy.delay(0, retry_after=5), 5)
+        self.assertLessEqual(policy.delay(0, retry_after=60), 10)
+
+    def test_host_of(self):
+        """Test that limiters are chosen by host and port."""
+        self.assertEqual('packages.local:8443', host_of('https://packages.local:8443/service/rest/v1'))
+
+
+@patch('product_deletion_utility.components.retry.time.sleep')
+class TestCallWithRetry(unittest.TestCase):
+    """Tests for call_with_retry."""
+
+    def setUp(self):
+        self.policy = RetryPolicy(max_retries=2, base_delay=0.01)
+        self.limiters = HostLimiters(rate=0)
+
+    def call(self, call, **kwargs):
+        return call_with_retry(call, 'nexus.local', 'nexus', 'DELETE',
+                               policy=self.policy, limiters=self.limiters, **kwargs)
+
+    def test_retries_then_succeeds(self, mock_sleep):
+        """Test that throttled responses are retried, waiting at least Retry-After."""
+        call = Mock(side_effect=[response(503, {'Retry-After': '1'}), response(204)])
+        self.assertEqual(204, self.call(call, check_response=True).status_code)
+        self.assertEqual(2, call.call_count)
+        self.assertGreaterEqual(mock_sleep.call_args[0][0], 1)
+
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        """Test that the last error is raised once the retries are used up."""
+        call = Mock(side_effect=HttpError(429))
+        with self.assertRaises(HttpError):
+            self.call(call)
+        self.assertEqual(3, call.call_count)
+
+    def test_gives_up_returns_last_response(self, mock_sleep):
+        """Test that the last response is returned once the retries are used up."""
+        call = Mock(return_value=response(502))
+        self.assertEqual(502, self.call(call, check_response=True).status_code)
+        self.assertEqual(3, call.call_count)
+
+    def test_permanent_error_not_retried(self, mock_sleep):
+        """Test that other errors are raised immediately."""
+        call = Mock(side_effect=HttpError(500))
+        with self.assertRaises(HttpError):
+            self.call(call)
+        call.assert_called_once_with()
+        mock_sleep.assert_not_called()
+
+    def test_throttling_reduces_concurrency(self, mock_sleep):
+        """Test that throttled requests lower the limit of the host."""
+        self.call(Mock(side_effect=[HttpError(503), HttpError(503), 'ok']))
+        # Halved twice from 64, then increased by 1/16 for the success.
+        self.assertEqual(16 + 1 / 16, self.limiters.get('nexus.local').limit)
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    """Tests for AdaptiveLimiter."""
+
+    def test_aimd(self):
+        """Test additive increase and multiplicative decrease of the limit."""
+        limiter = AdaptiveLimiter(rate=0, max_concurrency=8, min_concurrency=2)
+        for _ in range(3):
+            limiter.record_throttled()
+        self.assertEqual(2, limiter.limit)
+        limiter.record_success()
+        self.assertEqual(2.5, limiter.limit)
+        for _ in range(100):
+            limiter.record_success()
+        self.assertEqual(8, limiter.limit)
+
+    def test_concurrency_limit(self):
+        """Test that no more requests than the limit are in flight."""
+        limiter = AdaptiveLimiter(rate=0, max_concurrency=2)
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def request():
+            with limiter.slot():
+                with lock:
+                    in_flight.append(1)
+                    peak.append(len(in_flight))
+                threading.Event().wait(0.01)
+                with lock:
+                    in_flight.pop()
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, max(peak))
+
+    @patch('product_deletion_utility.components.retry.time.sleep')
+    def test_token_bucket(self, mock_sleep):
+        """Test that requests beyond the burst wait for tokens."""
+        limiter = AdaptiveLimiter(rate=2, max_concurrency=8)
+        for _ in range(2):
+            with limiter.slot():
+                pass
+        mock_sleep.assert_not_called()
+        limiter.tokens = 0.5
+        with patch('product_deletion_utility.components.retry.time.monotonic',
+                   side_effect=[limiter._updated, limiter._updated + 0.25]):
+            with limiter.slot():
+                pass
+        mock_sleep.assert_called_once_with(0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
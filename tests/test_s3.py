@@ -0,0 +1,297 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.s3 module.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+import unittest
+from unittest.mock import Mock, patch
+
+import boto3
+from moto import mock_s3
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.s3 import (
+    ClientS3Backend,
+    CrayCliS3Backend,
+    S3KeyIndex,
+    batch_keys,
+    describe_batch,
+    get_oidc_token,
+)
+
+
+class TestBatchKeys(unittest.TestCase):
+    """Tests for batch_keys() and describe_batch()."""
+
+    def test_grouped_by_bucket(self):
+        """Test that keys are grouped by bucket and split into batches."""
+        bucket_keys = [('a', 'k1'), ('b', 'k2'), ('a', 'k3'), ('a', 'k4')]
+        self.assertEqual([('a', ['k1', 'k3']), ('a', ['k4']), ('b', ['k2'])],
+                         batch_keys(bucket_keys, 2))
+
+    def test_describe_batch(self):
+        """Test the description of single and multiple key batches."""
+        self.assertEqual('a:k1', describe_batch(('a', ['k1'])))
+        self.assertEqual('2 artifacts from S3 bucket a', describe_batch(('a', ['k1', 'k2'])))
+
+
+class TestS3KeyIndex(unittest.TestCase):
+    """Tests for S3KeyIndex."""
+
+    def setUp(self):
+        self.image_id = '0ac3a1f8-8e1a-4dc4-9d2e-4b1b8e55a6a1'
+        self.other_id = 'f2b3c4d5-1111-2222-3333-444455556666'
+        self.keys = [
+            f'{self.image_id}/manifest.json',
+            f'{self.image_id}/rootfs',
+            f'{self.other_id}/rootfs',
+            'recipes/legacy-recipe/recipe.tar.gz',
+        ]
+
+    def test_keys_for(self):
+        """Test that keys are resolved by the IMS ID they contain."""
+        index = S3KeyIndex(iter(self.keys), [self.image_id])
+        self.assertEqual(self.keys[:2], index.keys_for(self.image_id))
+
+    def test_unwanted_ids_not_kept(self):
+        """Test that keys for IDs which were not requested are discarded."""
+        index = S3KeyIndex(self.keys, [self.image_id])
+        self.assertEqual([], index.keys_for(self.other_id))
+
+    def test_non_uuid_id(self):
+        """Test that an ID which is not a UUID is matched as a substring."""
+        index = S3KeyIndex(self.keys, ['legacy-recipe'])
+        self.assertEqual([self.keys[3]], index.keys_for('legacy-recipe'))
+
+
+class TestGetOidcToken(unittest.TestCase):
+    """Tests for get_oidc_token()."""
+
+    def test_token_from_file(self):
+        """Test reading the token from the file named by CRAY_CREDENTIALS."""
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as token_file:
+            json.dump({'access_token': 'abc'}, token_file)
+            token_file.flush()
+            with patch.dict(os.environ, {'CRAY_CREDENTIALS': token_file.name}):
+                self.assertEqual('abc', get_oidc_token())
+
+    def test_no_credentials(self):
+        """Test that a missing token file is an error."""
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(ProductInstallException):
+                get_oidc_token()
+
+
+@mock_s3
+class TestClientS3Backend(unittest.TestCase):
+    """Tests for ClientS3Backend against a moto S3 server."""
+
+    def setUp(self):
+        self.s3_client = boto3.client(
+            's3', region_name='us-east-1',
+            aws_access_key_id='testing', aws_secret_access_key='testing'
+        )
+        self.s3_client.create_bucket(Bucket='boot-images')
+        self.keys = [f'product/{i}/rootfs' for i in range(10)]
+        for key in self.keys:
+            self.s3_client.put_object(Bucket='boot-images', Key=key, Body=b'')
+        self.s3_client.put_object(Bucket='boot-images', Key='other/rootfs', Body=b'')
+        self.backend = ClientS3Backend(self.s3_client)
+
+    def remaining_keys(self):
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        return [obj['Key'] for page in paginator.paginate(Bucket='boot-images')
+                for obj in page.get('Contents', [])]
+
+    def test_delete_objects(self):
+        """Test that all keys are deleted in batches of at most batch_size keys."""
+        self.backend.batch_size = 4
+        with patch.object(self.s3_client, 'delete_objects',
+                          wraps=self.s3_client.delete_objects) as mock_delete:
+            self.backend.delete_objects('boot-images', self.keys)
+        self.assertEqual(3, mock_delete.call_count)
+        self.assertEqual(['other/rootfs'], self.remaining_keys())
+
+    def test_delete_missing_objects(self):
+        """Test that deleting keys which do not exist succeeds."""
+        self.backend.delete_objects('boot-images', ['does/not/exist'])
+        self.assertEqual(11, len(self.remaining_keys()))
+
+    def test_list_keys(self):
+        """Test that every key is listed across pages."""
+        self.assertEqual(11, len(list(self.backend.list_keys('boot-images'))))
+
+    def test_list_keys_missing_bucket(self):
+        """Test that listing a bucket which does not exist is an error."""
+        with self.assertRaises(ProductInstallException):
+            list(self.backend.list_keys('no-such-bucket'))
+
+    def test_read_object(self):
+        """Test reading an object, and that a missing object is None."""
+        self.s3_client.put_object(Bucket='boot-images', Key='image/manifest.json', Body=b'{}')
+        self.assertEqual(b'{}', self.backend.read_object('boot-images', 'image/manifest.json'))
+        self.assertIsNone(self.backend.read_object('boot-images', 'missing/manifest.json'))
+
+    def test_delete_objects_errors(self):
+        """Test that per-key errors other than a missing key are raised."""
+        self.backend.s3_client = Mock()
+        self.backend.s3_client.delete_objects.return_value = {'Errors': [
+            {'Key': 'gone', 'Code': 'NoSuchKey', 'Message': 'not found'},
+            {'Key': 'denied', 'Code': 'AccessDenied', 'Message': 'Access Denied'},
+        ]}
+        with self.assertRaisesRegex(ProductInstallException, 'denied \\(AccessDenied'):
+            self.backend.delete_objects('boot-images', ['gone', 'denied'])
+
+
+class TestCrayCliS3Backend(unittest.TestCase):
+    """Tests for CrayCliS3Backend."""
+
+    def setUp(self):
+        self.mock_check_output = patch('subprocess.check_output').start()
+        self.backend = CrayCliS3Backend()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_delete_objects(self):
+        """Test that the cray CLI is run once for every key."""
+        self.backend.delete_objects('config-data', ['a.yaml', 'b.yaml'])
+        self.assertEqual(2, self.mock_check_output.call_count)
+        self.assertEqual(['cray', 'artifacts', 'delete', 'config-data', 'b.yaml'],
+                         self.mock_check_output.call_args[0][0])
+
+    def test_delete_not_found(self):
+        """Test that a missing artifact is not an error."""
+        self.mock_check_output.side_effect = subprocess.CalledProcessError(
+            1, 'cray', output='Error: not found')
+        self.backend.delete_objects('config-data', ['a.yaml'])
+
+    def test_delete_failure(self):
+        """Test that other failures are raised."""
+        self.mock_check_output.side_effect = subprocess.CalledProcessError(
+            1, 'cray', output='Error: forbidden')
+        with self.assertRaises(ProductInstallException):
+            self.backend.delete_objects('config-data', ['a.yaml'])
+
+    def test_read_object(self):
+        """Test that an object is read from the file written by the cray CLI."""
+        def cray_artifacts_get(args, **kwargs):
+            with open(args[5], 'wb') as f:
+                f.write(b'{}')
+        self.mock_check_output.side_effect = cray_artifacts_get
+        self.assertEqual(b'{}', self.backend.read_object('boot-images', 'image/manifest.json'))
+        self.assertEqual(['cray', 'artifacts', 'get', 'boot-images', 'image/manifest.json'],
+                         self.mock_check_output.call_args[0][0][:5])
+
+    def test_read_object_not_found(self):
+        """Test that a missing object is None, and other failures are raised."""
+        self.mock_check_output.side_effect = subprocess.CalledProcessError(
+            1, 'cray', output='Error: not found')
+        self.assertIsNone(self.backend.read_object('boot-images', 'image/manifest.json'))
+        self.mock_check_output.side_effect = subprocess.CalledProcessError(
+            1, 'cray', output='Error: forbidden')
+        with self.assertRaisesRegex(ProductInstallException, 'forbidden'):
+            self.backend.read_object('boot-images', 'image/manifest.json')
+
+
+# A stand-in for the cray CLI which writes a listing of FAKE_CRAY_ARTIFACTS
+# artifacts, or fails if FAKE_CRAY_ERROR is set.
+FAKE_CRAY = """#!{python}
+import os
+import sys
+
+if os.environ.get('FAKE_CRAY_ERROR'):
+    sys.stderr.write(os.environ['FAKE_CRAY_ERROR'])
+    sys.exit(1)
+sys.stdout.write('{{"artifacts": [')
+for i in range(int(os.environ['FAKE_CRAY_ARTIFACTS'])):
+    sys.stdout.write(
+        ('' if i == 0 else ',') +
+        '{{"Key": "%s/%08d/rootfs", "LastModified": "2023-01-01T00:00:00Z", "Size": 1024}}'
+        % (sys.argv[3], i)
+    )
+sys.stdout.write(']}}')
+"""
+
+
+class TestCrayCliS3BackendListKeys(unittest.TestCase):
+    """Tests for CrayCliS3Backend.list_keys() against a fake cray CLI."""
+
+    def setUp(self):
+        self.bin_dir = tempfile.TemporaryDirectory()
+        cray = os.path.join(self.bin_dir.name, 'cray')
+        with open(cray, 'w') as f:
+            f.write(FAKE_CRAY.format(python=sys.executable))
+        os.chmod(cray, 0o755)
+        patch.dict(os.environ, {
+            'PATH': self.bin_dir.name + os.pathsep + os.environ.get('PATH', ''),
+            'FAKE_CRAY_ARTIFACTS': '2',
+        }).start()
+        self.backend = CrayCliS3Backend()
+
+    def tearDown(self):
+        patch.stopall()
+        self.bin_dir.cleanup()
+
+    def test_list_keys(self):
+        """Test that the keys of the bucket are listed."""
+        self.assertEqual(['boot-images/00000000/rootfs', 'boot-images/00000001/rootfs'],
+                         list(self.backend.list_keys('boot-images')))
+
+    def test_list_keys_failure(self):
+        """Test that a failed listing raises its error output."""
+        os.environ['FAKE_CRAY_ERROR'] = 'Error: forbidden'
+        with self.assertRaisesRegex(ProductInstallException, 'Error: forbidden'):
+            list(self.backend.list_keys('boot-images'))
+
+    def test_list_keys_stopped_early(self):
+        """Test that the listing is stopped if the keys are not all consumed."""
+        os.environ['FAKE_CRAY_ARTIFACTS'] = '100000'
+        keys = self.backend.list_keys('boot-images')
+        self.assertEqual('boot-images/00000000/rootfs', next(keys))
+        keys.close()
+
+    def test_list_keys_memory(self):
+        """Test that a large listing is processed without holding it in memory."""
+        os.environ['FAKE_CRAY_ARTIFACTS'] = '100000'
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in self.backend.list_keys('boot-images'))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(100000, count)
+        # The listing itself is roughly 9 MB of JSON.
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
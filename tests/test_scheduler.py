@@ -0,0 +1,119 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.scheduler module.
+"""
+
+import threading
+import unittest
+from unittest.mock import Mock
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.scheduler import PhaseScheduler, map_concurrently
+
+
+class TestPhaseScheduler(unittest.TestCase):
+    """Tests for PhaseScheduler."""
+
+    def test_run_all_phases(self):
+        """Test that every phase is run once."""
+        phases = [('phase one', Mock()), ('phase two', Mock())]
+        PhaseScheduler(2).run(phases)
+        for _, phase in phases:
+            phase.assert_called_once_with()
+
+    def test_phases_run_concurrently(self):
+        """Test that phases overlap when enough workers are available."""
+        barrier = threading.Barrier(3, timeout=5)
+        PhaseScheduler(3).run([(f'phase {i}', barrier.wait) for i in range(3)])
+
+    def test_errors_are_aggregated(self):
+        """Test that a failed phase does not stop the others and all errors are reported."""
+        succeeding_phase = Mock()
+        phases = [
+            ('docker images', Mock(side_effect=ProductInstallException('registry unavailable'))),
+            ('helm charts', succeeding_phase),
+            ('hosted repositories', Mock(side_effect=ValueError('unexpected'))),
+        ]
+        with self.assertRaises(ProductInstallException) as err_cm:
+            PhaseScheduler(1).run(phases)
+        succeeding_phase.assert_called_once_with()
+        message = str(err_cm.exception)
+        self.assertIn('docker images: registry unavailable', message)
+        self.assertIn('hosted repositories: unexpected', message)
+        self.assertNotIn('helm charts', message)
+
+    def test_invalid_concurrency(self):
+        """Test that a concurrency below one is rejected."""
+        with self.assertRaises(ProductInstallException):
+            PhaseScheduler(0)
+
+
+class TestMapConcurrently(unittest.TestCase):
+    """Tests for map_concurrently()."""
+
+    def test_all_items_processed(self):
+        """Test that the function is called once for every item."""
+        function = Mock()
+        self.assertEqual([], map_concurrently(function, ['a', 'b', 'c'], 2))
+        self.assertEqual(3, function.call_count)
+
+    def test_no_items(self):
+        """Test that no threads are needed when there is nothing to do."""
+        self.assertEqual([], map_concurrently(Mock(), [], 4))
+
+    def test_failures_collected(self):
+        """Test that a failed item does not prevent the others being processed."""
+        processed = []
+
+        def remove(item):
+            if item in ('b', 'd'):
+                raise ProductInstallException(f'failed {item}')
+            processed.append(item)
+
+        failures = map_concurrently(remove, ['a', 'b', 'c', 'd'], 4)
+        self.assertEqual(['b', 'd'], [item for item, _ in failures])
+        self.assertEqual('failed b', str(failures[0][1]))
+        self.assertEqual(['a', 'c'], sorted(processed))
+
+    def test_concurrency_bounded(self):
+        """Test that no more than max_workers calls are in flight at once."""
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def remove(item):
+            with lock:
+                in_flight.append(item)
+                peak.append(len(in_flight))
+            threading.Event().wait(0.01)
+            with lock:
+                in_flight.remove(item)
+
+        map_concurrently(remove, list(range(20)), 3)
+        self.assertLessEqual(max(peak), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.service module.
+"""
+
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.service import (
+    JOB_DELETE,
+    JOB_DRY_RUN,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_SUCCEEDED,
+    JobQueue,
+    create_server,
+    parse_job_request,
+)
+
+
+class TestParseJobRequest(unittest.TestCase):
+    """Tests for parse_job_request()."""
+
+    def test_request(self):
+        """Test that the action, unique product versions and resume flag are parsed."""
+        body = json.dumps({'action': 'dry-run', 'products': ['cos:2.5.101', 'sma:1.8.3', 'cos:2.5.101'],
+                           'resume': True})
+        self.assertEqual((JOB_DRY_RUN, [('cos', '2.5.101'), ('sma', '1.8.3')], True),
+                         parse_job_request(body.encode()))
+
+    def test_defaults(self):
+        """Test that a job deletes the product versions from the start unless requested otherwise."""
+        self.assertEqual((JOB_DELETE, [('cos', '2.5.101')], False),
+                         parse_job_request(b'{"products": ["cos:2.5.101"]}'))
+
+    def test_invalid(self):
+        """Test that invalid requests raise ValueError."""
+        for body in (b'not json', b'[]', b'{"products": []}', b'{"products": ["cos"]}',
+                     b'{"action": "gc", "products": ["cos:2.5.101"]}',
+                     b'{"products": ["cos:2.5.101"], "resume": "yes"}'):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    parse_job_request(body)
+
+
+class TestJobQueue(unittest.TestCase):
+    """Tests for JobQueue."""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.job_queue = JobQueue(self.run_job, parallelism=1, max_finished_jobs=2)
+
+    def tearDown(self):
+        self.release.set()
+        self.job_queue.shutdown()
+
+    def run_job(self, job):
+        """Finish a job once released, failing it if its product is 'bad'."""
+        self.release.wait()
+        if job.product_versions[0][0] == 'bad':
+            raise ProductInstallException('bad product')
+        return {'products': len(job.product_versions)}
+
+    def wait(self):
+        """Release the jobs and wait for all of them to finish."""
+        self.release.set()
+        while any(job.active for job in self.job_queue.jobs()):
+            threading.Event().wait(0.01)
+
+    def test_results(self):
+        """Test that the status and result or error of each job is recorded."""
+        good = self.job_queue.submit(JOB_DRY_RUN, [('cos', '1'), ('sma', '2')])
+        bad = self.job_queue.submit(JOB_DRY_RUN, [('bad', '1')])
+        self.assertEqual(JOB_QUEUED, bad.status)
+        self.wait()
+        self.assertEqual((JOB_SUCCEEDED, {'products': 2}), (good.status, good.result))
+        self.assertEqual((JOB_FAILED, 'bad product'), (bad.status, bad.error))
+        self.assertEqual(['cos:1', 'sma:2'], good.to_dict()['products'])
+        self.assertLessEqual(good.submitted, good.started)
+        self.assertLessEqual(good.started, good.finished)
+
+    def test_conflict(self):
+        """Test that a product version cannot be deleted by two unfinished jobs."""
+        first = self.job_queue.submit(JOB_DELETE, [('cos', '1')])
+        with self.assertRaisesRegex(ProductInstallException, first.id):
+            self.job_queue.submit(JOB_DELETE, [('sma', '2'), ('cos', '1')])
+        # A dry run does not conflict, and neither does a finished job.
+        self.job_queue.submit(JOB_DRY_RUN, [('cos', '1')])
+        self.wait()
+        self.job_queue.submit(JOB_DELETE, [('cos', '1')])
+
+    def test_finished_jobs_discarded(self):
+        """Test that only the most recent finished jobs are kept."""
+        jobs = [self.job_queue.submit(JOB_DRY_RUN, [('cos', str(i))]) for i in range(3)]
+        self.wait()
+        self.job_queue.submit(JOB_DRY_RUN, [('cos', '3')])
+        self.assertIsNone(self.job_queue.get(jobs[0].id))
+        self.assertEqual([jobs[1].id, jobs[2].id], [job.id for job in self.job_queue.jobs()[:2]])
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP connection over a Unix socket."""
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class TestServer(unittest.TestCase):
+    """Tests for the HTTP API created by create_server()."""
+
+    def setUp(self):
+        self.job_queue = JobQueue(lambda job: {'ran': job.action}, parallelism=2)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp_dir.name, 'api.sock')
+        self.server = create_server(self.job_queue, lambda: {'catalog_resource_version': '7'},
+                                    unix_socket=self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.job_queue.shutdown()
+        self.tmp_dir.cleanup()
+
+    def request(self, method, path, body=None):
+        """Send a request and get the status and decoded JSON body of the response."""
+        connection = UnixHTTPConnection(self.socket_path)
+        try:
+            connection.request(method, path, body=json.dumps(body) if body is not None else None)
+            response = connection.getresponse()
+            data = response.read().decode()
+            if response.getheader('Content-Type') == 'application/json':
+                data = json.loads(data)
+            return response.status, data
+        finally:
+            connection.close()
+
+    def test_socket_permissions(self):
+        """Test that only the owner may connect to the socket."""
+        self.assertEqual(0o600, os.stat(self.socket_path).st_mode & 0o777)
+
+    def test_submit_and_query(self):
+        """Test that a submitted job can be queried until it finishes."""
+        status, job = self.request('POST', '/jobs', {'action': 'dry-run', 'products': ['cos:2.5.101']})
+        self.assertEqual((202, ['cos:2.5.101']), (status, job['products']))
+        self.job_queue.shutdown()
+        status, job = self.request('GET', f'/jobs/{job["id"]}')
+        self.assertEqual((200, JOB_SUCCEEDED, {'ran': JOB_DRY_RUN}), (status, job['status'], job['result']))
+        self.assertEqual([job['id']], [listed['id'] for listed in self.request('GET', '/jobs')[1]])
+
+    def test_errors(self):
+        """Test the responses to invalid requests, unknown jobs and conflicts."""
+        self.assertEqual(400, self.request('POST', '/jobs', {'products': 'cos:2.5.101'})[0])
+        self.assertEqual(404, self.request('GET', '/jobs/unknown')[0])
+        self.assertEqual(404, self.request('GET', '/unknown')[0])
+        self.job_queue.run_job = lambda job: threading.Event().wait(1)
+        self.assertEqual(202, self.request('POST', '/jobs', {'products': ['cos:2.5.101']})[0])
+        self.assertEqual(409, self.request('POST', '/jobs', {'products': ['cos:2.5.101']})[0])
+
+    def test_status(self):
+        """Test the status and metrics of the service."""
+        self.assertEqual((200, {'catalog_resource_version': '7'}), self.request('GET', '/healthz'))
+        status, metrics = self.request('GET', '/metrics')
+        self.assertEqual(200, status)
+        self.assertIn('product_deletion_', metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
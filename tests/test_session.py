@@ -0,0 +1,178 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Unit tests for the product_deletion_utility.components.session module.
+"""
+
+from base64 import urlsafe_b64encode
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+import requests
+
+from benchmarks.fake_services import FakeApiGateway
+from product_deletion_utility.components.exceptions import ProductInstallException
+from product_deletion_utility.components.ims import IMS_IMAGES, ImsClient
+from product_deletion_utility.components.session import (
+    KEYCLOAK_TOKEN_PATH,
+    BearerTokenAuth,
+    OidcToken,
+    SessionBroker,
+    read_token_file,
+    token_expiry,
+)
+
+
+def jwt(claims):
+    """Encode claims as an unsigned JSON web token."""
+    payload = urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+
+class TokenFileTestCase(unittest.TestCase):
+    """A test case with a cray CLI token file."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.credentials_file = os.path.join(self.directory.name, 'credentials.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_token(self, access_token, expires_in=None, refresh_token=None):
+        token = {'access_token': access_token}
+        if expires_in is not None:
+            token['expires_at'] = time.time() + expires_in
+        if refresh_token:
+            token['refresh_token'] = refresh_token
+        with open(self.credentials_file, 'w') as f:
+            json.dump(token, f)
+
+
+class TestTokenFile(TokenFileTestCase):
+    """Tests for read_token_file() and token_expiry()."""
+
+    def test_expires_at(self):
+        """Test that the expiry stored by the cray CLI is preferred."""
+        self.assertEqual(100.0, token_expiry({'access_token': jwt({'exp': 200}), 'expires_at': 100}))
+
+    def test_jwt_expiry(self):
+        """Test that the exp claim of the access token is used without a stored expiry."""
+        self.assertEqual(200.0, token_expiry({'access_token': jwt({'exp': 200})}))
+
+    def test_unknown_expiry(self):
+        """Test that a token which is not a JWT has no known expiry."""
+        self.assertIsNone(token_expiry({'access_token': 'opaque'}))
+
+    def test_no_access_token(self):
+        """Test that a token file without an access token is an error."""
+        with open(self.credentials_file, 'w') as f:
+            json.dump({'refresh_token': 'refresh'}, f)
+        with self.assertRaisesRegex(ProductInstallException, 'no access_token'):
+            read_token_file(self.credentials_file)
+
+
+class TestOidcToken(TokenFileTestCase):
+    """Tests for OidcToken."""
+
+    def setUp(self):
+        super().setUp()
+        self.session = Mock()
+        self.token = OidcToken('https://api-gw/', self.credentials_file, session=self.session)
+
+    def test_read_once(self):
+        """Test that the token file is only read again when the token is about to expire."""
+        self.write_token('first', expires_in=3600)
+        self.assertEqual('first', self.token.access_token())
+        self.write_token('second', expires_in=3600)
+        self.assertEqual('first', self.token.access_token())
+        self.session.post.assert_not_called()
+
+    def test_refreshed_by_cray_cli(self):
+        """Test that a token refreshed in the file by the cray CLI is used without Keycloak."""
+        self.write_token('first', expires_in=30, refresh_token='refresh')
+        self.token._token = read_token_file(self.credentials_file)
+        self.write_token('second', expires_in=3600)
+        self.assertEqual('second', self.token.access_token())
+        self.session.post.assert_not_called()
+
+    def test_refresh(self):
+        """Test that a token about to expire is refreshed from Keycloak, once."""
+        self.write_token('first', expires_in=30, refresh_token='refresh')
+        self.session.post.return_value.json.return_value = {'access_token': 'second', 'expires_in': 300}
+        self.assertEqual('second', self.token.access_token())
+        self.assertEqual('second', self.token.access_token())
+        self.session.post.assert_called_once_with(f'https://api-gw{KEYCLOAK_TOKEN_PATH}', data={
+            'grant_type': 'refresh_token', 'client_id': 'shasta', 'refresh_token': 'refresh'})
+
+    def test_refresh_failed(self):
+        """Test that a token which has not expired yet is used if it could not be refreshed."""
+        self.write_token('first', expires_in=30, refresh_token='refresh')
+        self.session.post.side_effect = requests.ConnectionError('refused')
+        with self.assertLogs('product-deletion-utility', 'WARNING'):
+            self.assertEqual('first', self.token.access_token())
+
+    def test_expired(self):
+        """Test that an expired token without a refresh token is an error."""
+        self.write_token('first', expires_in=-1)
+        with self.assertRaisesRegex(ProductInstallException, 'expired'):
+            self.token.access_token()
+
+
+class TestSessionBroker(TokenFileTestCase):
+    """Tests for SessionBroker."""
+
+    def setUp(self):
+        super().setUp()
+        self.gateway = FakeApiGateway('http://s3').start()
+        self.load_nexus_credentials = Mock(return_value=('admin', 'secret'))
+        self.broker = SessionBroker(self.gateway.url, self.load_nexus_credentials, self.credentials_file)
+
+    def tearDown(self):
+        self.gateway.stop()
+        super().tearDown()
+
+    def test_nexus_credentials_loaded_once(self):
+        """Test that the Nexus credentials are loaded once for every session."""
+        sessions = [self.broker.nexus_session('docker'), self.broker.nexus_session('nexus')]
+        self.assertEqual([('admin', 'secret')] * 2, [session.auth for session in sessions])
+        self.load_nexus_credentials.assert_called_once_with()
+
+    def test_gateway_session(self):
+        """Test that gateway sessions authenticate with one shared token."""
+        self.write_token('token', expires_in=3600)
+        session = self.broker.gateway_session('ims')
+        self.assertIsInstance(session.auth, BearerTokenAuth)
+        self.assertIs(self.broker.token, session.auth.token)
+        self.gateway.add_ims_record(IMS_IMAGES, 'image-id', 'image')
+        client = ImsClient(self.gateway.url, session)
+        self.assertEqual('image', client.get_record(IMS_IMAGES, 'image-id')['name'])
+
+
+if __name__ == '__main__':
+    unittest.main()
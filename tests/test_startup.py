@@ -0,0 +1,89 @@
+#
+# MIT License
+#
+# (C) Copyright 2023 Hewlett Packard Enterprise Development LP
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests that the CLI starts without loading the backend client libraries.
+"""
+
+import json
+import subprocess
+import sys
+import unittest
+
+# Libraries which are only needed once components are removed.
+BACKEND_LIBRARIES = (
+    'aiohttp',
+    'boto3',
+    'botocore',
+    'cray_product_catalog',
+    'kubernetes',
+    'nexusctl',
+    'requests',
+    'urllib3',
+    'yaml',
+)
+
+# A generous limit on the cumulative time taken to import the entry point. It
+# is far above the time taken by the standard library modules the entry point
+# uses, and far below the time taken by the kubernetes client alone.
+IMPORT_TIME_BUDGET_US = 150000
+
+
+def run_python(code, *options):
+    """Run Python code in a new interpreter and return its completed process."""
+    return subprocess.run(
+        [sys.executable, *options, '-c', code],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+
+
+class TestStartup(unittest.TestCase):
+    """Tests for the import cost of the entry point."""
+
+    def test_entry_point_does_not_import_backends(self):
+        """Test that importing the entry point and parsing arguments loads no backend library."""
+        process = run_python(
+            'import json, sys\n'
+            'from product_deletion_utility.main import create_parser, get_product_versions\n'
+            'parser = create_parser()\n'
+            'get_product_versions(parser, parser.parse_args(["delete", "cos", "2.5.1"]))\n'
+            'print(json.dumps(sorted(sys.modules)))\n'
+        )
+        loaded = {name.split('.')[0] for name in json.loads(process.stdout)}
+        self.assertEqual([], sorted(loaded.intersection(BACKEND_LIBRARIES)))
+
+    def test_import_time_budget(self):
+        """Test that importing the entry point stays within its time budget."""
+        process = run_python('import product_deletion_utility.main', '-X', 'importtime')
+        cumulative_us = None
+        for line in process.stderr.splitlines():
+            # Lines are "import time: <self us> | <cumulative us> | <module>".
+            fields = [field.strip() for field in line.split('|')]
+            if len(fields) == 3 and fields[2] == 'product_deletion_utility.main':
+                cumulative_us = int(fields[1])
+        self.assertIsNotNone(cumulative_us)
+        self.assertLess(cumulative_us, IMPORT_TIME_BUDGET_US)
+
+
+if __name__ == '__main__':
+    unittest.main()